@@ -0,0 +1,402 @@
+"""
+Snake Arena: hundreds of snakes on one large board.
+
+Every snake's body lives in one NumPy ring-buffer array and the board is
+a single occupancy grid of snake ids, so a tick (steering, moving, wall,
+head-to-body and head-to-head collisions, eating and respawning) is a
+fixed number of array operations however many snakes there are. Snake 0
+is yours; the rest steer themselves.
+"""
+import pygame
+import numpy as np
+
+from src.atlas import get_atlas
+from src.audio import get_audio
+from src.lifecycle import BACK_TO_MENU, QUIT_APP, GameScene, run_standalone
+from src.profiler import FrameProfiler
+from src.scheduler import REDRAW_EVENTS
+from src.text_cache import render_text
+from src.view import GameLoop
+
+ARENA_SIZE = 200
+ARENA_SNAKES = 500
+ARENA_FRUIT = 400
+ARENA_CELL_SIZE = 4
+ARENA_TICK_MS = 50
+HUD_HEIGHT = 24
+START_LENGTH = 3
+GROWTH_PER_FRUIT = 2
+# longest a snake gets; past this eating only scores
+MAX_LENGTH = 256
+RESPAWN_TICKS = 40
+# fruit each snake compares when picking a new target
+TARGET_SAMPLES = 4
+
+# UP, RIGHT, DOWN, LEFT, as in snake_sim.DIRECTIONS
+STEP_X = np.array([0, 1, 0, -1], dtype=np.int32)
+STEP_Y = np.array([-1, 0, 1, 0], dtype=np.int32)
+KEY_DIRECTIONS = {pygame.K_UP: 0, pygame.K_RIGHT: 1, pygame.K_DOWN: 2, pygame.K_LEFT: 3}
+
+EMPTY = -1
+BACKGROUND_COLOR = (255, 209, 220)
+PLAYER_COLOR = (255, 85, 163)
+SNAKE_COLORS = (
+    (84, 130, 53), (46, 117, 182), (191, 144, 0), (112, 48, 160),
+    (0, 150, 136), (197, 90, 17), (96, 96, 96), (31, 78, 121),
+)
+
+
+class ArenaModel:
+    """
+    ARENA_SNAKES snakes and ARENA_FRUIT strawberries on a size x size board.
+
+    bodies[i] is snake i's ring buffer of cell indices (y * size + x) with
+    its head at head_index[i]; owner holds the id of the snake on each cell
+    or EMPTY. Dead snakes drop their body and come back RESPAWN_TICKS later
+    somewhere free. Every step() adds the cells whose contents changed to
+    `changes`, until the view takes them with take_changes() for its
+    incremental redraw, however many steps ran in between.
+    """
+
+    def __init__(self, size=ARENA_SIZE, snakes=ARENA_SNAKES, fruit=ARENA_FRUIT, seed=None):
+        self.size = size
+        self.count = snakes
+        self.fruit_count = fruit
+        self.rng = np.random.default_rng(seed)
+        self.reset()
+
+    def reset(self):
+        n, count = self.size, self.count
+        self.owner = np.full(n * n, EMPTY, dtype=np.int32)
+        self.fruit = np.zeros(n * n, dtype=bool)
+        self.bodies = np.zeros((count, MAX_LENGTH), dtype=np.int32)
+        self.head_index = np.zeros(count, dtype=np.int32)
+        self.heads = np.zeros(count, dtype=np.int32)
+        self.length = np.zeros(count, dtype=np.int32)
+        self.grow = np.zeros(count, dtype=np.int32)
+        self.direction = np.zeros(count, dtype=np.int32)
+        self.target = np.zeros(count, dtype=np.int32)
+        self.alive = np.zeros(count, dtype=bool)
+        self.respawn_at = np.zeros(count, dtype=np.int64)
+        self.score = np.zeros(count, dtype=np.int32)
+        self.ticks = 0
+        self.deaths = 0
+        # direction asked for by the player for snake 0, or None
+        self.player_direction = None
+        self.respawn(np.arange(count))
+        self.spawn_fruit(self.fruit_count)
+        self.retarget(np.arange(count))
+        self.changes = [np.flatnonzero((self.owner != EMPTY) | self.fruit)]
+
+    def free_cells(self):
+        return np.flatnonzero((self.owner == EMPTY) & ~self.fruit)
+
+    def respawn(self, ids):
+        """
+        Bring snakes back as a single head in a random free cell; they
+        grow to START_LENGTH over their first ticks.
+        """
+        free = self.free_cells()
+        ids = ids[:len(free)]
+        cells = self.rng.choice(free, size=len(ids), replace=False).astype(np.int32)
+        self.head_index[ids] = 0
+        self.bodies[ids, 0] = cells
+        self.heads[ids] = cells
+        self.length[ids] = 1
+        self.grow[ids] = START_LENGTH - 1
+        self.direction[ids] = self.rng.integers(0, 4, size=len(ids))
+        self.alive[ids] = True
+        self.score[ids] = 0
+        self.owner[cells] = ids
+        return cells
+
+    def spawn_fruit(self, count):
+        free = self.free_cells()
+        cells = self.rng.choice(free, size=min(count, len(free)), replace=False)
+        self.fruit[cells] = True
+        return cells
+
+    def retarget(self, ids):
+        """
+        Point each snake at the nearest of a few randomly sampled fruit.
+        """
+        fruit_cells = np.flatnonzero(self.fruit)
+        if not len(ids) or not len(fruit_cells):
+            return
+        n = self.size
+        samples = fruit_cells[self.rng.integers(0, len(fruit_cells), size=(len(ids), TARGET_SAMPLES))]
+        heads = self.heads[ids, None]
+        distance = np.abs(samples % n - heads % n) + np.abs(samples // n - heads // n)
+        self.target[ids] = samples[np.arange(len(ids)), distance.argmin(axis=1)]
+
+    def candidates(self, ids):
+        """
+        (directions, cells, inside) for going straight, left and right,
+        each of shape (len(ids), 3). cells is -1 off the board.
+        """
+        n = self.size
+        d = self.direction[ids, None]
+        directions = np.concatenate([d, (d + 3) % 4, (d + 1) % 4], axis=1)
+        x = self.heads[ids, None] % n + STEP_X[directions]
+        y = self.heads[ids, None] // n + STEP_Y[directions]
+        inside = (x >= 0) & (x < n) & (y >= 0) & (y < n)
+        return directions, np.where(inside, y * n + x, -1), inside
+
+    def steer(self, ids):
+        """
+        New direction for each snake: the free move that gets closest to its
+        target fruit, with a little noise so snakes don't move in lockstep.
+        """
+        n = self.size
+        lost = ids[~self.fruit[self.target[ids]]]
+        self.retarget(lost)
+        directions, cells, inside = self.candidates(ids)
+        free = inside & (self.owner[np.maximum(cells, 0)] == EMPTY)
+        target = self.target[ids, None]
+        distance = np.abs(cells % n - target % n) + np.abs(cells // n - target // n)
+        score = np.where(free, -distance + self.rng.random(distance.shape), -np.inf)
+        return directions[np.arange(len(ids)), score.argmax(axis=1)]
+
+    def body_cells(self, ids):
+        """
+        Every cell of the given snakes, as one flat array.
+        """
+        offsets = np.arange(MAX_LENGTH)
+        positions = (self.head_index[ids, None] + offsets) % MAX_LENGTH
+        mask = offsets < self.length[ids, None]
+        return self.bodies[ids[:, None], positions][mask]
+
+    def step(self):
+        """
+        Advance every live snake by one cell.
+        """
+        n = self.size
+        ids = np.flatnonzero(self.alive)
+        directions = self.steer(ids)
+        if self.player_direction is not None and self.alive[0]:
+            # the player can't reverse into their own neck either
+            if self.player_direction != (self.direction[0] + 2) % 4:
+                directions[0] = self.player_direction
+        self.direction[ids] = directions
+
+        x = self.heads[ids] % n + STEP_X[directions]
+        y = self.heads[ids] // n + STEP_Y[directions]
+        inside = (x >= 0) & (x < n) & (y >= 0) & (y < n)
+        new = np.where(inside, y * n + x, 0)
+
+        # tails move first, so following a tail (even your own) is safe
+        growing = (self.grow[ids] > 0) & (self.length[ids] < MAX_LENGTH)
+        movers = ids[~growing]
+        tails = self.bodies[movers, (self.head_index[movers] + self.length[movers] - 1) % MAX_LENGTH]
+        self.owner[tails] = EMPTY
+        self.length[movers] -= 1
+        self.grow[ids[growing]] -= 1
+
+        # walls, bodies, and heads meeting in the same cell
+        crowded = np.bincount(new[inside], minlength=n * n)
+        crash = ~inside | (self.owner[new] != EMPTY) | (crowded[new] > 1)
+        dead = ids[crash]
+        survivors = ids[~crash]
+        heads = new[~crash]
+        old_heads = self.heads[survivors]
+
+        self.head_index[survivors] = (self.head_index[survivors] - 1) % MAX_LENGTH
+        self.bodies[survivors, self.head_index[survivors]] = heads
+        self.heads[survivors] = heads
+        self.length[survivors] += 1
+        self.owner[heads] = survivors
+
+        cleared = self.body_cells(dead)
+        self.owner[cleared] = EMPTY
+        self.alive[dead] = False
+        self.respawn_at[dead] = self.ticks + RESPAWN_TICKS
+        self.deaths += len(dead)
+
+        eaten = self.fruit[heads]
+        eaters = survivors[eaten]
+        self.grow[eaters] += GROWTH_PER_FRUIT
+        self.score[eaters] += 1
+        self.fruit[heads[eaten]] = False
+        planted = self.spawn_fruit(int(eaten.sum()))
+
+        self.ticks += 1
+        waiting = np.flatnonzero(~self.alive & (self.respawn_at <= self.ticks))
+        born = self.respawn(waiting) if len(waiting) else waiting
+        if len(waiting):
+            self.retarget(waiting)
+
+        # old heads change from head to body sprite
+        self.changes += [tails, old_heads, heads, cleared, planted, born]
+        return len(ids)
+
+    def take_changes(self):
+        """
+        Cells changed since the last call, each listed once.
+        """
+        changes = self.changes
+        self.changes = []
+        return np.unique(np.concatenate(changes)) if changes else np.empty(0, dtype=np.int64)
+
+    def alive_count(self):
+        return int(self.alive.sum())
+
+
+class ArenaView:
+    """
+    Draws the board from the model's owner grid. After the first frame only
+    the cells the model reports changed are repainted, all in one
+    Surface.blits call with one small pre-rendered surface per colour.
+    """
+
+    def __init__(self, model, fruit_image, font, cell_size=ARENA_CELL_SIZE):
+        self.model = model
+        self.font = font
+        self.cell_size = cell_size
+        self.screen = None
+        self.full_redraw = True
+
+        def square(color):
+            surface = pygame.Surface((cell_size, cell_size))
+            surface.fill(color)
+            return surface
+
+        def lighter(color):
+            return tuple(min(255, c + 70) for c in color)
+
+        # fruit is flattened onto the background so it fully covers its cell
+        fruit = square(BACKGROUND_COLOR)
+        fruit.blit(pygame.transform.smoothscale(fruit_image, (cell_size, cell_size)), (0, 0))
+        # kinds: 0 background, 1 fruit, then a (body, head) pair per colour
+        self.surfaces = [square(BACKGROUND_COLOR), fruit]
+        for color in (PLAYER_COLOR,) + SNAKE_COLORS:
+            self.surfaces += [square(color), square(lighter(color))]
+
+    def open_window(self):
+        side = self.model.size * self.cell_size
+        self.screen = pygame.display.set_mode((side, side + HUD_HEIGHT))
+        pygame.display.set_caption("Snake Arena")
+        self.full_redraw = True
+
+    def cell_kinds(self, cells):
+        model = self.model
+        owner = model.owner[cells]
+        snake = np.maximum(owner, 0)
+        # snake 0 is the player; everyone else cycles through SNAKE_COLORS
+        color = np.where(snake == 0, 0, 1 + (snake - 1) % len(SNAKE_COLORS))
+        kinds = 2 + 2 * color + (model.heads[snake] == cells)
+        return np.where(owner == EMPTY, model.fruit[cells].astype(np.int32), kinds)
+
+    def draw_cells(self, cells):
+        """
+        Repaint cells; returns their rects.
+        """
+        if not len(cells):
+            return []
+        size, cell_size = self.model.size, self.cell_size
+        surfaces = self.surfaces
+        kinds = self.cell_kinds(cells).tolist()
+        xs = (cells % size * cell_size).tolist()
+        ys = (cells // size * cell_size).tolist()
+        return self.screen.blits([(surfaces[k], (x, y)) for k, x, y in zip(kinds, xs, ys)])
+
+    def draw_hud(self):
+        model = self.model
+        top = model.size * self.cell_size
+        rect = self.screen.fill((35, 35, 35), (0, top, self.screen.get_width(), HUD_HEIGHT))
+        if model.alive[0]:
+            you = f"you: length {model.length[0]}, {model.score[0]} eaten"
+        else:
+            you = "you: respawning"
+        text = render_text(self.font, f"{you}   snakes alive: {model.alive_count()}/{model.count}",
+                           True, (255, 255, 255))
+        self.screen.blit(text, (6, top + (HUD_HEIGHT - text.get_height()) // 2))
+        return rect
+
+    def draw(self):
+        """
+        Repaint what changed since the last call; returns the dirty rects.
+        """
+        model = self.model
+        if self.full_redraw:
+            self.full_redraw = False
+            self.screen.fill(BACKGROUND_COLOR)
+            model.take_changes()
+            self.draw_cells(np.flatnonzero((model.owner != EMPTY) | model.fruit))
+            self.draw_hud()
+            return [self.screen.get_rect()]
+        rects = self.draw_cells(model.take_changes())
+        rects.append(self.draw_hud())
+        return rects
+
+
+class ArenaGame(GameScene):
+    assets = ("images/strawberry4.png",)
+
+    def __init__(self):
+        super().__init__()
+        self.model = None
+        self.view = None
+        self.profiler = FrameProfiler("arena")
+        self.loop = GameLoop(self.handle_events, self.draw, step=self.tick,
+                             step_seconds=ARENA_TICK_MS / 1000, profiler=self.profiler)
+
+    def open_window(self):
+        side = ARENA_SIZE * ARENA_CELL_SIZE
+        pygame.display.set_mode((side, side + HUD_HEIGHT))
+
+    def load(self):
+        self.model = ArenaModel()
+        self.view = ArenaView(self.model, get_atlas().sprite("strawberry"), pygame.font.SysFont(None, 22))
+        self.audio = get_audio()
+        super().load()
+
+    def enter(self):
+        super().enter()
+        self.model.reset()
+        self.resume()
+
+    def resume(self):
+        self.view.open_window()
+        self.audio.play_music("snake")
+        self.loop.resume()
+
+    def run(self):
+        self.result = None
+        self.loop.run()
+        return self.result
+
+    def draw(self, alpha):
+        return self.view.draw()
+
+    def handle_events(self, events):
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.result = QUIT_APP
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.result = BACK_TO_MENU
+                elif event.key in KEY_DIRECTIONS:
+                    self.model.player_direction = KEY_DIRECTIONS[event.key]
+            if event.type in REDRAW_EVENTS:
+                self.view.full_redraw = True
+            if self.profiler.handle_event(event):
+                self.view.full_redraw = True
+        if self.result is not None:
+            self.loop.stop()
+
+    def tick(self):
+        model = self.model
+        was_alive, eaten = model.alive[0], model.score[0]
+        model.step()
+        if was_alive and not model.alive[0]:
+            self.audio.play("game_over")
+            model.player_direction = None
+        elif model.score[0] > eaten:
+            self.audio.play("eat")
+
+
+def main():
+    run_standalone(ArenaGame())
+
+if __name__ == "__main__":
+    main()
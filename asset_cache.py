@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import requests
+
+DEFAULT_CACHE_DIR = Path(os.environ.get(
+    "GAME_CACHE_DIR", Path.home() / ".cache" / "game_of_games"))
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def fetch(url, etag=None, timeout=10):
+    """
+    Download url; returns (data, etag), with data None when the server says
+    our copy (etag) is still current. file:// URLs are read from disk.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return Path(url2pathname(parsed.path)).read_bytes(), None
+
+    headers = {"If-None-Match": etag} if etag else {}
+    req = requests.get(url, headers=headers, timeout=timeout)
+    if req.status_code == 304:
+        return None, etag
+    req.raise_for_status()
+    return req.content, req.headers.get("ETag")
+
+
+class DiskCache:
+    """
+    Content-addressed store of downloaded bytes.
+
+    Blobs live under objects/ named by their SHA-256; index.json maps each
+    URL to its blob, size, ETag and last use. Reads check the size and
+    hash, and the least recently used entries are evicted past max_bytes.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.index_path = self.root / "index.json"
+        self.index = self.read_index()
+
+    def read_index(self):
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_index(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_path)
+
+    def blob_path(self, digest):
+        return self.root / "objects" / digest[:2] / digest
+
+    def entry(self, url):
+        with self.lock:
+            return self.index.get(url)
+
+    def get(self, url):
+        """
+        Cached bytes for url, or None if missing or failing validation.
+        """
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is None:
+                return None
+            try:
+                data = self.blob_path(entry["hash"]).read_bytes()
+            except OSError:
+                data = None
+            if (data is None or len(data) != entry["size"]
+                    or hashlib.sha256(data).hexdigest() != entry["hash"]):
+                del self.index[url]
+                return None
+            entry["last_used"] = time.time()
+            return data
+
+    def put(self, url, data, etag=None):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        with self.lock:
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(".tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+            self.index[url] = {
+                "hash": digest,
+                "size": len(data),
+                "etag": etag,
+                "last_used": time.time(),
+            }
+            self.evict()
+            self.write_index()
+
+    def evict(self):
+        # sizes are counted per blob, since several URLs may share content
+        blobs = {}
+        for entry in self.index.values():
+            blobs[entry["hash"]] = entry["size"]
+        total = sum(blobs.values())
+        by_age = sorted(self.index.items(), key=lambda item: item[1]["last_used"])
+        for url, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            del self.index[url]
+            digest = entry["hash"]
+            if all(e["hash"] != digest for e in self.index.values()):
+                total -= blobs.pop(digest)
+                try:
+                    self.blob_path(digest).unlink()
+                except OSError:
+                    pass
+
+    def flush(self):
+        with self.lock:
+            self.write_index()
+
+
+class Prefetcher:
+    """
+    Fetches a batch of URLs in a thread pool, serving them from the disk
+    cache when present so a warm start never touches the network.
+    """
+
+    def __init__(self, urls, cache=None, fetcher=fetch, max_workers=8, revalidate=False):
+        self.cache = cache if cache is not None else DiskCache()
+        self.fetcher = fetcher
+        self.revalidate = revalidate
+        self.results = {}
+        self.errors = {}
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {url: self.pool.submit(self.load, url) for url in dict.fromkeys(urls)}
+        self.pool.shutdown(wait=False)
+
+    def load(self, url):
+        try:
+            data = self.cache.get(url)
+            if data is None:
+                data, etag = self.fetcher(url)
+                self.cache.put(url, data, etag)
+            elif self.revalidate:
+                entry = self.cache.entry(url) or {}
+                fresh, etag = self.fetcher(url, entry.get("etag"))
+                if fresh is not None:
+                    data = fresh
+                    self.cache.put(url, data, etag)
+            with self.lock:
+                self.results[url] = data
+        except Exception as exc:
+            with self.lock:
+                self.errors[url] = exc
+
+    def get(self, url):
+        """
+        Bytes for url if they have arrived, else None.
+        """
+        with self.lock:
+            return self.results.get(url)
+
+    def failed(self, url):
+        with self.lock:
+            return url in self.errors
+
+    def done(self):
+        return all(future.done() for future in self.futures.values())
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in self.futures.values():
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            future.exception(timeout=remaining)
+        self.cache.flush()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pygame
+
+from src.asset_cache import DEFAULT_CACHE_DIR
+from src.manifest import load_image, resolve
+
+ATLAS_CACHE_DIR = DEFAULT_CACHE_DIR / "atlas"
+MAX_SHEET_WIDTH = 2048
+PADDING = 1
+
+# name -> (asset name, display size or None to keep the native size)
+SPRITES = {
+    "strawberry": ("images/strawberry4.png", (40, 40)),
+    "snake_body": ("images/snake_body.png", (40, 40)),
+    "big_dog": ("images/annoyingdog.png", None),
+    "small_dog": ("images/annoyingdog_smallest.png", None),
+    "decoy_strawberry": ("images/strawberry4.png", (10, 10)),
+    "doggo_background": ("images/pygamebg3.png", None),
+}
+
+
+class Atlas:
+    """
+    Sprites pre-scaled to their display size and packed into two converted
+    sheets: one with per-pixel alpha and one opaque, so opaque sprites such
+    as backgrounds keep the fast blit path.
+    """
+
+    def __init__(self, sheets, rects):
+        self.sheets = sheets
+        self.rects = rects
+
+    def rect(self, name):
+        return self.rects[name][1]
+
+    def sprite(self, name):
+        """
+        The sprite as a subsurface of its sheet (shares the sheet's pixels).
+        """
+        sheet, rect = self.rects[name]
+        return self.sheets[sheet].subsurface(rect)
+
+    def blit(self, target, name, dest):
+        sheet, rect = self.rects[name]
+        return target.blit(self.sheets[sheet], dest, rect)
+
+
+def cache_key(sprites):
+    """
+    Hash of every source path, size, mtime and display size, so the compiled
+    atlas is rebuilt whenever an asset changes.
+    """
+    h = hashlib.sha1()
+    for name, (rel, size) in sorted(sprites.items()):
+        stat = resolve(rel).stat()
+        h.update(f"{name}|{rel}|{stat.st_mtime_ns}|{stat.st_size}|{size}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def pack(sizes):
+    """
+    Shelf-pack {name: (w, h)} rows left to right, tallest first.
+    Returns ({name: Rect}, sheet_size).
+    """
+    rects = {}
+    x = y = shelf_height = width = 0
+    for name, (w, h) in sorted(sizes.items(), key=lambda item: -item[1][1]):
+        if x > 0 and x + w > MAX_SHEET_WIDTH:
+            y += shelf_height + PADDING
+            x = shelf_height = 0
+        rects[name] = pygame.Rect(x, y, w, h)
+        x += w + PADDING
+        shelf_height = max(shelf_height, h)
+        width = max(width, x - PADDING)
+    return rects, (max(width, 1), max(y + shelf_height, 1))
+
+
+def build_atlas(sprites):
+    """
+    Load, scale and pack the sprites; returns (sheet surfaces, rects).
+    """
+    groups = ({}, {})
+    for name, (rel, size) in sprites.items():
+        img = load_image(rel)
+        if size is not None:
+            img = pygame.transform.scale(img.convert_alpha(), size)
+        has_alpha = bool(img.get_flags() & pygame.SRCALPHA)
+        groups[0 if has_alpha else 1][name] = img
+
+    sheets = []
+    rects = {}
+    for index, images in enumerate(groups):
+        packed, sheet_size = pack({name: img.get_size() for name, img in images.items()})
+        flags = pygame.SRCALPHA if index == 0 else 0
+        sheet = pygame.Surface(sheet_size, flags, 32)
+        for name, img in images.items():
+            sheet.blit(img, packed[name])
+            rects[name] = (index, packed[name])
+        sheets.append(sheet)
+    return sheets, rects
+
+
+def load_atlas(sprites=SPRITES, cache_dir=ATLAS_CACHE_DIR):
+    """
+    Load the compiled atlas from cache_dir, building and saving it if the
+    sources changed. Needs a display mode to be set for convert().
+    """
+    key = cache_key(sprites)
+    index_path = Path(cache_dir) / f"atlas-{key}.json"
+    sheet_paths = [Path(cache_dir) / f"atlas-{key}-{i}.png" for i in range(2)]
+
+    if index_path.exists() and all(p.exists() for p in sheet_paths):
+        with index_path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        sheets = [pygame.image.load(str(p)) for p in sheet_paths]
+        rects = {name: (sheet, pygame.Rect(rect)) for name, (sheet, rect) in data.items()}
+    else:
+        sheets, rects = build_atlas(sprites)
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        for sheet, path in zip(sheets, sheet_paths):
+            pygame.image.save(sheet, str(path))
+        tmp = index_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({name: [sheet, list(rect)] for name, (sheet, rect) in rects.items()}, f)
+        os.replace(tmp, index_path)
+
+    sheets = [sheets[0].convert_alpha(), sheets[1].convert()]
+    return Atlas(sheets, rects)
+
+
+_shared = None
+
+
+def get_atlas():
+    """
+    The atlas shared by all games, loaded on first use.
+    """
+    global _shared
+    if _shared is None:
+        _shared = load_atlas()
+    return _shared
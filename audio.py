@@ -0,0 +1,178 @@
+import math
+import queue
+import sys
+import threading
+import time
+from array import array
+
+import pygame
+
+from src.manifest import find
+
+# name -> (asset name, volume)
+MUSIC = {
+    "snake": ("music/game1.wav", 1.0),
+    "doggo": ("music/IRWSAYH[8-Bit].mp3", 0.5),
+}
+
+# name -> (priority, start Hz, end Hz, seconds). The asset sounds/<name>.wav
+# is used when it exists, otherwise a short sweep is synthesised.
+EFFECTS = {
+    "eat": (1, 660, 990, 0.08),
+    "match": (2, 523, 1046, 0.15),
+    "found": (2, 880, 1320, 0.12),
+    "game_over": (3, 440, 110, 0.5),
+}
+
+EFFECT_CHANNELS = 4
+FADE_MS = 600
+EFFECT_VOLUME = 0.6
+
+
+class AudioManager:
+    """
+    Sound effects and background music shared by every game.
+
+    Effects are decoded once into Sounds on a background thread and played
+    through EFFECT_CHANNELS reserved channels; when all are busy a new
+    effect steals the channel of the lowest-priority effect playing, or is
+    dropped if nothing playing is less important. Music is streamed by
+    pygame.mixer.music and switched on the same thread, so loading a track
+    never stalls a frame. pygame has a single music stream, so switching
+    tracks fades the old one out and the new one in.
+
+    Without an initialised mixer every method is a no-op.
+    """
+
+    def __init__(self):
+        self.enabled = pygame.mixer.get_init() is not None
+        self.sounds = {}
+        self.channels = []
+        # channel index -> priority of the effect last started on it
+        self.playing = []
+        self.current_music = None
+        # tracks already reported missing
+        self.missing_music = set()
+        self.commands = queue.Queue()
+        self.loaded = threading.Event()
+        if not self.enabled:
+            self.loaded.set()
+            return
+
+        if pygame.mixer.get_num_channels() < EFFECT_CHANNELS + 4:
+            pygame.mixer.set_num_channels(EFFECT_CHANNELS + 4)
+        pygame.mixer.set_reserved(EFFECT_CHANNELS)
+        self.channels = [pygame.mixer.Channel(i) for i in range(EFFECT_CHANNELS)]
+        self.playing = [0] * EFFECT_CHANNELS
+        self.worker = threading.Thread(target=self.work, name="audio", daemon=True)
+        self.worker.start()
+        self.commands.put((self.load_effects,))
+
+    def work(self):
+        while True:
+            command = self.commands.get()
+            try:
+                command[0](*command[1:])
+            except (pygame.error, OSError) as exc:
+                print(f"audio: {exc}", file=sys.stderr)
+
+    def load_effects(self):
+        for name, (priority, start_hz, end_hz, seconds) in EFFECTS.items():
+            path = find(f"sounds/{name}.wav")
+            if path is not None:
+                sound = pygame.mixer.Sound(str(path))
+            else:
+                sound = self.synthesise(start_hz, end_hz, seconds)
+            if sound is not None:
+                sound.set_volume(EFFECT_VOLUME)
+                self.sounds[name] = sound
+        self.loaded.set()
+
+    @staticmethod
+    def synthesise(start_hz, end_hz, seconds):
+        """
+        A sine sweep with a linear fade-out, in the mixer's format.
+        """
+        rate, size, channels = pygame.mixer.get_init()
+        if size != -16:
+            return None
+        count = int(rate * seconds)
+        samples = array("h", bytes(2 * count * channels))
+        phase = 0.0
+        for i in range(count):
+            t = i / count
+            phase += 2 * math.pi * (start_hz + (end_hz - start_hz) * t) / rate
+            value = int(12000 * (1 - t) * math.sin(phase))
+            for c in range(channels):
+                samples[i * channels + c] = value
+        return pygame.mixer.Sound(buffer=samples.tobytes())
+
+    def play(self, name):
+        """
+        Start an effect; returns False if it wasn't loaded yet or lost out
+        to more important effects.
+        """
+        sound = self.sounds.get(name)
+        if sound is None:
+            return False
+        priority = EFFECTS[name][0]
+        victim = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                victim = i
+                break
+            if self.playing[i] < priority and (victim is None or self.playing[i] < self.playing[victim]):
+                victim = i
+        if victim is None:
+            return False
+        self.channels[victim].play(sound)
+        self.playing[victim] = priority
+        return True
+
+    def play_music(self, track):
+        """
+        Switch the background music to track (a MUSIC name, or None for
+        silence). Returns immediately; the switch happens on the audio thread.
+        """
+        if not self.enabled or track == self.current_music:
+            return
+        self.current_music = track
+        self.commands.put((self.switch_music, track))
+
+    def stop_music(self):
+        self.play_music(None)
+
+    def switch_music(self, track):
+        music = pygame.mixer.music
+        if music.get_busy():
+            music.fadeout(FADE_MS)
+            deadline = time.monotonic() + FADE_MS / 1000 + 0.2
+            while music.get_busy() and time.monotonic() < deadline:
+                time.sleep(0.02)
+        if track is None or track != self.current_music:
+            # silenced, or another switch is already queued behind this one
+            return
+        path, volume = MUSIC[track]
+        found = find(path)
+        if found is None:
+            # the game plays on in silence; say so the first time only
+            if path not in self.missing_music:
+                self.missing_music.add(path)
+                print(f"audio: missing music {path}", file=sys.stderr)
+            return
+        music.load(str(found))
+        music.set_volume(volume)
+        music.play(-1, fade_ms=FADE_MS)
+
+
+shared_audio = None
+
+
+def get_audio():
+    """
+    The shared AudioManager, created on first use (after mixer.init()).
+    """
+    global shared_audio
+    if shared_audio is None:
+        shared_audio = AudioManager()
+    return shared_audio
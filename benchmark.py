@@ -0,0 +1,485 @@
+"""
+Headless benchmarks for the menu and games.
+
+Runs under SDL's dummy video/audio drivers, writes the results to a JSON
+file and, given a baseline from an earlier run, exits non-zero when a
+metric regressed by more than the threshold.
+
+    python -m src.benchmark --output bench.json
+    python -m src.benchmark --baseline bench.json --threshold 0.15
+
+With GAME_RECORD_DIR set, the recorded sessions in it are replayed too, so
+the workload can follow real play.
+
+Scores and caches go to a temporary directory, the games don't record
+rounds, and no benchmark opens a network socket beyond the loopback asset
+server, so a run leaves the player's data alone.
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import http.server
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from pathlib import Path
+
+import pygame
+
+ROOT = Path(__file__).resolve().parent.parent
+SNAKE_LENGTHS = (3, 100, 1000, 3000)
+RENDER_LENGTHS = (3, 300)
+CROWD_SIZES = (200, 1500)
+# board sizes are even, with an even middle row, so the starting snake
+# already lies on the cycle below
+SNAKE_BOARD = 64
+SCORE_SESSIONS = 1_000_000
+# sessions to replay; the games themselves don't record during a run
+RECORD_DIR = os.environ.get("GAME_RECORD_DIR")
+# menu entries that open sockets: Snake LAN serves on NET_PORT
+NETWORK_SCENES = ("Snake LAN",)
+
+
+def median_time(fn, number, repeat=5):
+    """
+    Median seconds per call of fn over `repeat` runs of `number` calls.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - start) / number)
+    return statistics.median(runs)
+
+
+def snake_of_length(length, board, screen=None, font=None, snake_image=None, fruit_image=None):
+    from src.game1 import Main
+    main = Main(screen, font, snake_image, fruit_image,
+                rng=random.Random(0), cell_number=board)
+    main.game_over = lambda: None
+    while len(main.snake) < length:
+        main.snake.extend_snake()
+        step_on_cycle(main)
+    return main
+
+
+def step_on_cycle(main):
+    from src.snake_sim import cycle_direction
+    snake = main.snake
+    snake.turn(cycle_direction(snake.head_x, snake.head_y, main.cell_number))
+    main.update()
+
+
+def bench_snake_ticks():
+    results = {}
+    for length in SNAKE_LENGTHS:
+        main = snake_of_length(length, SNAKE_BOARD)
+        per_tick = median_time(lambda: step_on_cycle(main), number=2000)
+        results[f"snake_ticks_per_sec_len{length}"] = (1.0 / per_tick, "ticks/s", True)
+    return results
+
+
+def bench_render():
+    from src.atlas import get_atlas
+    from src.manifest import resolve
+    from src import game1, game2, game3
+
+    results = {}
+    size = game1.CELL_NUMBER * game1.CELL_SIZE
+    screen = pygame.display.set_mode((size, size))
+    atlas = get_atlas()
+    font = pygame.font.Font(str(resolve("fonts/PressStart2P-Regular.ttf")), 25)
+    for length in RENDER_LENGTHS:
+        main = snake_of_length(length, game1.CELL_NUMBER, screen, font,
+                               atlas.sprite("snake_body"), atlas.sprite("strawberry"))
+        per_frame = median_time(main.draw_elements, number=50)
+        results[f"snake_draw_elements_ms_len{length}"] = (per_frame * 1000, "ms", False)
+
+    model = game2.DoggoModel()
+    view = game2.GameView(model)
+    view.open_window()
+    results["doggo_render_ms"] = (median_time(view.render, number=200) * 1000, "ms", False)
+
+    for crowd in CROWD_SIZES:
+        model = game2.DoggoModel(crowd, game2.CROWD_HIDDEN_DOGS, rng=random.Random(0))
+        view = game2.GameView(model)
+        view.open_window()
+        results[f"doggo_crowd_render_ms_n{crowd}"] = (
+            median_time(view.render, number=100) * 1000, "ms", False)
+        clicks = iter(random.Random(1).choices(
+            [(x, y) for x in range(0, model.SCREEN_WIDTH, 7) for y in range(0, model.SCREEN_HEIGHT, 7)],
+            k=5 * 20000))
+        per_click = median_time(lambda: model.check_click(next(clicks)), number=20000)
+        results[f"doggo_crowd_click_us_n{crowd}"] = (per_click * 1e6, "us", False)
+
+    results.update(bench_big_map())
+
+    loader = local_asset_loader(tempfile.mkdtemp(prefix="bench-cache-"))
+    for grid_size, key in ((4, "memory_draw_ms"), (32, "memory_draw_ms_grid32")):
+        model = game3.MemoryModel(grid_size, images=local_card_urls(), loader=loader)
+        loader.prefetcher.wait()
+        view = game3.MemoryView(model)
+        view.open_window()
+        model.flags[:] = bytes([game3.FACE_UP]) * model.card_count
+        results[key] = (median_time(lambda: full_draw(view), number=50) * 1000, "ms", False)
+        # a single flip only repaints one cell and the header
+        view.draw()
+        results[key + "_flip"] = (median_time(lambda: flip_draw(view), number=200) * 1000, "ms", False)
+    return results
+
+
+def bench_big_map():
+    """
+    Rendering the big map with warm tiles, fully zoomed out, and while
+    panning (streaming tiles in as it goes), plus the decoded tile memory.
+    """
+    from src import game2
+    from src.manifest import load_image
+    from src.tilemap import ZOOM_LEVELS, TileStore
+
+    model = game2.BigMapModel(rng=random.Random(0))
+    store = TileStore(load_image(game2.BIG_MAP_BACKGROUND), *model.world_size, "00",
+                      cache_dir=tempfile.mkdtemp(prefix="bench-tiles-"))
+    view = game2.BigMapView(model, store)
+    view.open_window()
+    results = {}
+    try:
+        for level, key in ((0, "doggo_bigmap_render_ms"), (ZOOM_LEVELS - 1, "doggo_bigmap_render_ms_zoomed_out")):
+            view.zoom(level - view.level, (model.SCREEN_WIDTH // 2, model.SCREEN_HEIGHT // 2))
+            settle_tiles(view)
+            results[key] = (median_time(view.render, number=50) * 1000, "ms", False)
+
+        view.zoom(-view.level, (0, 0))
+        settle_tiles(view)
+        results["doggo_bigmap_pan_ms"] = (
+            median_time(lambda: pan_frame(view), number=50) * 1000, "ms", False)
+        results["doggo_bigmap_tile_cache_mb"] = (view.tiles.byte_size() / 1e6, "MB", False)
+    finally:
+        store.close()
+    return results
+
+
+def settle_tiles(view):
+    while True:
+        view.update_tiles()
+        if not view.tiles.pending():
+            return
+        time.sleep(0.001)
+
+
+def pan_frame(view):
+    view.pan(37, 23)
+    view.update_tiles()
+    view.render()
+
+
+def full_draw(view):
+    view.full_redraw = True
+    view.draw()
+
+
+def flip_draw(view):
+    view.model.set_flags(0, view.model.flags[0] ^ 1)
+    view.draw()
+
+
+def bundled_images():
+    """
+    Logical names of the PNGs in the asset manifest.
+    """
+    from src.manifest import get_manifest
+
+    return sorted(name for name in get_manifest().entries
+                  if name.startswith("images/") and name.endswith(".png"))
+
+
+def local_card_urls():
+    """
+    Eight distinct file:// identifiers built from the bundled sprites.
+    """
+    from src.manifest import resolve
+
+    images = [resolve(name) for name in bundled_images()]
+    urls = []
+    for i in range(8):
+        urls.append(images[i % len(images)].as_uri() + f"#{i}")
+    return urls
+
+
+def local_asset_loader(cache_dir):
+    """
+    game3.AssetLoader whose card back is a bundled sprite, so benchmarks
+    stay off the network.
+    """
+    from src.asset_cache import DiskCache
+    from src.game3 import AssetLoader
+
+    class LocalAssetLoader(AssetLoader):
+        CARD_BACK_URL = local_card_urls()[0]
+
+    return LocalAssetLoader(DiskCache(cache_dir))
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves assets by logical name, resolved through the manifest.
+    """
+
+    def translate_path(self, path):
+        from src.manifest import find
+
+        name = path.split("?", 1)[0].split("#", 1)[0].lstrip("/")
+        found = find(name)
+        return str(found) if found is not None else ""
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_assets():
+    handler = QuietHandler
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_asset_loading():
+    from src.asset_cache import DiskCache
+    from src.game3 import AssetLoader
+
+    server = serve_assets()
+    base = f"http://127.0.0.1:{server.server_port}/"
+    urls = [base + name + f"?copy={i}" for i, name in enumerate(bundled_images() * 4)]
+    cache_dir = tempfile.mkdtemp(prefix="bench-cache-")
+    try:
+        timings = {}
+        for phase in ("cold", "warm"):
+            loader = AssetLoader(DiskCache(cache_dir))
+            start = time.perf_counter()
+            loader.prefetch(urls)
+            loader.prefetcher.wait()
+            for url in urls:
+                loader.poll_image(url)
+            timings[phase] = time.perf_counter() - start
+    finally:
+        server.shutdown()
+    return {
+        "asset_load_cold_ms": (timings["cold"] * 1000, "ms", False),
+        "asset_load_warm_ms": (timings["warm"] * 1000, "ms", False),
+    }
+
+
+def bench_arena():
+    """
+    One Snake Arena tick (vectorised step plus incremental redraw) at
+    ARENA_SNAKES snakes on the ARENA_SIZE board, once the arena has filled up.
+    """
+    from src import arena
+    from src.atlas import get_atlas
+
+    model = arena.ArenaModel(seed=0)
+    view = arena.ArenaView(model, get_atlas().sprite("strawberry"), pygame.font.SysFont(None, 22))
+    view.open_window()
+    for _ in range(500):
+        model.step()
+    view.draw()
+    step = median_time(model.step, number=200)
+    model.take_changes()
+
+    def tick():
+        model.step()
+        view.draw()
+
+    per_tick = median_time(tick, number=200)
+    return {
+        f"arena_step_ms_n{model.count}": (step * 1000, "ms", False),
+        f"arena_tick_ms_n{model.count}": (per_tick * 1000, "ms", False),
+        f"arena_ticks_per_sec_n{model.count}": (1 / per_tick, "ticks/s", True),
+    }
+
+
+def bench_scores():
+    """
+    Cold leaderboard reads against SCORE_SESSIONS stored sessions, and the
+    cost record() adds to a frame.
+    """
+    from src import scores
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scores.sqlite3"
+        store = scores.ScoreStore(path)
+        rng = random.Random(0)
+        games = sorted(scores.GAMES)
+        with store.conn:
+            store.conn.executemany(
+                "INSERT INTO sessions (game, score, rank_key, ended) VALUES (?, ?, ?, ?)",
+                ((games[i % len(games)], score, score, i)
+                 for i, score in ((i, rng.randrange(1000)) for i in range(SCORE_SESSIONS))))
+
+        def cold_top():
+            store.tops.clear()
+            for game in games:
+                store.top(game)
+
+        top = median_time(cold_top, number=20)
+        record = median_time(lambda: store.record("snake", rng.randrange(1000)), number=1000)
+        start = time.perf_counter()
+        store.flush()
+        flushed = time.perf_counter() - start
+        store.close()
+    return {
+        "scores_top_all_games_ms": (top * 1000, "ms", False),
+        "scores_record_us": (record * 1e6, "us", False),
+        "scores_flush_5000_ms": (flushed * 1000, "ms", False),
+    }
+
+
+def bench_menu_switch():
+    from src.controller import Controller
+    from src.scores import close_scores
+
+    controller = Controller()
+    # the puzzle deals bundled sprites instead of downloading its cards
+    controller.games.options["Puzzle Game"] = {
+        "images": local_card_urls(),
+        "loader": local_asset_loader(tempfile.mkdtemp(prefix="bench-cache-")),
+    }
+    results = {}
+    for name, rect in controller.buttons:
+        if name in NETWORK_SCENES:
+            continue
+        for visit in ("cold", "warm"):
+            # leave the game again as soon as its loop starts
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE))
+            start = time.perf_counter()
+            controller.handle_menu_events(rect.center)
+            elapsed = time.perf_counter() - start
+            key = "menu_switch_%s_%s_ms" % (name.lower().replace(" ", "_").replace("'", ""), visit)
+            results[key] = (elapsed * 1000, "ms", False)
+    controller.games.exit_all()
+    close_scores()
+    return results
+
+
+def bench_replay():
+    from src import replay
+
+    if not RECORD_DIR:
+        return {}
+    totals = {}
+    for path in sorted(Path(RECORD_DIR).glob("*.ggr")):
+        session = replay.Session.load(path)
+        start = time.perf_counter()
+        matches, _ = replay.replay(session)
+        elapsed = time.perf_counter() - start
+        if not matches:
+            raise AssertionError(f"{path.name} no longer replays to its recorded state")
+        events, seconds = totals.get(session.game, (0, 0.0))
+        totals[session.game] = (events + len(session.events), seconds + elapsed)
+    return {f"replay_events_per_sec_{game}": (events / seconds, "events/s", True)
+            for game, (events, seconds) in totals.items() if seconds > 0}
+
+
+BENCHMARKS = {
+    "snake_ticks": bench_snake_ticks,
+    "render": bench_render,
+    "asset_loading": bench_asset_loading,
+    "arena": bench_arena,
+    "scores": bench_scores,
+    "menu_switch": bench_menu_switch,
+    "replay": bench_replay,
+}
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names):
+    # relative asset paths in the games are resolved from the project root
+    os.chdir(ROOT)
+    with tempfile.TemporaryDirectory(prefix="bench-data-") as sandbox:
+        # read when the game modules are imported, which happens below
+        os.environ["GAME_DATA_DIR"] = sandbox
+        os.environ["GAME_SCORES_DB"] = str(Path(sandbox) / "scores.sqlite3")
+        os.environ["GAME_CACHE_DIR"] = str(Path(sandbox) / "cache")
+        os.environ.pop("GAME_RECORD_DIR", None)
+
+        pygame.init()
+        pygame.mixer.init()
+        pygame.display.set_mode((1, 1))
+
+        report = {"revision": git_revision(), "timestamp": time.time(), "metrics": {}, "errors": {}}
+        for name in names:
+            try:
+                for key, (value, unit, higher_is_better) in BENCHMARKS[name]().items():
+                    report["metrics"][key] = {
+                        "value": value, "unit": unit, "higher_is_better": higher_is_better}
+            except Exception:
+                report["errors"][name] = traceback.format_exc(limit=3)
+        pygame.quit()
+    return report
+
+
+def compare(report, baseline, threshold):
+    """
+    Metrics that got worse than the baseline by more than threshold.
+    """
+    regressions = []
+    for key, old in baseline.get("metrics", {}).items():
+        new = report["metrics"].get(key)
+        if new is None or old["value"] == 0:
+            continue
+        change = (new["value"] - old["value"]) / old["value"]
+        if old["higher_is_better"]:
+            change = -change
+        if change > threshold:
+            regressions.append((key, old["value"], new["value"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed relative regression (default 0.15)")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    args = parser.parse_args(argv)
+
+    output = Path(args.output).resolve()
+    baseline_path = Path(args.baseline).resolve() if args.baseline else None
+    report = run(args.only)
+    output.write_text(json.dumps(report, indent=2))
+
+    for key, metric in sorted(report["metrics"].items()):
+        print(f"{key:45s} {metric['value']:12.3f} {metric['unit']}")
+    for name, error in report["errors"].items():
+        print(f"{name}: FAILED\n{error}", file=sys.stderr)
+
+    status = 1 if report["errors"] else 0
+    if baseline_path is not None:
+        baseline = json.loads(baseline_path.read_text())
+        for key, old, new, change in compare(report, baseline, args.threshold):
+            print(f"REGRESSION {key}: {old:.3f} -> {new:.3f} ({change:+.0%})", file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
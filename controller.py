@@ -1,75 +1,163 @@
 import pygame
 import sys
-from src import game1
-from src import game2
-from src import game3
-from src import game4
+from src.audio import get_audio
+from src.lifecycle import QUIT_APP, GameRegistry
+from src.manifest import MissingAssetsError, get_manifest
+from src.profiler import FrameProfiler
+from src.scheduler import IdleScheduler
+from src.scores import close_scores, get_scores
+from src.text_cache import render_text
 
 SCREEN_WIDTH = 900
 SCREEN_HEIGHT = 700
 BUTTON_WIDTH = 300
 BUTTON_HEIGHT = 70
 BUTTON_SPACING = 100
+# menu entry -> its leaderboard in src.scores
+LEADERBOARDS = {
+    "Strawberry Snake": "snake",
+    "Where's Doggo": "doggo",
+    "Doggo Crowd": "doggo-crowd",
+    "Doggo Big Map": "doggo-bigmap",
+    "Puzzle Game": "memory",
+}
+# best scores shown beside each button
+MENU_SCORES = 3
 
 class Controller:
     def __init__(self):
         pygame.init()
         pygame.mixer.init()
+        # starts decoding the sound effects in the background
+        self.audio = get_audio()
+        self.check_assets()
 
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
+        self.open_menu()
         self.font = pygame.font.SysFont(None,48)
         self.small_font = pygame.font.SysFont(None, 28)
         self.clock = pygame.time.Clock()
-        pygame.display.set_caption("Game Menu")
+        self.profiler = FrameProfiler("menu")
+        self.scheduler = IdleScheduler()
+
+        # game modules are only imported the first time they're picked
+        self.games = GameRegistry([
+            ("Strawberry Snake", ("src.game1", "Game")),
+            ("Where's Doggo", ("src.game2", "GameController")),
+            ("Doggo Crowd", ("src.game2", "CrowdGameController")),
+            ("Doggo Big Map", ("src.game2", "BigMapGameController")),
+            ("Snake Arena", ("src.arena", "ArenaGame")),
+            ("Snake LAN", ("src.netplay", "NetSnakeGame")),
+            ("Puzzle Game", ("src.game3", "MemoryGameController")),
+            ("game 4", ("src.game4", None)),
+        ])
 
-        self.games = {
-            "Strawberry Snake": game1,
-            "Where's Doggo": game2,
-            "Puzzle Game": game3,
-            "game 4": game4
-        }
-        
         self.buttons = []
         self.create_buttons()
+        # read the leaderboards now; after this they're kept in memory
+        self.scores = get_scores()
+        for name in LEADERBOARDS.values():
+            self.scores.top(name)
+
+    @staticmethod
+    def check_assets():
+        """
+        Report every missing or changed asset up front, in one go.
+        """
+        missing, changed = get_manifest().verify()
+        for name in missing:
+            print(f"missing asset: {name}", file=sys.stderr)
+        for name in changed:
+            print(f"changed asset: {name} (run python -m src.manifest --build)", file=sys.stderr)
+
+    def open_menu(self):
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
+        pygame.display.set_caption("Game Menu")
 
     def create_buttons(self):
         y = 200
-        for name in self.games.keys():
+        names = self.games.names()
+        # squeeze the buttons together once they would run off the window
+        spacing = min(BUTTON_SPACING, (SCREEN_HEIGHT - y - 10) // len(names))
+        height = min(BUTTON_HEIGHT, spacing - 10)
+        for name in names:
             rect = pygame.Rect(
-                SCREEN_WIDTH //2 - BUTTON_WIDTH//2,y, BUTTON_WIDTH, BUTTON_HEIGHT)
+                SCREEN_WIDTH //2 - BUTTON_WIDTH//2,y, BUTTON_WIDTH, height)
             self.buttons.append((name,rect))
-            y+=BUTTON_SPACING
+            y+=spacing
 
     def run(self):
         running = True
 
         while running:
-            for event in pygame.event.get():
+            # the menu is static: sleep until input or an overlay refresh
+            events = self.scheduler.wait(self.profiler.refresh_timeout())
+            self.profiler.begin_frame()
+            for event in events:
                 if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
+                    self.quit()
 
                 if event.type == pygame.MOUSEBUTTONDOWN:
                     self.handle_menu_events(event.pos)
 
-            self.draw_menu()
-            pygame.display.flip()
+                if self.profiler.handle_event(event):
+                    self.scheduler.invalidate()
+            self.profiler.mark("events")
+
+            if self.scheduler.should_draw():
+                self.draw_menu()
+                self.profiler.draw_overlay(self.screen)
+                self.profiler.mark("draw")
+                pygame.display.flip()
+                self.profiler.mark("flip")
             self.clock.tick(60)
+            self.profiler.end_frame()
 
     def handle_menu_events(self, mouse_pos):
         for name, rect in self.buttons:
             if rect.collidepoint(mouse_pos):
-                game_module = self.games[name]
-                game_module.main()
+                try:
+                    result = self.games.play(name)
+                except MissingAssetsError as exc:
+                    # stay in the menu; the game can be retried once the
+                    # files are back
+                    print(f"{name}: {exc}", file=sys.stderr)
+                    self.open_menu()
+                    self.scheduler.invalidate()
+                    return
+                if result is None:
+                    return
+                if result == QUIT_APP:
+                    self.quit()
+                self.open_menu()
+                self.scheduler.invalidate()
+                # drop input meant for the game we just left
+                pygame.event.clear()
+                return
+
+    def quit(self):
+        self.games.exit_all()
+        close_scores()
+        pygame.quit()
+        sys.exit()
 
     def draw_menu(self):
         self.screen.fill((35,35,35))
 
-        title = self.font.render("Game Title",True, (255,255,255))
+        title = render_text(self.font,"Game Title",True, (255,255,255))
         self.screen.blit(title, (SCREEN_WIDTH//2-title.get_width()//2,100))
 
         for name, rect in self.buttons:
             pygame.draw.rect(self.screen, (255,105,180), rect, border_radius = 15)
-            label = self.small_font.render(name,True,(0,0,0))
+            label = render_text(self.small_font,name,True,(0,0,0))
             label_rect = label.get_rect(center=rect.center)
             self.screen.blit(label,label_rect)
+            self.draw_best(name, rect)
+
+    def draw_best(self, name, rect):
+        if name not in LEADERBOARDS:
+            return
+        best = self.scores.top_scores(LEADERBOARDS[name])[:MENU_SCORES]
+        if not best:
+            return
+        text = render_text(self.small_font, "Best: " + "  ".join(map(str, best)), True, (200,200,200))
+        self.screen.blit(text, text.get_rect(midleft=(rect.right + 20, rect.centery)))
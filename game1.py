@@ -1,170 +1,544 @@
 import random
 import pygame
-import sys
+from array import array
 from pygame.math import Vector2 
+from src.atlas import get_atlas
+from src.audio import get_audio
+from src.lifecycle import BACK_TO_MENU, QUIT_APP, GameScene, run_standalone
+from src.pathfinding import PathAssist
+from src.profiler import FrameProfiler
+from src.replay import KEY, TICK, Recorder, new_seed
+from src.scheduler import REDRAW_EVENTS
+from src.scores import get_scores
+from src.text_cache import render_text
+from src.view import GameLoop
 
 CELL_SIZE = 40
 CELL_NUMBER = 20
 BACKGROUND_COLOR = (255,209,220)
 TITLE_TEXT = "SANA'S STRAWBERRY SNAKE GAME"
+# fruit spawns in columns SPAWN_MIN_X and up unless a spawn region is given
+SPAWN_MIN_X = 9
+KEY_DIRECTIONS = {
+    pygame.K_UP: Vector2(0,-1),
+    pygame.K_DOWN: Vector2(0,1),
+    pygame.K_LEFT: Vector2(-1,0),
+    pygame.K_RIGHT: Vector2(1,0),
+}
+HINT_KEY = pygame.K_h
+AUTOPILOT_KEY = pygame.K_a
+HINT_COLOR = (255,85,163)
+# seconds per snake move
+TICK_SECONDS = 0.15
+
+class FreeCells:
+    """
+    Indexed set of the empty cells inside the fruit spawn region.
+
+    Free cells are packed at the front of an array and each cell remembers
+    its slot, so adding and removing swap with the last entry and picking a
+    random free cell is O(1) no matter how full the board gets.
+    """
+
+    OUTSIDE = -2
+    TAKEN = -1
+
+    def __init__(self, cell_number=CELL_NUMBER, region=None):
+        """
+        region is (left, top, right, bottom) in cells, right/bottom exclusive.
+        """
+        if region is None:
+            region = (min(SPAWN_MIN_X, cell_number - 1), 0, cell_number, cell_number)
+        left, top, right, bottom = region
+        self.cell_number = cell_number
+        self.region = region
+        self.slot = array('i', [self.OUTSIDE]) * (cell_number * cell_number)
+        self.cells = array('i')
+        for y in range(top, bottom):
+            for x in range(left, right):
+                cell = y * cell_number + x
+                self.slot[cell] = len(self.cells)
+                self.cells.append(cell)
+        self.count = len(self.cells)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, cell):
+        return self.slot[cell] >= 0
+
+    def add(self, cell):
+        if self.slot[cell] != self.TAKEN:
+            return
+        self.cells[self.count] = cell
+        self.slot[cell] = self.count
+        self.count += 1
+
+    def discard(self, cell):
+        index = self.slot[cell]
+        if index < 0:
+            return
+        self.count -= 1
+        last = self.cells[self.count]
+        self.cells[index] = last
+        self.slot[last] = index
+        self.cells[self.count] = cell
+        self.slot[cell] = self.TAKEN
+
+    def choice(self, rng):
+        if self.count == 0:
+            return None
+        return self.cells[rng.randrange(self.count)]
 
 class Snake:
-    def __init__(self):
-        self.body = [Vector2(5,10), Vector2(4,10), Vector2(3,10)]
-        self.direc = Vector2(1,0)
+    """
+    Body cells are stored as integer indices (y * cell_number + x) in a
+    fixed-size ring buffer, with an occupancy bitmap for constant-time
+    self-collision checks, so moving never copies the body.
+    """
+
+    def __init__(self, cell_number=CELL_NUMBER, free_cells=None, start=None):
+        """
+        start is (head x, head y, direction); the body trails behind the
+        head. Defaults to the single-player start, heading right.
+        """
+        self.cell_number = cell_number
+        self.free_cells = free_cells if free_cells is not None else FreeCells(cell_number)
+        # one spare slot for the final, crashing move on a full board
+        self.capacity = cell_number * cell_number + 1
+        self.cells = array('i', bytes(4 * self.capacity))
+        self.occupied = bytearray(cell_number * cell_number)
+        self.head_index = 0
+        self.length = 0
+        self.bitten = False
+        if start is None:
+            start = (5, cell_number // 2, Vector2(1,0))
+        x, y, direc = start
+        for i in range(3):
+            self.add_tail(x - i * int(direc.x), y - i * int(direc.y))
+        self.head_x, self.head_y = x, y
+        # cell freed by the last move, or -1 if the snake grew instead
+        self.vacated = -1
+        self.direc = Vector2(direc)
         self.new_block = False
 
-            #pygame.draw.rect(screen,(143,111,122),body_part)
+    def add_tail(self, x, y):
+        cell = y * self.cell_number + x
+        self.cells[(self.head_index + self.length) % self.capacity] = cell
+        self.occupied[cell] = 1
+        self.free_cells.discard(cell)
+        self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    def iter_cells(self):
+        """
+        Yield occupied cell indices from head to tail.
+        """
+        cells, capacity = self.cells, self.capacity
+        for i in range(self.head_index, self.head_index + self.length):
+            yield cells[i % capacity]
+
+    @property
+    def body(self):
+        n = self.cell_number
+        return [Vector2(cell % n, cell // n) for cell in self.iter_cells() if cell >= 0]
+
+    @property
+    def head_cell(self):
+        return self.cells[self.head_index]
+
+    @property
+    def tail_cell(self):
+        return self.cells[(self.head_index + self.length - 1) % self.capacity]
 
     def move_snake(self):
+        n = self.cell_number
+        x = self.head_x + int(self.direc.x)
+        y = self.head_y + int(self.direc.y)
+        self.head_x, self.head_y = x, y
+
         if self.new_block == True:
-            body_copy = self.body[:]
-            body_copy.insert(0,body_copy[0]+self.direc)
-            self.body = body_copy[:]
             self.new_block = False
+            self.vacated = -1
         else:
-            body_copy = self.body[:-1]
-            body_copy.insert(0,body_copy[0]+self.direc)
-            self.body = body_copy[:]
+            tail = self.tail_cell
+            self.occupied[tail] = 0
+            self.free_cells.add(tail)
+            self.vacated = tail
+            self.length -= 1
+
+        if 0 <= x < n and 0 <= y < n:
+            cell = y * n + x
+            if self.occupied[cell]:
+                self.bitten = True
+            self.occupied[cell] = 1
+            self.free_cells.discard(cell)
+        else:
+            # off the board: kept as a placeholder until the game ends
+            cell = -1
+        self.head_index = (self.head_index - 1) % self.capacity
+        self.cells[self.head_index] = cell
+        self.length += 1
 
     def extend_snake(self):
         self.new_block = True
 
-class Fruit:
-    def __init__(self):
-        self.x = random.randint(9,CELL_NUMBER-1)
-        self.y = random.randint(0,CELL_NUMBER-1)
-        self.pos = Vector2(self.x,self.y)
+    def turn(self, direc):
+        # the snake can't reverse straight back into its own neck
+        if direc.x == -self.direc.x and direc.y == -self.direc.y:
+            return
+        self.direc = Vector2(direc)
 
+class Fruit:
+    def __init__(self, rng=None, cell_number=CELL_NUMBER, free_cells=None):
+        self.rng = rng if rng is not None else random
+        self.cell_number = cell_number
+        self.free_cells = free_cells if free_cells is not None else FreeCells(cell_number)
+        self.change_fruit_loc()
 
     def change_fruit_loc(self):
-        self.x = random.randint(9,CELL_NUMBER-1)
-        self.y = random.randint(0,CELL_NUMBER-1)
+        cell = self.free_cells.choice(self.rng)
+        if cell is None:
+            # the spawn region is full; park the fruit off the board
+            self.x, self.y = -1, -1
+        else:
+            self.x, self.y = cell % self.cell_number, cell // self.cell_number
         self.pos = Vector2(self.x,self.y)
 
 class Main:
-    def __init__(self,screen,font,snake_image,fruit_image):
-        self.snake = Snake()
-        self.fruit = Fruit()
+    def __init__(self,screen=None,font=None,snake_image=None,fruit_image=None,rng=None,cell_number=CELL_NUMBER,spawn_region=None):
+        self.cell_number = cell_number
+        self.free_cells = FreeCells(cell_number,spawn_region)
+        self.snake = Snake(cell_number,self.free_cells)
+        self.fruit = Fruit(rng,cell_number,self.free_cells)
         self.screen = screen
         self.font = font
         self.snake_image = snake_image
         self.fruit_image = fruit_image
 
+        # retained-mode rendering state, see draw_changes()
+        self.full_redraw = True
+        self.dirty = []
+        self.title_surface = None
+        self.shown_score = None
+        self.game_ended = False
+        # cell outlined as the assist's suggested next move, or -1
+        self.hint_cell = -1
+        # how far through the last move the snake is drawn, see draw_changes()
+        self.alpha = 1.0
+        self.moved = False
+        self.motion_rects = []
+
+    def snapshot(self):
+        """
+        Final state compared by replays.
+        """
+        return {
+            "body": [[int(block.x), int(block.y)] for block in self.snake.body],
+            "direction": [int(self.snake.direc.x), int(self.snake.direc.y)],
+            "fruit": [self.fruit.x, self.fruit.y],
+            "ended": self.game_ended,
+        }
+
     def update(self):
         self.snake.move_snake()
+        self.moved = True
         self.check_collision()
         self.fail()
+        self.mark_cell(self.snake.head_cell)
+        self.mark_cell(self.snake.vacated)
 
     def check_collision(self):
-        if self.fruit.pos == self.snake.body[0]:
+        if self.fruit.x == self.snake.head_x and self.fruit.y == self.snake.head_y:
             self.fruit.change_fruit_loc()
             self.snake.extend_snake()
+            if self.fruit.x >= 0:
+                self.mark_cell(self.fruit.y*self.cell_number + self.fruit.x)
+
+    def mark_cell(self, cell):
+        # nothing to redraw when running without a display
+        if cell < 0 or self.screen is None:
+            return
+        x, y = cell % self.cell_number, cell // self.cell_number
+        self.dirty.append(pygame.Rect(x*CELL_SIZE,y*CELL_SIZE,CELL_SIZE,CELL_SIZE))
 
     def fail(self):
-        if self.snake.body[0].x < 0 or self.snake.body[0].x >= CELL_NUMBER:
-            self.game_over()
-        if self.snake.body[0].y < 0 or self.snake.body[0].y >= CELL_NUMBER:
+        if self.crash_cause() is not None:
             self.game_over()
-        for block in self.snake.body[1:]:
-            if block == self.snake.body[0]:
-                self.game_over()
+
+    def crash_cause(self):
+        snake = self.snake
+        if snake.head_x < 0 or snake.head_x >= self.cell_number:
+            return "wall"
+        if snake.head_y < 0 or snake.head_y >= self.cell_number:
+            return "wall"
+        if snake.bitten:
+            return "self"
+        return None
 
     def game_over(self):
-        pygame.quit()
-        sys.exit()
+        self.game_ended = True
+
+    def set_hint(self, cell):
+        if cell != self.hint_cell:
+            self.mark_cell(self.hint_cell)
+            self.mark_cell(cell)
+            self.hint_cell = cell
 
     def draw_elements(self):
         self.screen.fill(BACKGROUND_COLOR)
         self.draw_snake()
         self.draw_fruit()
+        self.draw_hint()
+        self.write_scor()
+        self.title()
+
+    def draw_changes(self, alpha=1.0):
+        """
+        Redraw only the cells touched since the last call (plus the score
+        when it changes) and return their rects for pygame.display.update().
+        Returns an empty list when nothing changed.
+
+        With alpha below 1 the head and tail are drawn that far through the
+        last move instead of jumping a whole cell per tick.
+        """
+        if alpha < 1 or self.alpha < 1:
+            motion = self.motion_areas(alpha)
+            self.dirty += self.motion_rects + motion
+            self.motion_rects = motion
+        self.alpha = alpha
+
+        if self.full_redraw:
+            self.full_redraw = False
+            self.dirty = []
+            self.draw_elements()
+            return [self.screen.get_rect()]
+
+        if self.shown_score != len(self.snake) - 3:
+            old_area = self.score_area
+            self.render_score()
+            self.dirty.append(old_area.union(self.score_area))
+
+        rects = self.dirty
+        self.dirty = []
+        for rect in rects:
+            self.redraw_rect(rect)
+        return rects
+
+    def redraw_rect(self, rect):
+        self.screen.set_clip(rect)
+        self.screen.fill(BACKGROUND_COLOR)
+        n = self.cell_number
+        occupied = self.snake.occupied
+        moves = self.moves()
+        sliding = {end for _, end in moves}
+        for y in range(max(0, rect.top // CELL_SIZE), min(n, (rect.bottom - 1) // CELL_SIZE + 1)):
+            for x in range(max(0, rect.left // CELL_SIZE), min(n, (rect.right - 1) // CELL_SIZE + 1)):
+                if occupied[y*n + x] and y*n + x not in sliding:
+                    self.screen.blit(self.snake_image,(x*CELL_SIZE,y*CELL_SIZE))
+        self.draw_sliding(moves)
+        self.draw_fruit()
+        self.draw_hint()
+        # text overlaps the board, so it is redrawn clipped to the dirty rect
         self.write_scor()
         self.title()
+        self.screen.set_clip(None)
 
     def draw_snake(self):
-        for block in self.snake.body:
-            body_part = pygame.Rect(int(block.x*CELL_SIZE),int(block.y*CELL_SIZE),CELL_SIZE,CELL_SIZE)
-            self.screen.blit(self.snake_image,body_part)
+        moves = self.moves()
+        sliding = {end for _, end in moves}
+        n = self.cell_number
+        for cell in self.snake.iter_cells():
+            if cell >= 0 and cell not in sliding:
+                self.screen.blit(self.snake_image,(cell % n * CELL_SIZE,cell // n * CELL_SIZE))
+        self.draw_sliding(moves)
+
+    def moves(self):
+        """
+        (from cell, to cell) of the head and, unless the snake grew, the
+        tail in the last move, while they are drawn part-way through it.
+        """
+        snake = self.snake
+        if self.alpha >= 1 or not self.moved or len(snake) < 2:
+            return []
+        moves = []
+        neck = snake.cells[(snake.head_index + 1) % snake.capacity]
+        if snake.head_cell >= 0 and neck >= 0:
+            moves.append((neck, snake.head_cell))
+        if snake.vacated >= 0:
+            moves.append((snake.vacated, snake.tail_cell))
+        return moves
+
+    def draw_sliding(self, moves):
+        n = self.cell_number
+        for start, end in moves:
+            x = start % n + (end % n - start % n) * self.alpha
+            y = start // n + (end // n - start // n) * self.alpha
+            self.screen.blit(self.snake_image,(round(x*CELL_SIZE),round(y*CELL_SIZE)))
+
+    def motion_areas(self, alpha):
+        """
+        Rects covering both cells of every move drawn at alpha.
+        """
+        before = self.alpha
+        self.alpha = alpha
+        n = self.cell_number
+        rects = []
+        for start, end in self.moves():
+            a = pygame.Rect(start % n * CELL_SIZE,start // n * CELL_SIZE,CELL_SIZE,CELL_SIZE)
+            rects.append(a.union(pygame.Rect(end % n * CELL_SIZE,end // n * CELL_SIZE,CELL_SIZE,CELL_SIZE)))
+        self.alpha = before
+        return rects
+
+    def draw_hint(self):
+        if self.hint_cell < 0:
+            return
+        x, y = self.hint_cell % self.cell_number, self.hint_cell // self.cell_number
+        pygame.draw.rect(self.screen,HINT_COLOR,(x*CELL_SIZE,y*CELL_SIZE,CELL_SIZE,CELL_SIZE),3)
 
     def draw_fruit(self):
         fruit_rect = pygame.Rect(int(self.fruit.pos.x*CELL_SIZE),int(self.fruit.pos.y*CELL_SIZE),CELL_SIZE,CELL_SIZE)
         self.screen.blit(self.fruit_image,fruit_rect)
 
     def title(self):
-        title = "SANA'S STRAWBERRY SNAKE GAME"
-        title_surface = self.font.render(title,True,(255,85,163))
-        title_x = int(CELL_SIZE*CELL_NUMBER-400)
-        title_y = int(CELL_SIZE*CELL_NUMBER-770)
-        title_rect = title_surface.get_rect(center = (title_x,title_y))
-        self.screen.blit(title_surface,title_rect)
+        if self.title_surface is None:
+            self.title_surface = render_text(self.font,TITLE_TEXT,True,(255,85,163))
+            title_x = int(CELL_SIZE*CELL_NUMBER-400)
+            title_y = int(CELL_SIZE*CELL_NUMBER-770)
+            self.title_rect = self.title_surface.get_rect(center = (title_x,title_y))
+        self.screen.blit(self.title_surface,self.title_rect)
 
-    def write_scor(self):
-        score = str(len(self.snake.body) - 3)
-        score_surface = self.font.render(score,True,(255,85,163))
+    def render_score(self):
+        self.shown_score = len(self.snake) - 3
+        self.score_surface = render_text(self.font,str(self.shown_score),True,(255,85,163))
         score_x = int(CELL_SIZE*CELL_NUMBER-60)
         score_y = int(CELL_SIZE*CELL_NUMBER -40)
-        score_rect = score_surface.get_rect(center = (score_x,score_y))
-        strawberry_rect = self.fruit_image.get_rect(midright=(score_rect.left,score_rect.centery))
-        self.screen.blit(score_surface,score_rect)
-        self.screen.blit(self.fruit_image,strawberry_rect)
+        self.score_rect = self.score_surface.get_rect(center = (score_x,score_y))
+        self.strawberry_rect = self.fruit_image.get_rect(midright=(self.score_rect.left,self.score_rect.centery))
+        self.score_area = self.score_rect.union(self.strawberry_rect)
 
+    def write_scor(self):
+        if self.shown_score != len(self.snake) - 3:
+            self.render_score()
+        self.screen.blit(self.score_surface,self.score_rect)
+        self.screen.blit(self.fruit_image,self.strawberry_rect)
+
+
+class Game(GameScene):
+    assets = ("images/strawberry4.png", "images/snake_body.png", "fonts/PressStart2P-Regular.ttf")
 
-class Game:
     def __init__(self):
-        pygame.init()
-        pygame.mixer.init()
+        super().__init__()
+        self.main_game = None
+        self.recorder = None
+        self.assist = None
+        self.show_hint = False
+        self.autopilot = False
+        # whether the autopilot played any part of this round
+        self.assisted = False
+        self.profiler = FrameProfiler("snake")
+        self.loop = GameLoop(self.handle_events, self.draw, step=self.tick,
+                             step_seconds=TICK_SECONDS, profiler=self.profiler)
 
+    def open_window(self):
         self.screen = pygame.display.set_mode((CELL_NUMBER*CELL_SIZE,CELL_NUMBER*CELL_SIZE))
-        self.clock = pygame.time.Clock()
-        pygame.mixer.music.load('assets/music/game1.wav') 
-        pygame.mixer.music.play(-1,0.0)
-        self.SCREEN_UPDATE = pygame.USEREVENT
-        pygame.time.set_timer(self.SCREEN_UPDATE,150)
-
-        fruit_image = pygame.image.load('assets/images/strawberry4.png').convert_alpha()
-        fruit_image = pygame.transform.scale(fruit_image,(40,40))
-        snake_image = pygame.image.load('assets/images/snake_body.png').convert_alpha()
-        snake_image = pygame.transform.scale(snake_image,(40,40))
-        font = pygame.font.Font("assets/fonts/PressStart2P-Regular.ttf",25)
-        SCREEN_UPDATE = pygame.USEREVENT
-        pygame.time.set_timer(SCREEN_UPDATE,150)
-        self.main_game = Main(self.screen,font,snake_image,fruit_image)
+        pygame.display.set_caption(TITLE_TEXT)
+
+    def load(self):
+        atlas = get_atlas()
+        self.fruit_image = atlas.sprite("strawberry")
+        self.snake_image = atlas.sprite("snake_body")
+        self.font = pygame.font.Font(str(self.resources["fonts/PressStart2P-Regular.ttf"]),25)
+        self.audio = get_audio()
+        super().load()
+
+    def enter(self):
+        super().enter()
+        self.open_window()
+        self.recorder = Recorder("snake", new_seed())
+        self.main_game = Main(self.screen,self.font,self.snake_image,self.fruit_image,
+                              rng=random.Random(self.recorder.seed))
+        self.assist = PathAssist(self.main_game)
+        self.assisted = self.autopilot
+        self.audio.play_music("snake")
+        self.loop.resume()
+
+    def resume(self):
+        self.open_window()
+        self.main_game.screen = self.screen
+        self.main_game.full_redraw = True
+        self.audio.play_music("snake")
+        # the time spent in the menu isn't owed as moves
+        self.loop.resume()
+
+    def suspend(self):
+        # the music plays on into the menu and fades into the next game's
+        if self.main_game is not None:
+            self.recorder.save(self.main_game.snapshot())
 
     def run(self):
-        while True:
-            self.handle_events()
-            self.main_game.draw_elements()
-            pygame.display.update()
-            self.clock.tick(60)
-
-    def handle_events(self):
-        for event in pygame.event.get():
+        self.result = None
+        self.loop.run()
+        return self.result
+
+    def draw(self, alpha):
+        # the snake slides between cells instead of jumping once per tick
+        return self.main_game.draw_changes(alpha)
+
+    def handle_events(self, events):
+        for event in events:
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == self.SCREEN_UPDATE:
-                self.main_game.update()
+                self.result = QUIT_APP
+            if event.type in REDRAW_EVENTS:
+                self.main_game.full_redraw = True
+            if self.profiler.handle_event(event):
+                self.main_game.full_redraw = True
             if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.result = BACK_TO_MENU
                 self.handle_keydown(event.key)
+        if self.result is not None:
+            self.loop.stop()
+
+    def tick(self):
+        if self.autopilot:
+            direction = self.assist.suggest()
+            if direction is not None:
+                # recorded as the key that would make the same turn
+                self.handle_keydown(next(k for k, d in KEY_DIRECTIONS.items() if d == direction))
+        self.recorder.record(TICK)
+        self.main_game.update()
+        if self.main_game.game_ended:
+            self.audio.play("game_over")
+            self.record_score()
+            self.active = False
+            self.result = BACK_TO_MENU
+            self.loop.stop()
+        elif self.main_game.snake.new_block:
+            self.audio.play("eat")
+        if self.show_hint and not self.main_game.game_ended:
+            self.main_game.set_hint(self.assist.suggest_cell())
 
     def handle_keydown(self, key):
-        snake = self.main_game.snake
-        if key == pygame.K_UP:
-            if snake.direc.y != 1:
-                snake.direc = Vector2(0,-1)
-        if key == pygame.K_DOWN:
-            if snake.direc.y != -1:
-                snake.direc = Vector2(0,1)
-        if key == pygame.K_LEFT:
-            if snake.direc.x != 1:
-                snake.direc = Vector2(-1,0)
-        if key == pygame.K_RIGHT:
-            if snake.direc.x != -1:
-                snake.direc = Vector2(1,0)
+        if key in KEY_DIRECTIONS:
+            self.recorder.record(KEY, key)
+            self.main_game.snake.turn(KEY_DIRECTIONS[key])
+        elif key == HINT_KEY:
+            self.show_hint = not self.show_hint
+            self.main_game.set_hint(self.assist.suggest_cell() if self.show_hint else -1)
+        elif key == AUTOPILOT_KEY:
+            self.autopilot = not self.autopilot
+            self.assisted = self.assisted or self.autopilot
+
+    def record_score(self):
+        # autopilot rounds are kept, but not ranked
+        get_scores().record("snake", len(self.main_game.snake) - 3, ranked=not self.assisted,
+                            details={"cause": self.main_game.crash_cause()})
 
 def main():
-    app = Game()
-    app.run()
+    run_standalone(Game())
 
 if __name__ == "__main__":
     main()
@@ -1,59 +1,285 @@
+import math
 import pygame
 import random
 from pygame import Surface
+from src.atlas import get_atlas
+from src.audio import get_audio
+from src.lifecycle import BACK_TO_MENU, QUIT_APP, GameScene, run_standalone
+from src.manifest import resolve, sha256_of
+from src.profiler import FrameProfiler
+from src.replay import CLICK, Recorder, new_seed
+from src.scheduler import IdleScheduler
+from src.scores import get_scores
+from src.spatial import SpatialHash, poisson_disc
+from src.text_cache import render_text
+from src.tilemap import TILE_SIZE, ZOOM_LEVELS, TileCache, TileStore, tile_range
+from src.view import GameLoop
 
-class GameController:
+FOUND_GOAL = 10
+# crowd mode: how many sprites share the field and how many are real dogs
+CROWD_SIZE = 1500
+CROWD_HIDDEN_DOGS = 5
+DOG = 0
+# big map mode: the field is a world this large, one sprite per
+# BIG_MAP_SPACING square, viewed through the window
+BIG_MAP_SIZE = (20000, 20000)
+BIG_MAP_SPACING = 140
+BIG_MAP_HIDDEN_DOGS = 25
+BIG_MAP_BACKGROUND = "images/pygamebg3.png"
+# window pixels per second when panning with the keyboard, moved on in
+# fixed steps of PAN_STEP seconds
+PAN_SPEED = 900
+PAN_STEP = 1 / 60
+# shown where a tile hasn't streamed in yet
+LOADING_COLOR = (60, 90, 60)
+PAN_KEYS = {
+    pygame.K_LEFT: (-1, 0), pygame.K_a: (-1, 0),
+    pygame.K_RIGHT: (1, 0), pygame.K_d: (1, 0),
+    pygame.K_UP: (0, -1), pygame.K_w: (0, -1),
+    pygame.K_DOWN: (0, 1), pygame.K_s: (0, 1),
+}
 
-    def __init__(self):
-        self.model = DoggoModel()
-        self.view = GameView(self.model)
-        self.clock = pygame.time.Clock()
-        self.running = True
+class GameController(GameScene):
+    assets = ("images/annoyingdog.png", "images/annoyingdog_smallest.png",
+              "images/pygamebg3.png", "images/strawberry4.png")
+    # leaderboard in src.scores
+    score_game = "doggo"
+
+    def __init__(self, crowd_size=0, hidden_dogs=1):
+        super().__init__()
+        self.crowd_size = crowd_size
+        self.hidden_dogs = hidden_dogs
+        self.model = None
+        self.view = None
+        self.recorder = None
+        self.loop = None
+        self.profiler = FrameProfiler("doggo-crowd" if crowd_size else "doggo")
+        self.scheduler = IdleScheduler()
+
+    def open_window(self):
+        if self.view is not None:
+            self.view.open_window()
+        else:
+            pygame.display.set_mode(DoggoModel.SCREEN_SIZE)
+
+    def load(self):
+        # the atlas converts sprites to the display format, so this needs a
+        # window (the menu's or our own) to exist already
+        self.model = self.create_model()
+        self.view = self.create_view()
+        self.loop = self.create_loop()
+        self.audio = get_audio()
+        super().load()
+
+    def create_model(self):
+        return DoggoModel(self.crowd_size, self.hidden_dogs)
+
+    def create_view(self):
+        return GameView(self.model)
+
+    def create_loop(self):
+        # nothing moves between clicks, so the loop sleeps until the next event
+        return GameLoop(self.handle_events, self.draw, update=self.update,
+                        idle_timeout=self.idle_timeout, scheduler=self.scheduler,
+                        profiler=self.profiler)
+
+    def config(self):
+        """
+        What a replay needs to rebuild the model.
+        """
+        return {"crowd_size": self.crowd_size, "hidden_dogs": self.hidden_dogs}
+
+    def enter(self):
+        super().enter()
+        self.recorder = Recorder("doggo", new_seed(), self.config())
+        self.model.rng.seed(self.recorder.seed)
+        self.model.reset()
+        self.resume()
+
+    def resume(self):
+        self.view.open_window()
+        self.audio.play_music("doggo")
+        self.loop.resume()
+
+    def suspend(self):
+        if self.recorder is not None:
+            self.recorder.save(self.model.snapshot())
+            if self.model.found_count:
+                # the round goes on after a trip to the menu, so it's
+                # recorded under its seed and later saves replace it
+                get_scores().record(self.score_game, self.model.found_count,
+                                    session=f"{self.recorder.seed:016x}")
 
     def run(self):
-        while self.running:
-            self.handle_events()
-            self.update()
-            self.view.render()
-            self.clock.tick(60)
+        self.result = QUIT_APP
+        self.loop.run()
+        return self.result
 
-        pygame.quit()
+    def draw(self, alpha):
+        self.view.render()
+        return [self.view.screen.get_rect()]
 
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events):
+        self.recorder.clock.tick()
+        for event in events:
             if event.type == pygame.QUIT:
-                self.running = False
+                self.loop.stop()
+                self.result = QUIT_APP
+
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.loop.stop()
+                self.result = BACK_TO_MENU
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                pos = pygame.mouse.get_pos()
-                self.model.check_click(pos)
+                self.click(pygame.mouse.get_pos())
+
+            if self.profiler.handle_event(event):
+                self.scheduler.invalidate()
+
+    def click(self, pos):
+        self.recorder.record(CLICK, *pos)
+        if self.model.check_click(pos):
+            self.audio.play("found")
+            self.scheduler.invalidate()
+
+    def idle_timeout(self):
+        """
+        Seconds the loop may sleep waiting for input (None: until an event).
+        """
+        return None
 
     def update(self):
         pass
 
+class CrowdGameController(GameController):
+    """
+    Where's Doggo with a field full of decoys and several hidden dogs.
+    """
+
+    score_game = "doggo-crowd"
+
+    def __init__(self):
+        super().__init__(CROWD_SIZE, CROWD_HIDDEN_DOGS)
+
+class BigMapGameController(GameController):
+    """
+    Where's Doggo on a map far larger than the window: pan with the arrow
+    keys, WASD or a right/middle-button drag, zoom with the mouse wheel.
+    """
+
+    score_game = "doggo-bigmap"
+
+    def __init__(self, world_size=BIG_MAP_SIZE):
+        super().__init__(hidden_dogs=BIG_MAP_HIDDEN_DOGS)
+        self.world_size = world_size
+        self.profiler = FrameProfiler("doggo-bigmap")
+        self.store = None
+        self.drag = None
+
+    def create_model(self):
+        return BigMapModel(self.hidden_dogs, self.world_size)
+
+    def create_loop(self):
+        # keyboard panning runs at a fixed rate; the loop only wakes for it
+        # while a pan key is held or tiles are streaming in
+        return GameLoop(self.handle_events, self.draw, step=self.step, step_seconds=PAN_STEP,
+                        update=self.update, idle_timeout=self.idle_timeout,
+                        scheduler=self.scheduler, profiler=self.profiler)
+
+    def create_view(self):
+        # the tile cache file is keyed by the background's contents
+        key = sha256_of(resolve(BIG_MAP_BACKGROUND))
+        self.store = TileStore(self.resources[BIG_MAP_BACKGROUND], *self.world_size, key)
+        return BigMapView(self.model, self.store)
+
+    def config(self):
+        config = super().config()
+        config["world_size"] = list(self.world_size)
+        return config
+
+    def exit(self):
+        super().exit()
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def handle_events(self, events):
+        rest = []
+        for event in events:
+            if event.type == pygame.MOUSEWHEEL:
+                self.view.zoom(-event.y, pygame.mouse.get_pos())
+                self.scheduler.invalidate()
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (2, 3):
+                self.drag = event.pos
+            elif event.type == pygame.MOUSEBUTTONUP and event.button in (2, 3):
+                self.drag = None
+            elif event.type == pygame.MOUSEMOTION and self.drag is not None:
+                self.view.pan(self.drag[0] - event.pos[0], self.drag[1] - event.pos[1])
+                self.drag = event.pos
+                self.scheduler.invalidate()
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button != 1:
+                # wheel clicks arrive as buttons 4 and up
+                pass
+            else:
+                rest.append(event)
+        super().handle_events(rest)
+
+    def click(self, pos):
+        # recorded in map coordinates, so replays don't depend on the camera
+        world = self.view.to_world(pos)
+        self.recorder.record(CLICK, *world)
+        if self.model.check_click(world):
+            self.audio.play("found")
+            self.scheduler.invalidate()
+
+    def panning(self):
+        pressed = pygame.key.get_pressed()
+        dx = dy = 0
+        for key, (kx, ky) in PAN_KEYS.items():
+            if pressed[key]:
+                dx += kx
+                dy += ky
+        return max(-1, min(1, dx)), max(-1, min(1, dy))
+
+    def idle_timeout(self):
+        # keep ticking while a key pans the view or tiles are streaming in
+        if self.panning() != (0, 0) or self.view.tiles.pending():
+            return 1 / 60
+        return None
+
+    def step(self):
+        dx, dy = self.panning()
+        if dx or dy:
+            self.view.pan(dx * PAN_SPEED * PAN_STEP, dy * PAN_SPEED * PAN_STEP)
+            self.scheduler.invalidate()
+
+    def update(self):
+        if self.view.update_tiles():
+            self.scheduler.invalidate()
+
 class DoggoModel:
 
     SCREEN_WIDTH = 1000
     SCREEN_HEIGHT = 750
     SCREEN_SIZE = (SCREEN_WIDTH, SCREEN_HEIGHT)
+    # crowd sprites stay clear of the score line and the example dog
+    KEEP_OUT = (
+        pygame.Rect(0, 0, SCREEN_WIDTH, 30),
+        pygame.Rect(0, 60, 460, 170),
+    )
 
-    def __init__(self):
-        # Load assets
-        self.big_dog = pygame.image.load(
-            r"assets\images\annoyingdog.png"
-        )
-        self.small_dog = pygame.image.load(
-            r"assets\images\annoyingdog_smallest.png"
-        )
-        self.background = pygame.image.load(
-            r"assets\images\pygamebg3.png"
-        )
+    def __init__(self, crowd_size=0, hidden_dogs=1, rng=None):
+        # Load assets (pre-converted sprites from the shared atlas)
+        atlas = get_atlas()
+        self.big_dog = atlas.sprite("big_dog")
+        self.small_dog = atlas.sprite("small_dog")
+        self.background = atlas.sprite("doggo_background")
 
-        pygame.mixer.music.load(
-            r"assets\music\IRWSAYH[8-Bit].mp3"
-        )
-        pygame.mixer.music.set_volume(0.5)
-        pygame.mixer.music.play(-1)
+        self.crowd_size = crowd_size
+        self.hidden_dogs = hidden_dogs
+        self.rng = rng if rng is not None else random.Random()
+        if crowd_size:
+            self.sprites = [self.small_dog] + self.make_decoys(atlas)
 
         # Dog positions
         self.positions = [
@@ -67,35 +293,146 @@ class DoggoModel:
         ]
 
         # State
+        self.reset()
+
+    def reset(self):
         self.found_count = 0
         self.small_dog_rect = None
-        self.place_new_small_dog()
+        if self.crowd_size:
+            self.place_crowd()
+        else:
+            self.place_new_small_dog()
+
+    def snapshot(self):
+        """
+        Final state compared by replays.
+        """
+        state = {"found": self.found_count}
+        if self.crowd_size:
+            state["dogs"] = [slot for slot, kind in enumerate(self.kinds) if kind == DOG]
+        else:
+            state["small_dog"] = list(self.small_dog_rect.topleft)
+        return state
+
+    def make_decoys(self, atlas):
+        """
+        Sprites the size of the small dog that look almost like it.
+        """
+        flipped = pygame.transform.flip(self.small_dog, True, False)
+        tinted = self.small_dog.copy()
+        tinted.fill((150, 150, 255), special_flags=pygame.BLEND_RGB_MULT)
+        return [flipped, tinted, atlas.sprite("decoy_strawberry")]
+
+    def place_crowd(self):
+        """
+        Scatter the crowd without overlaps and hide the dogs among it.
+
+        Every slot keeps its place for the whole round; finding a dog swaps
+        it with a decoy, so the spatial hash is built once per reset.
+        """
+        w, h = self.small_dog.get_size()
+        area = self.SCREEN_WIDTH * self.SCREEN_HEIGHT
+        # spacing that roughly yields crowd_size points, but never closer
+        # than the sprites' diagonal so none of them overlap
+        radius = max(math.hypot(w, h) + 1, 0.7 * math.sqrt(area / self.crowd_size))
+        points = poisson_disc(self.SCREEN_WIDTH, self.SCREEN_HEIGHT, radius,
+                              rng=random.Random(self.rng.random()), keep_out=self.KEEP_OUT)
+        self.rng.shuffle(points)
+        points = points[:self.crowd_size]
+
+        self.fill_slots([pygame.Rect(int(x) - w // 2, int(y) - h // 2, w, h) for x, y in points],
+                        int(radius) + 1)
+
+    def fill_slots(self, slots, cell_size):
+        """
+        Put a random decoy in every slot, then dogs in the first few.
+        """
+        self.slots = slots
+        self.kinds = [self.rng.randrange(1, len(self.sprites)) for _ in self.slots]
+        for slot in range(min(self.hidden_dogs, len(self.slots))):
+            self.kinds[slot] = DOG
+        self.hash = SpatialHash(cell_size)
+        for slot, rect in enumerate(self.slots):
+            self.hash.insert(slot, rect)
+        # ready-made argument for Surface.blits
+        self.blit_sequence = [(self.sprites[kind], rect.topleft)
+                              for kind, rect in zip(self.kinds, self.slots)]
+
+    def move_dog(self, slot):
+        """
+        Swap the dog in slot with a random decoy somewhere else.
+        """
+        decoys = len(self.slots) - min(self.hidden_dogs, len(self.slots))
+        if not decoys:
+            return
+        while True:
+            other = self.rng.randrange(len(self.slots))
+            if self.kinds[other] != DOG:
+                break
+        self.kinds[slot], self.kinds[other] = self.kinds[other], self.kinds[slot]
+        for i in (slot, other):
+            self.blit_sequence[i] = (self.sprites[self.kinds[i]], self.slots[i].topleft)
 
     def place_new_small_dog(self):
-        pos = random.choice(self.positions)
+        pos = self.rng.choice(self.positions)
         self.small_dog_rect = self.small_dog.get_rect(topleft=pos)
 
     def check_click(self, pos):
+        if self.crowd_size:
+            for slot in self.hash.query_point(pos):
+                if self.kinds[slot] == DOG:
+                    self.found_count += 1
+                    self.move_dog(slot)
+                    return True
+            return False
         if self.small_dog_rect.collidepoint(pos):
             self.found_count += 1
             self.place_new_small_dog()
             return True
         return False
 
+class BigMapModel(DoggoModel):
+    """
+    The crowd spread over a world_size map: one sprite at a random spot in
+    each BIG_MAP_SPACING square, so nothing overlaps and placement is linear
+    in the number of sprites. Clicks are in map coordinates.
+    """
+
+    def __init__(self, hidden_dogs=BIG_MAP_HIDDEN_DOGS, world_size=BIG_MAP_SIZE, rng=None):
+        self.world_size = tuple(world_size)
+        self.cols = self.world_size[0] // BIG_MAP_SPACING
+        self.rows = self.world_size[1] // BIG_MAP_SPACING
+        super().__init__(self.cols * self.rows, hidden_dogs, rng)
+
+    def place_crowd(self):
+        w, h = self.small_dog.get_size()
+        spacing = BIG_MAP_SPACING
+        rng = self.rng
+        slots = [pygame.Rect(cx * spacing + rng.randrange(spacing - w),
+                             cy * spacing + rng.randrange(spacing - h), w, h)
+                 for cy in range(self.rows) for cx in range(self.cols)]
+        rng.shuffle(slots)
+        self.fill_slots(slots, spacing)
+
 class GameView:
 
     def __init__(self, model):
         self.model = model
         self.font_large = pygame.font.SysFont(None, 48)
         self.font_small = pygame.font.SysFont(None, 25)
+        self.screen = None
 
-        self.screen = pygame.display.set_mode(model.SCREEN_SIZE)
+    def open_window(self):
+        self.screen = pygame.display.set_mode(self.model.SCREEN_SIZE)
         pygame.display.set_caption("Where Is Doggo?")
-        pygame.display.set_icon(model.big_dog)
+        pygame.display.set_icon(self.model.big_dog)
 
     def draw_background(self):
         self.screen.blit(self.model.background, (0, 0))
 
+    def draw_crowd(self):
+        self.screen.blits(self.model.blit_sequence, doreturn=False)
+
     def draw_small_dog(self):
         self.screen.blit(self.model.small_dog, self.model.small_dog_rect.topleft)
         pygame.draw.rect(self.screen, (255, 255, 255), self.model.small_dog_rect, 2)
@@ -105,35 +442,126 @@ class GameView:
         self.draw_text("This is a dog, find it here", 200, 90, (0, 255, 0))
 
     def draw_found_count(self):
-        text = self.font_small.render(
-            f"Doggos Found: {self.model.found_count}", True, (255, 255, 255)
+        text = render_text(
+            self.font_small, f"Doggos Found: {self.model.found_count}", True, (255, 255, 255)
         )
         self.screen.blit(text, (450, 0))
 
     def draw_text(self, text, x, y, color=(255, 255, 255)):
-        surf = self.font_large.render(text, True, color)
+        surf = render_text(self.font_large, text, True, color)
         rect = surf.get_rect(center=(x, y))
         self.screen.blit(surf, rect)
 
     def render(self):
         self.draw_background()
-        self.draw_small_dog()
+        if self.model.crowd_size:
+            self.draw_crowd()
+        else:
+            self.draw_small_dog()
         self.draw_found_count()
 
-        if self.model.found_count >= 10:
+        if self.model.found_count >= FOUND_GOAL:
             self.draw_text("You found all the Doggos!", 
                            self.model.SCREEN_WIDTH // 2, 50, (0, 255, 0))
         else:
             self.draw_big_example()
 
-        pygame.display.flip()
+class BigMapView(GameView):
+    """
+    A window onto the big map. Only the tiles and sprites that overlap the
+    view are drawn; tiles stream in through a TileCache sized for the
+    window, and sprites are looked up in the model's spatial hash.
+    """
 
-def main():
-    pygame.init()
-    pygame.mixer.init()
+    def __init__(self, model, store):
+        super().__init__(model)
+        self.tiles = TileCache(store, model.SCREEN_SIZE)
+        # camera: map coordinates of the window's top-left, and zoom level
+        self.x = 0
+        self.y = 0
+        self.level = 0
+        # crowd sprites scaled down once for each zoom level
+        self.sprites = [model.sprites] + [
+            [pygame.transform.smoothscale(s, (max(1, s.get_width() >> k), max(1, s.get_height() >> k)))
+             for s in model.sprites]
+            for k in range(1, ZOOM_LEVELS)]
+        self.center_on(model.world_size[0] // 2, model.world_size[1] // 2)
+
+    def view_rect(self):
+        """
+        The part of the map in the window, in map coordinates.
+        """
+        return pygame.Rect(self.x, self.y, self.model.SCREEN_WIDTH << self.level,
+                           self.model.SCREEN_HEIGHT << self.level)
+
+    def clamp(self):
+        view = self.view_rect()
+        world_w, world_h = self.model.world_size
+        self.x = max(0, min(self.x, world_w - view.width))
+        self.y = max(0, min(self.y, world_h - view.height))
+
+    def center_on(self, x, y):
+        view = self.view_rect()
+        self.x = x - view.width // 2
+        self.y = y - view.height // 2
+        self.clamp()
 
-    controller = GameController()
-    controller.run()
+    def pan(self, dx, dy):
+        """
+        Move the view by dx, dy window pixels.
+        """
+        self.x += round(dx) << self.level
+        self.y += round(dy) << self.level
+        self.clamp()
+
+    def zoom(self, step, anchor):
+        """
+        Zoom out by step levels (in if negative), keeping the map point
+        under anchor (window pixels) where it is.
+        """
+        level = max(0, min(ZOOM_LEVELS - 1, self.level + step))
+        wx, wy = self.to_world(anchor)
+        self.level = level
+        self.x = wx - (anchor[0] << level)
+        self.y = wy - (anchor[1] << level)
+        self.clamp()
+
+    def to_world(self, pos):
+        return self.x + (int(pos[0]) << self.level), self.y + (int(pos[1]) << self.level)
+
+    def update_tiles(self):
+        """
+        Ask for the tiles around the view and decode a few that arrived.
+        True if the window needs repainting.
+        """
+        level = self.level
+        area = pygame.Rect(self.x >> level, self.y >> level, *self.model.SCREEN_SIZE)
+        self.tiles.want(level, tile_range(area))
+        return self.tiles.pump()
+
+    def draw_background(self):
+        level = self.level
+        ox, oy = self.x >> level, self.y >> level
+        x0, y0, x1, y1 = tile_range(pygame.Rect(ox, oy, *self.model.SCREEN_SIZE))
+        sequence = []
+        for ty in range(y0, y1 + 1):
+            for tx in range(x0, x1 + 1):
+                dest = (tx * TILE_SIZE - ox, ty * TILE_SIZE - oy)
+                tile = self.tiles.get((level, tx, ty))
+                if tile is None:
+                    self.screen.fill(LOADING_COLOR, (dest, (TILE_SIZE, TILE_SIZE)))
+                else:
+                    sequence.append((tile, dest))
+        self.screen.blits(sequence, doreturn=False)
+
+    def draw_crowd(self):
+        level, x, y = self.level, self.x, self.y
+        sprites, kinds, slots = self.sprites[level], self.model.kinds, self.model.slots
+        self.screen.blits([(sprites[kinds[slot]], ((slots[slot].x - x) >> level, (slots[slot].y - y) >> level))
+                           for slot in self.model.hash.query_rect(self.view_rect())], doreturn=False)
+
+def main():
+    run_standalone(GameController())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,80 +1,175 @@
 import pygame
 import random
 import time
-import json
-import requests
-from pathlib import Path
+import math
+import sys
+from array import array
 from io import BytesIO
+from src.asset_cache import DiskCache, Prefetcher, fetch
+from src.audio import get_audio
+from src.manifest import find, preload
+from src.lifecycle import BACK_TO_MENU, QUIT_APP, GameScene, run_standalone
+from src.profiler import FrameProfiler
+from src.replay import CLICK, RESUME, SUSPEND, TICK, Recorder, new_seed
+from src.scores import get_scores
+from src.scheduler import REDRAW_EVENTS, IdleScheduler, earliest
+from src.text_cache import render_text
+from src.view import GameLoop
+
+
+# how often to check for card images still downloading
+IMAGE_POLL_INTERVAL = 0.1
+
+# round states, see MemoryModel.advance()
+PLAYING = "playing"
+CHECKING_MATCH = "checking_match"
+ROUND_WON = "round_won"
+TIMED_OUT = "timed_out"
+RESETTING = "resetting"
+
+IMAGES_JSON = "images/images.json"
+# bundled card back; AssetLoader.CARD_BACK_URL is only used without one
+CARD_BACK = "images/card_back.png"
+# how long the end-of-round message stays up before a new deal
+MESSAGE_DURATION = 2.0
+
+# per-card flag bits in MemoryModel.flags
+FACE_UP = 1
+MATCHED = 2
+
+
+class ManualClock:
+    """
+    Stand-in for time.monotonic that only moves when told to, for
+    fast-forwarding rounds in automated runs.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
 
 
 class MemoryModel:
     """
     Manages card data, timer, moves, matches, and game logic.
+
+    A round moves through PLAYING -> CHECKING_MATCH -> PLAYING ... and
+    ends in ROUND_WON or TIMED_OUT, which show their message for
+    MESSAGE_DURATION before RESETTING deals a new round. All timing comes
+    from `clock` (time.monotonic by default) so nothing ever blocks.
+
+    Cards are integer face ids in an array with a FACE_UP/MATCHED flag byte
+    per card. Boards with more pairs than images reuse the images, and
+    face_variant() tells the view how to tell the copies apart.
     """
 
-    def __init__(self, grid_size=4, timer_limit=120):
+    def __init__(self, grid_size=4, timer_limit=120, images=None, loader=None, clock=time.monotonic,
+                 rng=None):
+        if grid_size ** 2 % 2:
+            raise ValueError(f"a {grid_size}x{grid_size} grid can't be dealt in pairs")
         self.grid_size = grid_size
+        self.card_count = grid_size ** 2
         self.timer_limit = timer_limit
+        self.clock = clock
+        self.rng = rng if rng is not None else random.Random()
 
-        self.card_state = [False] * (grid_size ** 2)
+        self.flags = bytearray(self.card_count)
+        # cards whose flags changed since the view last drew; None means all
+        self.changed = None
         self.flipped_cards = []
         self.matched_pairs = 0
         self.moves = 0
 
-        self.timer_start = time.time()
+        self.timer_start = self.clock()
         self.flip_delay = 1.0
-        self.checking_match = False
         self.match_check_time = 0
+        self.state = PLAYING
+        self.state_since = self.timer_start
+
+        self.images = images if images is not None else self.load_images_from_json()
+        self.cards = self.prepare_cards()
 
-        self.images = self.load_images_from_json()
-        self.cards = self.prepare_cards(self.images)
+        # start downloading every face (and the card back) up front
+        self.loader = loader if loader is not None else AssetLoader()
+        self.loader.prefetch(self.images + [self.loader.card_back])
 
     def load_images_from_json(self):
         """
-        Loads card image URLs from assets/images/images.json.
+        Loads card image URLs from images/images.json (raises
+        MissingAssetsError if it can't be found).
         """
-        root = Path(__file__).resolve().parent.parent
-        path = root / "assets" /"images"/ "images.json"
+        return preload([IMAGES_JSON])[IMAGES_JSON]["images"]
 
-        if not path.exists():
-            raise FileNotFoundError(f"Missing images.json at {path}")
+    def prepare_cards(self):
+        """
+        Deal one pair of face ids per two cells and shuffle.
+        """
+        cards = array("H", range(self.card_count // 2)) * 2
+        self.rng.shuffle(cards)
+        return cards
 
-        with path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
+    def face_image(self, face):
+        return self.images[face % len(self.images)]
 
-        return data["images"]
+    def face_variant(self, face):
+        """
+        0 for the first use of an image, 1, 2, ... for reused copies.
+        """
+        return face // len(self.images)
+
+    def is_face_up(self, index):
+        return self.flags[index] != 0
+
+    def set_flags(self, index, flags):
+        self.flags[index] = flags
+        if self.changed is not None:
+            self.changed.add(index)
 
-    def prepare_cards(self, urls):
+    def take_changes(self):
         """
-        Duplicate the image list to make pairs and shuffle.
+        Indices changed since the last call, or None if everything did.
         """
-        cards = urls * 2
-        random.shuffle(cards)
-        return cards
+        changed = self.changed
+        self.changed = set()
+        return changed
+
+    def set_state(self, state, now=None):
+        self.state = state
+        self.state_since = self.clock() if now is None else now
+
+    @property
+    def checking_match(self):
+        return self.state == CHECKING_MATCH
 
     def reset(self):
         """
         Reset game to initial state.
         """
-        self.card_state = [False] * (self.grid_size ** 2)
+        self.flags = bytearray(self.card_count)
+        self.changed = None
         self.flipped_cards = []
         self.matched_pairs = 0
         self.moves = 0
-        self.timer_start = time.time()
-        self.checking_match = False
-        self.cards = self.prepare_cards(self.images)
+        self.timer_start = self.clock()
+        self.set_state(PLAYING, self.timer_start)
+        self.cards = self.prepare_cards()
 
     def can_flip(self, index):
-        return not self.card_state[index] and len(self.flipped_cards) < 2
+        return self.state == PLAYING and not self.flags[index] and len(self.flipped_cards) < 2
 
     def flip_card(self, index):
-        self.card_state[index] = True
+        self.set_flags(index, FACE_UP)
         self.flipped_cards.append(index)
         self.moves += 1
 
         if len(self.flipped_cards) == 2:
-            self.checking_match = True
-            self.match_check_time = time.time()
+            self.match_check_time = self.clock()
+            self.set_state(CHECKING_MATCH, self.match_check_time)
 
     def update_match_logic(self):
         """
@@ -86,18 +181,76 @@ class MemoryModel:
         i1, i2 = self.flipped_cards
         if self.cards[i1] == self.cards[i2]:
             self.matched_pairs += 1
+            self.set_flags(i1, FACE_UP | MATCHED)
+            self.set_flags(i2, FACE_UP | MATCHED)
         else:
-            self.card_state[i1] = False
-            self.card_state[i2] = False
+            self.set_flags(i1, 0)
+            self.set_flags(i2, 0)
 
         self.flipped_cards = []
-        self.checking_match = False
+        self.set_state(PLAYING)
+
+    def advance(self):
+        """
+        Make any transitions that are due. Returns True if the state changed.
+        """
+        now = self.clock()
+        before = self.state
+
+        if self.state == CHECKING_MATCH and now - self.match_check_time >= self.flip_delay:
+            self.update_match_logic()
+
+        if self.state in (PLAYING, CHECKING_MATCH):
+            if self.is_game_over():
+                self.set_state(ROUND_WON, now)
+            elif self.out_of_time():
+                self.set_state(TIMED_OUT, now)
+        elif self.state in (ROUND_WON, TIMED_OUT):
+            if now - self.state_since >= MESSAGE_DURATION:
+                self.set_state(RESETTING, now)
+
+        if self.state == RESETTING:
+            self.reset()
+
+        return self.state != before
+
+    def next_transition(self):
+        """
+        Clock time of the next transition advance() would make by itself.
+        """
+        if self.state == CHECKING_MATCH:
+            return self.match_check_time + self.flip_delay
+        if self.state in (ROUND_WON, TIMED_OUT):
+            return self.state_since + MESSAGE_DURATION
+        return self.timer_start + self.timer_limit
+
+    def shift_clock(self, seconds):
+        """
+        Push every timestamp forward, e.g. to skip time spent paused.
+        """
+        self.timer_start += seconds
+        self.match_check_time += seconds
+        self.state_since += seconds
+
+    def snapshot(self):
+        """
+        Final state compared by replays.
+        """
+        return {
+            "cards": list(self.cards),
+            "flags": list(self.flags),
+            "flipped": list(self.flipped_cards),
+            "matched_pairs": self.matched_pairs,
+            "moves": self.moves,
+            "state": self.state,
+            "timer_start": self.timer_start,
+        }
 
     def is_game_over(self):
-        return self.matched_pairs == (self.grid_size ** 2) // 2
+        return self.matched_pairs == self.card_count // 2
 
     def time_remaining(self):
-        elapsed = time.time() - self.timer_start
+        elapsed = self.clock() - self.timer_start
         return max(0, self.timer_limit - int(elapsed))
 
     def out_of_time(self):
@@ -107,175 +260,415 @@ class MemoryModel:
 class AssetLoader:
     """
     Loads card images, local or URL.
+
+    Remote images are fetched in the background by prefetch() and kept in
+    an on-disk cache, so poll_image() never blocks the render loop.
     """
 
-    def __init__(self):
-        root = Path(__file__).resolve().parent.parent
-        self.assets_dir = root / "assets"
+    CARD_BACK_URL = "https://img.icons8.com/ios11/512/F25081/monster-energy.png"
 
-    def load_card_back(self):
-        path = self.assets_dir / "card_back.png"
+    def __init__(self, cache=None, offline=False):
+        # offline loaders (headless replays) never start a download
+        self.offline = offline
+        self.cache = cache if cache is not None else DiskCache()
+        self.prefetcher = None
+        self.decoded = {}
+        # identifier of the card back to draw
+        self.card_back = CARD_BACK if self.local_path(CARD_BACK) is not None else self.CARD_BACK_URL
 
-        if path.exists():
-            return pygame.image.load(str(path))
+    def prefetch(self, identifiers):
+        """
+        Start downloading every remote identifier at once.
+        """
+        remote = [i for i in identifiers if self.local_path(i) is None]
+        if self.offline:
+            remote = []
+        self.prefetcher = Prefetcher(remote, self.cache)
+
+    @staticmethod
+    def local_path(identifier):
+        """
+        The bundled file for identifier, or None for URLs and unknown names.
+        """
+        if "://" in identifier:
+            return None
+        return find(identifier)
+
+    def poll_image(self, identifier):
+        """
+        Returns the image if it is available, or None while it is still
+        downloading (or failed to download).
+        """
+        if identifier in self.decoded:
+            return self.decoded[identifier]
+
+        local = self.local_path(identifier)
+        if local is not None:
+            img = pygame.image.load(str(local))
+        else:
+            data = self.prefetcher.get(identifier) if self.prefetcher else None
+            if data is None:
+                return None
+            img = pygame.image.load(BytesIO(data))
 
-        url = "https://img.icons8.com/ios11/512/F25081/monster-energy.png"
-        req = requests.get(url)
-        req.raise_for_status()
-        return pygame.image.load(BytesIO(req.content))
+        self.decoded[identifier] = img
+        return img
 
     def load_image(self, identifier):
         """
-        Loads a URL or local file.
+        Loads a URL or local file, blocking until it is available.
         """
 
-        local = self.assets_dir / identifier
-        if local.exists():
+        local = self.local_path(identifier)
+        if local is not None:
             return pygame.image.load(str(local))
 
-        req = requests.get(identifier)
-        req.raise_for_status()
-        return pygame.image.load(BytesIO(req.content))
+        data = self.cache.get(identifier)
+        if data is None:
+            data, etag = fetch(identifier)
+            self.cache.put(identifier, data, etag)
+        return pygame.image.load(BytesIO(data))
 
 
 class MemoryView:
     """
     Draws everything on screen — cards, timer, moves, UI.
+
+    Cards shrink to fit big grids into the window, and draw() repaints only
+    the cells the model reports as changed plus the header, returning the
+    rects it touched for pygame.display.update().
     """
 
-    def __init__(self, model):
-        pygame.init()
+    TOP_MARGIN = 50
+    MIN_WIDTH = 400
+    MAX_CARD_SIZE = 100
+    MIN_CARD_SIZE = 20
+    # the board never grows past this many pixels across
+    MAX_BOARD = 800
+
+    @classmethod
+    def card_size_for(cls, grid_size):
+        return max(cls.MIN_CARD_SIZE, min(cls.MAX_CARD_SIZE, cls.MAX_BOARD // grid_size))
 
+    @classmethod
+    def window_size(cls, grid_size):
+        board = grid_size * cls.card_size_for(grid_size)
+        return max(cls.MIN_WIDTH, board), cls.TOP_MARGIN + board
+
+    def __init__(self, model):
         self.model = model
-        self.width = 400
-        self.height = 450
-        self.card_size = 100
-        self.top_margin = 50
+        self.width, self.height = self.window_size(model.grid_size)
+        self.card_size = self.card_size_for(model.grid_size)
+        self.top_margin = self.TOP_MARGIN
+        self.padding = max(1, self.card_size // 20)
+        self.border = max(1, self.card_size // 33)
+        self.face_size = self.card_size - 2 * self.padding
 
         self.WHITE = (255, 255, 255)
         self.BLACK = (0, 0, 0)
         self.GOLD = (255, 215, 0)
 
         self.font = pygame.font.Font(None, 24)
-        self.screen = pygame.display.set_mode((self.width, self.height))
-        pygame.display.set_caption("Memory Puzzle Game")
-
-        loader = AssetLoader()
-        self.card_back = loader.load_card_back()
-        self.card_back = pygame.transform.scale(self.card_back, (self.card_size - 10, self.card_size - 10))
+        self.label_font = pygame.font.Font(None, max(12, self.card_size // 3))
+        self.screen = None
 
-        self.loader = loader
+        self.loader = model.loader
         self.cached = {}
+        # face id -> finished card face, including the tint for reused images
+        self.faces = {}
+        self.full_redraw = True
+        self.shown_state = None
+
+        # shown in place of any image that hasn't arrived yet
+        self.placeholder = pygame.Surface((self.face_size, self.face_size))
+        self.placeholder.fill((230, 230, 230))
+        text = render_text(self.font, "...", True, self.BLACK)
+        self.placeholder.blit(text, text.get_rect(center=self.placeholder.get_rect().center))
+
+    def open_window(self):
+        self.screen = pygame.display.set_mode((self.width, self.height))
+        pygame.display.set_caption("Memory Puzzle Game")
+        self.full_redraw = True
 
     def load_card(self, identifier):
         if identifier not in self.cached:
-            img = self.loader.load_image(identifier)
-            img = pygame.transform.scale(img, (self.card_size - 10, self.card_size - 10))
-            self.cached[identifier] = img
+            img = self.loader.poll_image(identifier)
+            if img is None:
+                return self.placeholder
+            img = pygame.transform.scale(img, (self.face_size, self.face_size))
+            self.cached[identifier] = img.convert_alpha()
         return self.cached[identifier]
 
+    def prepare_arrived(self):
+        """
+        Scale and convert card faces as soon as they arrive rather than on
+        their first flip. Returns True if any new image became ready.
+        """
+        identifiers = self.model.images + [self.loader.card_back]
+        if len(self.cached) >= len(set(identifiers)):
+            return False
+        before = len(self.cached)
+        for identifier in identifiers:
+            self.load_card(identifier)
+        return len(self.cached) != before
+
+    def face_surface(self, face):
+        """
+        The face for a card id. Copies of a reused image get a tint and a
+        number so the pairs stay distinguishable.
+        """
+        if face in self.faces:
+            return self.faces[face]
+        img = self.load_card(self.model.face_image(face))
+        if img is self.placeholder:
+            return img
+        variant = self.model.face_variant(face)
+        if variant:
+            img = img.copy()
+            tint = pygame.Color(0)
+            tint.hsva = ((variant * 67) % 360, 45, 100, 100)
+            img.fill(tint, special_flags=pygame.BLEND_RGB_MULT)
+            label = render_text(self.label_font, str(variant + 1), True, self.BLACK)
+            img.blit(label, (2, 2))
+        self.faces[face] = img
+        return img
+
+    @property
+    def card_back(self):
+        return self.load_card(self.loader.card_back)
+
+    def cell_rect(self, index):
+        row, col = divmod(index, self.model.grid_size)
+        return pygame.Rect(col * self.card_size, self.top_margin + row * self.card_size,
+                           self.card_size, self.card_size)
+
+    def cell_at(self, x, y):
+        """
+        Index of the card under (x, y), or None.
+        """
+        col = x // self.card_size
+        row = (y - self.top_margin) // self.card_size
+        if 0 <= row < self.model.grid_size and 0 <= col < self.model.grid_size:
+            return row * self.model.grid_size + col
+        return None
+
     def draw_restart_button(self):
         rect = (self.width - 110, 10, 100, 30)
         pygame.draw.rect(self.screen, self.WHITE, rect)
         pygame.draw.rect(self.screen, self.GOLD, rect, 2)
 
-        text = self.font.render("Restart", True, self.BLACK)
+        text = render_text(self.font, "Restart", True, self.BLACK)
         self.screen.blit(text, text.get_rect(center=(self.width - 60, 25)))
 
         return rect
 
-    def draw(self):
-        self.screen.fill(self.WHITE)
-
-        idx = 0
-        for row in range(self.model.grid_size):
-            for col in range(self.model.grid_size):
-                x = col * self.card_size
-                y = self.top_margin + row * self.card_size
+    def draw_cell(self, index):
+        rect = self.cell_rect(index)
+        pygame.draw.rect(self.screen, self.WHITE, rect)
+        pygame.draw.rect(self.screen, self.GOLD, rect, self.border)
 
-                rect = pygame.Rect(x, y, self.card_size, self.card_size)
-                pygame.draw.rect(self.screen, self.WHITE, rect)
-                pygame.draw.rect(self.screen, self.GOLD, rect, 3)
+        if self.model.is_face_up(index):
+            img = self.face_surface(self.model.cards[index])
+        else:
+            img = self.card_back
 
-                if self.model.card_state[idx]:
-                    img = self.load_card(self.model.cards[idx])
-                else:
-                    img = self.card_back
+        self.screen.blit(img, (rect.x + self.padding, rect.y + self.padding))
+        return rect
 
-                self.screen.blit(img, (x + 5, y + 5))
-                idx += 1
+    def draw_header(self):
+        rect = pygame.Rect(0, 0, self.width, self.top_margin)
+        self.screen.fill(self.WHITE, rect)
 
-        moves_text = self.font.render(f"Moves: {self.model.moves}", True, self.BLACK)
+        moves_text = render_text(self.font, f"Moves: {self.model.moves}", True, self.BLACK)
         self.screen.blit(moves_text, (10, 10))
 
         self.draw_restart_button()
 
         remaining = self.model.time_remaining()
-        timer_text = self.font.render(f"Time: {remaining // 60}:{remaining % 60:02d}", True, self.BLACK)
+        timer_text = render_text(self.font, f"Time: {remaining // 60}:{remaining % 60:02d}", True, self.BLACK)
         self.screen.blit(timer_text, (10, 30))
+        return rect
+
+    def draw(self):
+        """
+        Repaint what changed since the last call; returns the dirty rects.
+        """
+        messages = (ROUND_WON, TIMED_OUT)
+        changed = self.model.take_changes()
+        if self.prepare_arrived():
+            self.full_redraw = True
+        if self.model.state != self.shown_state and (
+                self.model.state in messages or self.shown_state in messages):
+            # the message covers cells the model doesn't know about
+            self.full_redraw = True
+        self.shown_state = self.model.state
+
+        if self.full_redraw or changed is None:
+            self.full_redraw = False
+            self.screen.fill(self.WHITE)
+            for index in range(self.model.card_count):
+                self.draw_cell(index)
+            rects = [self.screen.get_rect()]
+        else:
+            rects = [self.draw_cell(index) for index in changed]
 
-        pygame.display.flip()
+        rects.append(self.draw_header())
+
+        if self.model.state == ROUND_WON:
+            rects.append(self.show_message("Congratulations!"))
+        elif self.model.state == TIMED_OUT:
+            rects.append(self.show_message("Time's up!"))
+        return rects
 
     def show_message(self, message):
-        text = self.font.render(message, True, self.BLACK)
+        text = render_text(self.font, message, True, self.BLACK)
         rect = text.get_rect(center=(self.width // 2, self.height // 2))
-        self.screen.blit(text, rect)
-        pygame.display.flip()
+        return self.screen.blit(text, rect)
 
 
-class MemoryGameController:
+class MemoryGameController(GameScene):
     """
     Handles events, updates model, and runs loop.
     """
 
-    def __init__(self):
-        self.model = MemoryModel()
+    assets = (IMAGES_JSON,)
+
+    def __init__(self, grid_size=4, images=None, loader=None):
+        super().__init__()
+        self.grid_size = grid_size
+        # for MemoryModel; images.json and a downloading AssetLoader when None
+        self.images = images
+        self.loader = loader
+        self.model = None
+        self.view = None
+        self.suspended_at = None
+        self.recorder = None
+        self.profiler = FrameProfiler("memory")
+        self.scheduler = IdleScheduler()
+        # the round's transitions are deadlines on its own (recorded) clock,
+        # so the loop wakes for those rather than stepping at a fixed rate
+        self.loop = GameLoop(self.handle_events, self.draw, update=self.update_logic,
+                             idle_timeout=self.next_deadline, scheduler=self.scheduler,
+                             profiler=self.profiler)
+
+    def open_window(self):
+        pygame.display.set_mode(MemoryView.window_size(self.grid_size))
+
+    def load(self):
+        # starts downloading the card images straight away
+        self.model = MemoryModel(self.grid_size, images=self.images, loader=self.loader)
         self.view = MemoryView(self.model)
-        self.clock = pygame.time.Clock()
-        self.running = True
+        self.audio = get_audio()
+        super().load()
+
+    def enter(self):
+        super().enter()
+        self.recorder = Recorder("memory", new_seed(),
+                                 {"grid_size": self.grid_size, "images": self.model.images})
+        # the round runs on the recorder's clock so replays see the same times
+        self.model.clock = self.recorder.clock
+        self.model.rng.seed(self.recorder.seed)
+        self.model.reset()
+        self.view.open_window()
+        self.audio.stop_music()
+        self.loop.resume()
+
+    def suspend(self):
+        if self.recorder is None:
+            return
+        self.recorder.clock.tick()
+        self.suspended_at = self.model.clock()
+        self.recorder.record(SUSPEND)
+        self.recorder.save(self.model.snapshot())
+
+    def resume(self):
+        # the round's clock doesn't run while we're away in the menu
+        if self.suspended_at is not None:
+            self.recorder.clock.tick()
+            self.recorder.record(RESUME)
+            self.model.shift_clock(self.model.clock() - self.suspended_at)
+            self.suspended_at = None
+        self.view.open_window()
+        self.audio.stop_music()
+        self.loop.resume()
 
     def run(self):
-        while self.running:
-            self.handle_events()
-            self.update_logic()
-            self.view.draw()
-            self.clock.tick(60)
+        self.result = QUIT_APP
+        self.loop.run()
+        return self.result
 
-        pygame.quit()
+    def draw(self, alpha):
+        return self.view.draw()
 
-    def handle_events(self):
-        for event in pygame.event.get():
+    def next_deadline(self):
+        """
+        Seconds until something on screen changes by itself: the timer's
+        next second, the end of the flip delay, or more images arriving.
+        """
+        now = self.model.clock()
+        elapsed = now - self.model.timer_start
+        timeouts = [math.floor(elapsed) + 1 - elapsed,
+                    self.model.next_transition() - now]
+        if not self.model.loader.prefetcher.done():
+            timeouts.append(IMAGE_POLL_INTERVAL)
+        return max(0, earliest(*timeouts))
+
+    def handle_events(self, events):
+        self.recorder.clock.tick()
+        for event in events:
+            if self.profiler.handle_event(event) or event.type in REDRAW_EVENTS:
+                self.view.full_redraw = True
+                self.scheduler.invalidate()
             if event.type == pygame.QUIT:
-                self.running = False
+                self.loop.stop()
+                self.result = QUIT_APP
 
-            elif event.type == pygame.MOUSEBUTTONDOWN and not self.model.checking_match:
-                mx, my = pygame.mouse.get_pos()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                self.loop.stop()
+                self.result = BACK_TO_MENU
 
-                if self.in_rect(mx, my, (self.view.width - 110, 10, 100, 30)):
-                    self.model.reset()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                self.scheduler.invalidate()
+                mx, my = pygame.mouse.get_pos()
+                self.recorder.record(CLICK, mx, my)
+                if self.handle_click(mx, my):
                     return
 
-                row = (my - self.view.top_margin) // self.view.card_size
-                col = mx // self.view.card_size
-
-                if 0 <= row < self.model.grid_size:
-                    idx = row * self.model.grid_size + col
-                    if self.model.can_flip(idx):
-                        self.model.flip_card(idx)
-
-    def update_logic(self):
-        if self.model.checking_match and time.time() - self.model.match_check_time >= self.model.flip_delay:
-            self.model.update_match_logic()
+    def handle_click(self, mx, my):
+        """
+        Restart or flip a card. Returns True if the round was restarted.
+        """
+        if self.model.checking_match:
+            return False
 
-        if self.model.is_game_over():
-            self.view.show_message("Congratulations!")
-            time.sleep(2)
+        if self.in_rect(mx, my, (self.view.width - 110, 10, 100, 30)):
             self.model.reset()
+            return True
 
-        if self.model.out_of_time():
-            self.view.show_message("Time's up!")
-            time.sleep(2)
-            self.model.reset()
+        idx = self.view.cell_at(mx, my)
+        if idx is not None and self.model.can_flip(idx):
+            self.model.flip_card(idx)
+        return False
+
+    def update_logic(self):
+        matched = self.model.matched_pairs
+        if self.model.advance():
+            self.recorder.record(TICK)
+            self.scheduler.invalidate()
+            if self.model.state == TIMED_OUT:
+                self.audio.play("game_over")
+            elif self.model.matched_pairs > matched:
+                self.audio.play("match")
+            if self.model.state in (ROUND_WON, TIMED_OUT):
+                self.record_score()
+
+    def record_score(self):
+        # fewest moves wins, among rounds that were finished in time
+        model = self.model
+        get_scores().record("memory", model.moves, ranked=model.state == ROUND_WON,
+                            duration=model.clock() - model.timer_start,
+                            details={"grid_size": self.grid_size,
+                                     "matched_pairs": model.matched_pairs})
 
     @staticmethod
     def in_rect(x, y, rect):
@@ -284,9 +677,9 @@ class MemoryGameController:
 
 
 def main():
-    pygame.init()
-    controller = MemoryGameController()
-    controller.run()
+    # python -m src.game3 [grid size]
+    grid_size = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    run_standalone(MemoryGameController(grid_size))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+import importlib
+import pygame
+
+from src.manifest import preload
+from src.scores import close_scores
+
+# what a scene's run() hands back to whoever started it
+BACK_TO_MENU = "menu"
+QUIT_APP = "quit"
+
+
+class GameScene:
+    """
+    Lifecycle shared by every game launched from the Controller menu.
+
+    preload() decodes the manifest assets named in `assets` up front (and
+    fails with every missing one at once); load() runs once and keeps
+    assets resident; enter() starts a fresh
+    round; suspend() and resume() bracket trips back to the menu; exit()
+    releases the game when the app closes. run() plays until the player
+    leaves and returns BACK_TO_MENU or QUIT_APP instead of exiting.
+    """
+
+    # logical asset names this game needs, see src.manifest
+    assets = ()
+
+    def __init__(self):
+        self.resources = {}
+        self.loaded = False
+        # True while there is a round in progress that resume() can continue
+        self.active = False
+
+    def open_window(self):
+        """
+        Set the display mode and caption this game needs.
+        """
+
+    def preload(self):
+        self.resources = preload(self.assets)
+
+    def load(self):
+        self.loaded = True
+
+    def enter(self):
+        self.active = True
+
+    def suspend(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def exit(self):
+        self.suspend()
+        self.active = False
+
+    def run(self):
+        raise NotImplementedError
+
+
+class GameRegistry:
+    """
+    Game modules by menu name, imported on first selection and kept loaded
+    so later visits skip the import and asset loading.
+    """
+
+    def __init__(self, entries):
+        # name -> (module path, scene class name)
+        self.entries = dict(entries)
+        # name -> keyword arguments for the scene class
+        self.options = {}
+        self.scenes = {}
+
+    def names(self):
+        return list(self.entries)
+
+    def get(self, name):
+        """
+        Loaded scene for name, or None if the module has no playable scene.
+        """
+        if name not in self.scenes:
+            module_path, class_name = self.entries[name]
+            module = importlib.import_module(module_path)
+            scene_class = getattr(module, class_name, None) if class_name else None
+            scene = scene_class(**self.options.get(name, {})) if scene_class is not None else None
+            if scene is not None:
+                scene.preload()
+                scene.load()
+            self.scenes[name] = scene
+        return self.scenes[name]
+
+    def play(self, name):
+        """
+        Enter (or resume) a game and run it until the player leaves.
+        Returns the scene's run() result, or None if there is nothing to play.
+        """
+        scene = self.get(name)
+        if scene is None:
+            return None
+        if scene.active:
+            scene.resume()
+        else:
+            scene.enter()
+        result = scene.run()
+        scene.suspend()
+        return result
+
+    def exit_all(self):
+        for scene in self.scenes.values():
+            if scene is not None:
+                scene.exit()
+
+
+def run_standalone(scene):
+    """
+    Run one game on its own, as the modules' main() functions do.
+    """
+    pygame.init()
+    pygame.mixer.init()
+    # sprites are converted to the display format, so open the window first
+    scene.open_window()
+    scene.preload()
+    scene.load()
+    scene.enter()
+    scene.run()
+    scene.exit()
+    close_scores()
+    pygame.quit()
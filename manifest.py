@@ -0,0 +1,214 @@
+"""
+Asset manifest, resolver and preloader.
+
+Games name assets by logical path ("images/pygamebg3.png"). The manifest
+maps each name to the file it was built from, with its size and SHA-256,
+so every game resolves assets the same way regardless of the working
+directory or platform. Rebuild it after adding or changing assets:
+
+    python -m src.manifest --build
+    python -m src.manifest --check
+"""
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import hashlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+
+import pygame
+
+PACKAGE_DIR = Path(__file__).resolve().parent
+ASSETS_DIR = PACKAGE_DIR.parent / "assets"
+MANIFEST_PATH = PACKAGE_DIR / "asset_manifest.json"
+# file extension -> directory of its logical name
+CATEGORIES = {
+    ".png": "images",
+    ".json": "images",
+    ".ttf": "fonts",
+    ".wav": "music",
+    ".mp3": "music",
+}
+
+
+class MissingAssetsError(FileNotFoundError):
+    """
+    Raised by preload() with every asset that couldn't be found.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        super().__init__("missing assets: " + ", ".join(self.names))
+
+
+def sha256_of(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def scan():
+    """
+    (logical name, path) for every asset file. The assets/ tree next to the
+    package wins over loose files in the package directory.
+    """
+    found = {}
+    if ASSETS_DIR.is_dir():
+        for path in sorted(ASSETS_DIR.rglob("*")):
+            if path.is_file() and path.suffix.lower() in CATEGORIES:
+                found.setdefault(path.relative_to(ASSETS_DIR).as_posix(), path)
+    for path in sorted(PACKAGE_DIR.iterdir()):
+        if path.is_file() and path.suffix.lower() in CATEGORIES and path != MANIFEST_PATH:
+            found.setdefault(f"{CATEGORIES[path.suffix.lower()]}/{path.name}", path)
+    return found
+
+
+def build():
+    entries = {}
+    for name, path in sorted(scan().items()):
+        entries[name] = {
+            "path": Path(os.path.relpath(path, PACKAGE_DIR)).as_posix(),
+            "size": path.stat().st_size,
+            "sha256": sha256_of(path),
+        }
+    return entries
+
+
+class Manifest:
+    def __init__(self, entries):
+        self.entries = entries
+        self.resolved = {}
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH):
+        if not Path(path).exists():
+            return cls({})
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def candidates(self, name):
+        entry = self.entries.get(name)
+        if entry is not None:
+            yield PACKAGE_DIR / entry["path"]
+        yield ASSETS_DIR / name
+        # drop-ins straight under assets/, as the games used to look for them
+        yield ASSETS_DIR / PurePosixPath(name).name
+        yield PACKAGE_DIR / name
+        yield PACKAGE_DIR / PurePosixPath(name).name
+
+    def find(self, name):
+        """
+        Path of the asset, or None if it isn't anywhere.
+        """
+        if name not in self.resolved:
+            self.resolved[name] = next((p for p in self.candidates(name) if p.is_file()), None)
+        return self.resolved[name]
+
+    def resolve(self, name):
+        path = self.find(name)
+        if path is None:
+            raise MissingAssetsError([name])
+        return path
+
+    def verify(self, check_hashes=False):
+        """
+        (missing, changed) names among the manifest's entries.
+        """
+        missing, changed = [], []
+        for name, entry in self.entries.items():
+            path = self.find(name)
+            if path is None:
+                missing.append(name)
+            elif path.stat().st_size != entry["size"] or (
+                    check_hashes and sha256_of(path) != entry["sha256"]):
+                changed.append(name)
+        return missing, changed
+
+
+_shared = None
+# decoded assets by name, filled by preload()
+decoded = {}
+
+
+def get_manifest():
+    global _shared
+    if _shared is None:
+        _shared = Manifest.load()
+    return _shared
+
+
+def find(name):
+    return get_manifest().find(name)
+
+
+def resolve(name):
+    return get_manifest().resolve(name)
+
+
+def decode(name, path):
+    """
+    Images become (unconverted) Surfaces and JSON is parsed; fonts and
+    music are opened at their point of use, so they stay paths.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".png":
+        return pygame.image.load(str(path))
+    if suffix == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return path
+
+
+def preload(names, max_workers=8):
+    """
+    Decode the named assets on a thread pool; returns {name: asset}.
+    Raises MissingAssetsError listing every missing name before decoding
+    anything.
+    """
+    manifest = get_manifest()
+    missing = [name for name in names if manifest.find(name) is None]
+    if missing:
+        raise MissingAssetsError(missing)
+    todo = [name for name in names if name not in decoded]
+    if todo:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for name, asset in zip(todo, pool.map(lambda n: decode(n, manifest.find(n)), todo)):
+                decoded[name] = asset
+    return {name: decoded[name] for name in names}
+
+
+def load_image(name):
+    """
+    The decoded image for name, from the preload cache when it's there.
+    """
+    if name not in decoded:
+        decoded[name] = pygame.image.load(str(resolve(name)))
+    return decoded[name]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--build" in argv:
+        entries = build()
+        tmp = MANIFEST_PATH.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entries, indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, MANIFEST_PATH)
+        print(f"{len(entries)} assets written to {MANIFEST_PATH.name}")
+        return 0
+
+    missing, changed = get_manifest().verify(check_hashes="--check" in argv)
+    for name in missing:
+        print(f"missing: {name}", file=sys.stderr)
+    for name in changed:
+        print(f"changed: {name} (rebuild the manifest)", file=sys.stderr)
+    print(f"{len(get_manifest().entries)} assets, {len(missing)} missing, {len(changed)} changed")
+    return 1 if missing or changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,413 @@
+"""
+Memory Puzzle difficulty analyser.
+
+Plays simulated players over shuffled deals generated in NumPy batches and
+reports how many moves and how much time each grid size takes. Rounds are
+played a whole batch at a time on plain arrays; a few deals per setting
+are replayed through game3.MemoryModel as a spot check that the arrays
+follow the real game's rules.
+
+    python -m src.memory_sim --grids 4 6 8 --deals 100000
+"""
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.game3 import MATCHED, PLAYING, ROUND_WON, AssetLoader, ManualClock, MemoryModel
+
+# seconds a player spends choosing and flipping one card
+THINK_TIME = 0.7
+# seconds a flipped pair stays up (MemoryModel.flip_delay)
+FLIP_DELAY = 1.0
+TIMER_LIMITS = (60, 90, 120, 180, 300)
+DEFAULT_STRATEGIES = ("perfect", "limited:6", "random")
+CHUNK = 20000
+# deals per setting replayed through MemoryModel
+SPOT_CHECK = 20
+
+
+def batched_deals(count, card_count, rng):
+    """
+    count shuffled deals as rows of face ids, one NumPy call for the lot.
+    """
+    base = np.broadcast_to(np.arange(card_count, dtype=np.uint16) // 2, (count, card_count))
+    return rng.permuted(base, axis=1)
+
+
+def parse_strategy(name):
+    """
+    (kind, capacity) for a strategy name: ("random", None), ("memory",
+    None) for perfect recall or ("memory", K) for limited:K.
+    """
+    if name == "random":
+        return "random", None
+    if name == "perfect":
+        return "memory", None
+    if name.startswith("limited:"):
+        return "memory", int(name.split(":", 1)[1])
+    raise ValueError(f"unknown strategy {name!r}")
+
+
+def random_rounds(count, card_count, rng):
+    """
+    (moves, turns) of count rounds by a player who remembers nothing.
+
+    With r pairs left two random face-down cards match with probability
+    1 / (2r - 1) and a miss changes nothing, so the turns spent on each
+    pair are geometric and no deal needs to be played out.
+    """
+    turns = np.zeros(count, dtype=np.int64)
+    for left in range(card_count // 2, 0, -1):
+        turns += rng.geometric(1 / (2 * left - 1), count)
+    return 2 * turns, turns
+
+
+def memory_rounds(deals, rng, capacity=None):
+    """
+    (moves, turns) of every deal by a MemoryPlayer, all rows in lockstep.
+
+    Per deal the arrays hold which cards are still in play, which ones the
+    player remembers and when it last saw each, and how many remembered
+    cards of each face are in play (2 means a known pair). A pick among the
+    unknown cards draws one number per row and takes that far into the
+    row's unknown cards. Finished rows are dropped as they go.
+    """
+    count, card_count = deals.shape
+    cards = deals.astype(np.intp)
+    in_play = np.ones(deals.shape, dtype=bool)
+    known = np.zeros(deals.shape, dtype=bool)
+    seen_at = np.zeros(deals.shape, dtype=np.int64)
+    per_face = np.zeros((count, card_count // 2), dtype=np.int8)
+    held = np.zeros(count, dtype=np.int64)
+    left = np.full(count, card_count // 2, dtype=np.int64)
+    turns = np.zeros(count, dtype=np.int64)
+    rows = np.arange(count)
+    out = np.zeros(count, dtype=np.int64)
+    clock = 0
+
+    def flip(index):
+        nonlocal clock
+        clock += 1
+        local = np.arange(len(index))
+        new = ~known[local, index]
+        known[local, index] = True
+        seen_at[local, index] = clock
+        per_face[local[new], cards[local[new], index[new]]] += 1
+        held[new] += 1
+        if capacity is None:
+            return
+        over = np.flatnonzero(held > capacity)
+        if over.size:
+            oldest = np.where(known[over], seen_at[over], clock + 1).argmin(axis=1)
+            known[over, oldest] = False
+            per_face[over, cards[over, oldest]] -= 1
+            held[over] -= 1
+
+    def any_unknown(need, exclude=None):
+        unknown = in_play[need] & ~known[need]
+        if exclude is not None:
+            unknown[np.arange(len(need)), exclude[need]] = False
+        nth = (rng.random(len(need)) * unknown.sum(axis=1)).astype(np.intp)
+        return (np.cumsum(unknown, axis=1, dtype=np.int16) > nth[:, None]).argmax(axis=1)
+
+    while rows.size:
+        local = np.arange(rows.size)
+        # the lowest remembered pair if there is one, else an unknown card
+        pair = per_face == 2
+        has_pair = pair.any(axis=1)
+        pair_cards = known & (cards == pair.argmax(axis=1)[:, None])
+        first = pair_cards.argmax(axis=1)
+        need = np.flatnonzero(~has_pair)
+        first[need] = any_unknown(need)
+        flip(first)
+
+        # the first card's partner if remembered, else another unknown card
+        face = cards[local, first]
+        partner = known & in_play & (cards == face[:, None])
+        partner[local, first] = False
+        second = partner.argmax(axis=1)
+        need = np.flatnonzero(~partner.any(axis=1))
+        second[need] = any_unknown(need, first)
+        flip(second)
+
+        turns += 1
+        matched = np.flatnonzero(cards[local, second] == face)
+        for index in (first[matched], second[matched]):
+            was_known = known[matched, index]
+            in_play[matched, index] = False
+            known[matched, index] = False
+            per_face[matched[was_known], face[matched[was_known]]] -= 1
+            held[matched] -= was_known
+        left[matched] -= 1
+
+        done = left == 0
+        if done.any():
+            out[rows[done]] = turns[done]
+            keep = ~done
+            rows, cards, in_play, known, seen_at, per_face, held, left, turns = (
+                rows[keep], cards[keep], in_play[keep], known[keep], seen_at[keep],
+                per_face[keep], held[keep], left[keep], turns[keep])
+    return 2 * out, out
+
+
+def simulate(grid_size, strategy, deals, rng):
+    """
+    (moves, seconds) arrays for `deals` rounds of one strategy.
+    """
+    kind, capacity = parse_strategy(strategy)
+    card_count = grid_size * grid_size
+    if kind == "random":
+        moves, turns = random_rounds(deals, card_count, rng)
+    else:
+        moves, turns = memory_rounds(batched_deals(deals, card_count, rng), rng, capacity)
+    return moves.astype(np.int32), moves * THINK_TIME + turns * FLIP_DELAY
+
+
+class RandomPlayer:
+    """
+    Remembers nothing: flips two random face-down cards every turn.
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.hidden = None
+
+    def start(self, model):
+        # face-down cards
+        self.hidden = set(range(model.card_count))
+
+    def flipped(self, index, face):
+        self.hidden.discard(index)
+
+    def settled(self, first, second, matched):
+        if not matched:
+            self.hidden.add(first)
+            self.hidden.add(second)
+
+    def pick(self, model):
+        return self.rng.choice(sorted(self.hidden))
+
+
+class MemoryPlayer:
+    """
+    Remembers the faces of the last `capacity` cards it has seen (all of
+    them if capacity is None). Completes a remembered pair when it can and
+    otherwise turns over a random card it doesn't remember.
+
+    Makes the same choices as memory_rounds() and, given a NumPy Generator
+    in the same state, draws the same random numbers.
+    """
+
+    def __init__(self, rng, capacity=None):
+        self.rng = rng
+        self.capacity = capacity
+
+    def start(self, model):
+        # face-down cards we don't remember
+        self.unknown = set(range(model.card_count))
+        self.seen = OrderedDict()
+        self.by_face = {}
+        # faces whose both cards we remember
+        self.pairs = set()
+        self.face_up = []
+
+    def remember(self, index, face):
+        if index in self.seen:
+            self.seen.move_to_end(index)
+            return
+        self.seen[index] = face
+        self.unknown.discard(index)
+        known = self.by_face.setdefault(face, [])
+        known.append(index)
+        if len(known) == 2:
+            self.pairs.add(face)
+        if self.capacity is not None and len(self.seen) > self.capacity:
+            oldest = next(iter(self.seen))
+            self.forget(oldest)
+            if oldest not in self.face_up:
+                self.unknown.add(oldest)
+
+    def forget(self, index):
+        face = self.seen.pop(index)
+        self.by_face[face].remove(index)
+        self.pairs.discard(face)
+
+    def flipped(self, index, face):
+        self.face_up.append(index)
+        self.remember(index, face)
+
+    def settled(self, first, second, matched):
+        self.face_up.clear()
+        for index in (first, second):
+            if matched and index in self.seen:
+                self.forget(index)
+            elif not matched and index not in self.seen:
+                # forgotten while it was face up
+                self.unknown.add(index)
+
+    def pick(self, model):
+        if model.flipped_cards:
+            first = model.flipped_cards[0]
+            for index in self.by_face.get(model.cards[first], ()):
+                if index != first:
+                    return index
+        elif self.pairs:
+            return min(self.by_face[min(self.pairs)])
+        unknown = sorted(self.unknown)
+        return unknown[int(self.rng.random() * len(unknown))]
+
+
+def play(model, player, deal):
+    """
+    One round of deal with player on a MemoryModel. Returns (moves, seconds).
+    """
+    clock = model.clock
+    model.reset()
+    model.cards = array("H", deal)
+    player.start(model)
+    while model.state != ROUND_WON:
+        for _ in range(2):
+            clock.advance(THINK_TIME)
+            index = player.pick(model)
+            model.flip_card(index)
+            player.flipped(index, model.cards[index])
+        first, second = model.flipped_cards
+        clock.advance(model.flip_delay)
+        model.advance()
+        player.settled(first, second, model.flags[first] & MATCHED)
+        if model.state not in (PLAYING, ROUND_WON):
+            raise RuntimeError(f"round stuck in {model.state}")
+    return model.moves, clock() - model.timer_start
+
+
+def spot_check(grid_size, strategy, deals, seed):
+    """
+    Replay `deals` deals through MemoryModel and compare with the arrays.
+    Memory players must agree deal for deal, seeded alike; the random
+    player, whose rounds the arrays never play out, must land near the
+    expected 2 * pairs**2 moves. Returns a description of the first
+    disagreement, or None.
+    """
+    rng = np.random.default_rng(seed)
+    model = MemoryModel(grid_size, timer_limit=float("inf"), images=[""],
+                        loader=AssetLoader(offline=True), clock=ManualClock())
+    pairs = model.card_count // 2
+    kind, capacity = parse_strategy(strategy)
+    dealt = batched_deals(deals, model.card_count, rng)
+
+    if kind == "random":
+        player = RandomPlayer(random.Random(int(rng.integers(1 << 63))))
+        mean = np.mean([play(model, player, deal)[0] for deal in dealt.tolist()])
+        # each pair takes a geometric number of turns, p = 1 / (2r - 1)
+        spread = 2 * np.sqrt(sum((2 * r - 1) * (2 * r - 2) for r in range(1, pairs + 1)) / deals)
+        if abs(mean - 2 * pairs ** 2) > 5 * spread:
+            return f"{mean:.1f} moves on average, expected {2 * pairs ** 2}"
+        return None
+
+    for deal, key in zip(dealt, rng.integers(1 << 63, size=deals)):
+        real_moves, real_seconds = play(model, MemoryPlayer(np.random.default_rng(key), capacity),
+                                        deal.tolist())
+        moves, turns = memory_rounds(deal[None], np.random.default_rng(key), capacity)
+        seconds = moves[0] * THINK_TIME + turns[0] * FLIP_DELAY
+        if real_moves != moves[0] or not np.isclose(real_seconds, seconds):
+            return (f"deal {deal.tolist()}: MemoryModel {real_moves} moves {real_seconds:.1f}s, "
+                    f"arrays {moves[0]} moves {seconds:.1f}s")
+    return None
+
+
+def simulate_chunk(grid_size, strategy, deals, seed):
+    """
+    Worker entry point: play `deals` deals; returns (moves, seconds) arrays.
+    """
+    return simulate(grid_size, strategy, deals, np.random.default_rng(seed))
+
+
+def analyse(grid_sizes, strategies, deals, workers=None, seed=0):
+    """
+    Per (grid size, strategy) move and time distributions.
+    """
+    jobs = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for grid_size in grid_sizes:
+            for strategy in strategies:
+                for n, start in enumerate(range(0, deals, CHUNK)):
+                    size = min(CHUNK, deals - start)
+                    future = pool.submit(simulate_chunk, grid_size, strategy, size,
+                                         [seed, grid_size, n])
+                    jobs.append((grid_size, strategy, future))
+
+        parts = {}
+        for grid_size, strategy, future in jobs:
+            parts.setdefault((grid_size, strategy), []).append(future.result())
+
+    report = []
+    for (grid_size, strategy), chunks in parts.items():
+        moves = np.concatenate([m for m, _ in chunks])
+        seconds = np.concatenate([s for _, s in chunks])
+        report.append({
+            "grid_size": grid_size,
+            "strategy": strategy,
+            "deals": len(moves),
+            "moves": distribution(moves),
+            "seconds": distribution(seconds),
+            # share of rounds won within each candidate timer_limit
+            "win_rate": {limit: float(np.mean(seconds <= limit)) for limit in TIMER_LIMITS},
+        })
+    return report
+
+
+def distribution(values):
+    p50, p90, p99 = np.percentile(values, (50, 90, 99))
+    return {"mean": float(values.mean()), "p50": float(p50), "p90": float(p90),
+            "p99": float(p99), "max": float(values.max())}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--grids", type=int, nargs="+", default=[4, 6, 8])
+    parser.add_argument("--strategies", nargs="+", default=list(DEFAULT_STRATEGIES),
+                        help="perfect, random or limited:K")
+    parser.add_argument("--deals", type=int, default=10000, help="deals per grid and strategy")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", type=int, default=SPOT_CHECK,
+                        help="deals per grid and strategy replayed through MemoryModel (0: none)")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        for grid_size in args.grids:
+            for strategy in args.strategies:
+                problem = spot_check(grid_size, strategy, args.check, [args.seed, grid_size])
+                if problem is not None:
+                    print(f"spot check failed, grid {grid_size} {strategy}: {problem}")
+                    return 1
+
+    start = time.perf_counter()
+    report = analyse(args.grids, args.strategies, args.deals, args.workers, args.seed)
+    elapsed = time.perf_counter() - start
+    rounds = sum(row["deals"] for row in report)
+    print(f"{rounds} rounds in {elapsed:.1f}s ({rounds / elapsed:.0f} rounds/s)")
+
+    limits = "".join(f"{f'<={limit}s':>8s}" for limit in TIMER_LIMITS)
+    print(f"{'grid':>5s} {'strategy':12s} {'moves p50/p90/p99':>20s} {'seconds p50/p90/p99':>22s}{limits}")
+    for row in report:
+        m, s = row["moves"], row["seconds"]
+        wins = "".join(f"{row['win_rate'][limit]:8.1%}" for limit in TIMER_LIMITS)
+        print(f"{row['grid_size']:>5d} {row['strategy']:12s} "
+              f"{m['p50']:6.0f}/{m['p90']:5.0f}/{m['p99']:5.0f}     "
+              f"{s['p50']:6.1f}/{s['p90']:6.1f}/{s['p99']:6.1f}   {wins}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Game-logic timing shared by the games.
+"""
+import time
+
+# most logic steps run in one frame; a longer backlog is dropped
+MAX_CATCH_UP = 5
+
+
+class FixedTimestep:
+    """
+    How many fixed-length logic steps are due, from an accumulator fed by
+    a monotonic clock.
+
+    A loop calls advance() once a frame and runs that many steps, so logic
+    runs at the same rate whatever the frame rate. After a stall at most
+    max_steps run and the rest of the backlog is dropped: the game slows
+    down for a moment instead of racing to catch up. alpha() is how far
+    the frame is between the last step and the next, for drawing in
+    between.
+    """
+
+    def __init__(self, step, max_steps=MAX_CATCH_UP, clock=time.monotonic):
+        self.step = step
+        self.max_steps = max_steps
+        self.clock = clock
+        self.accumulator = 0.0
+        self.last = clock()
+        self.dropped = 0
+
+    def reset(self):
+        """
+        Start timing afresh, e.g. after a trip to the menu, so the time away
+        isn't owed as steps.
+        """
+        self.accumulator = 0.0
+        self.last = self.clock()
+
+    def advance(self):
+        now = self.clock()
+        self.accumulator += now - self.last
+        self.last = now
+        steps = int(self.accumulator // self.step)
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            # keep the fraction so interpolation doesn't jump
+            self.accumulator %= self.step
+        else:
+            self.accumulator -= steps * self.step
+        return steps
+
+    def alpha(self):
+        return min(1.0, self.accumulator / self.step)
+
+    def timeout(self):
+        """
+        Seconds until the next step is due.
+        """
+        return max(0.0, self.step - self.accumulator - (self.clock() - self.last))
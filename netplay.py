@@ -0,0 +1,1050 @@
+"""
+Strawberry Snake for two to four players over the LAN.
+
+An asyncio UDP server owns every match's game1 state and ticks it every
+TICK_MS. After a tick each player is sent only what changed (per snake
+its new head cell and whether its tail moved, plus the fruit if it
+moved) for every tick since the last one that player acknowledged, so a
+lost packet is covered by the next one; players too far behind get a
+full snapshot instead. Clients run their own snake ahead of the server
+using the inputs it hasn't confirmed yet and snap back to the server's
+state whenever an update arrives.
+
+    python -m src.netplay serve [--port 4567]
+    python -m src.netplay join HOST[:PORT] [--players 2]
+    python -m src.netplay selftest --matches 100 --latency 0.05 --loss 0.1
+"""
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import threading
+import time
+from collections import deque
+
+import pygame
+
+from src.atlas import get_atlas
+from src.game1 import BACKGROUND_COLOR, CELL_NUMBER, CELL_SIZE, FreeCells, Fruit, Snake
+from src.lifecycle import BACK_TO_MENU, QUIT_APP, GameScene, run_standalone
+from src.snake_sim import DIRECTIONS
+from src.text_cache import render_text
+from src.view import GameLoop
+
+NET_PORT = int(os.environ.get("GAME_NET_PORT", 4567))
+TICK_MS = 150
+TICK_SECONDS = TICK_MS / 1000
+MAX_PLAYERS = 4
+# ticks of deltas kept per match; a player further behind gets a snapshot
+HISTORY = 32
+# unconfirmed inputs repeated in every INPUT packet
+MAX_INPUTS = 8
+# most ticks a client runs its own snake ahead of the server
+MAX_PREDICT = 8
+CLIENT_TIMEOUT = 10.0
+# seconds a finished match keeps sending, so its last ticks get through
+END_LINGER = 3.0
+JOIN_RETRY = 0.5
+NO_CELL = 0xFFFF
+NO_TICK = 0xFFFFFFFF
+PLAYER_COLORS = ((255, 85, 163), (46, 117, 182), (84, 160, 53), (191, 144, 0))
+
+# message types
+JOIN, WELCOME, INPUT, DELTA, SNAPSHOT, LEAVE = range(1, 7)
+# type, match id, tick (for INPUT: the client's latest confirmed tick)
+HEADER = struct.Struct("<BHI")
+JOIN_BODY = struct.Struct("<BI")            # players wanted, nonce
+WELCOME_BODY = struct.Struct("<BBBI")       # player, players, cell number, nonce
+INPUT_BODY = struct.Struct("<BIB")          # player, echo (client ms), inputs
+INPUT_ITEM = struct.Struct("<IB")           # seq, direction
+# inputs applied, echo, ms the echo was held, ticks, snakes, ended
+DELTA_BODY = struct.Struct("<IIHBBB")
+FRUIT_ITEM = struct.Struct("<H")            # fruit cell, NO_CELL if it didn't move
+SNAKE_ITEM = struct.Struct("<BH")           # flags, head cell
+# inputs applied, echo, ms held, fruit cell, snakes, ended
+SNAPSHOT_BODY = struct.Struct("<IIHHBB")
+SNAKE_HEADER = struct.Struct("<BBH")        # flags, direction, length
+LEAVE_BODY = struct.Struct("<B")            # player
+
+# snake flags
+ALIVE = 1
+GREW = 2
+DIED = 4
+
+
+def direction_index(direc):
+    return DIRECTIONS.index(direc)
+
+
+def start_positions(n):
+    """
+    (head x, head y, direction) for up to MAX_PLAYERS snakes, spread out
+    and facing into the board.
+    """
+    return [
+        (5, n // 3, DIRECTIONS[1]),
+        (n - 6, 2 * n // 3, DIRECTIONS[3]),
+        (n // 3, n - 6, DIRECTIONS[0]),
+        (2 * n // 3, 5, DIRECTIONS[2]),
+    ]
+
+
+def now_ms():
+    return int(time.monotonic() * 1000) & 0xFFFFFFFF
+
+
+class Link:
+    """
+    Sends datagrams through a transport, optionally with simulated latency,
+    jitter and packet loss so everything can be exercised on loopback.
+    """
+
+    def __init__(self, transport, latency=0.0, jitter=0.0, loss=0.0, rng=None):
+        self.transport = transport
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = rng if rng is not None else random.Random()
+        self.loop = asyncio.get_running_loop()
+        self.packets = 0
+        self.bytes = 0
+
+    def send(self, data, addr=None):
+        self.packets += 1
+        self.bytes += len(data)
+        if self.loss and self.rng.random() < self.loss:
+            return
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            self.loop.call_later(delay, self.deliver, data, addr)
+        else:
+            self.deliver(data, addr)
+
+    def deliver(self, data, addr):
+        if not self.transport.is_closing():
+            self.transport.sendto(data, addr)
+
+
+class Match:
+    """
+    One game on the server: game1 Snakes sharing a board, a FreeCells set
+    and a Fruit, stepped together.
+    """
+
+    def __init__(self, match_id, players, cell_number=CELL_NUMBER, seed=None):
+        self.id = match_id
+        self.players = players
+        self.cell_number = cell_number
+        self.rng = random.Random(seed)
+        self.addresses = [None] * players
+        self.nonces = [0] * players
+        self.last_seen = [0.0] * players
+        # per player: last input seq applied, last tick confirmed, echo
+        self.input_seq = [0] * players
+        self.acked = [-1] * players
+        self.echo = [0] * players
+        self.echo_at = [0.0] * players
+        self.leaving = [False] * players
+        self.started = False
+        self.ended = False
+        self.ended_at = None
+        self.tick = 0
+        # (tick, encoded changes) for the last HISTORY ticks
+        self.history = deque(maxlen=HISTORY)
+        self.snakes = []
+        self.alive = []
+        self.fruit = None
+
+    def seats_left(self):
+        return self.addresses.count(None)
+
+    def add_player(self, addr, nonce, now):
+        player = self.addresses.index(None)
+        self.addresses[player] = addr
+        self.nonces[player] = nonce
+        self.last_seen[player] = now
+        return player
+
+    def start(self):
+        n = self.cell_number
+        self.free_cells = FreeCells(n, (0, 0, n, n))
+        self.snakes = [Snake(n, self.free_cells, start)
+                       for start in start_positions(n)[:self.players]]
+        self.alive = [True] * self.players
+        self.fruit = Fruit(self.rng, n, self.free_cells)
+        self.started = True
+
+    def fruit_cell(self):
+        return NO_CELL if self.fruit.x < 0 else self.fruit.y * self.cell_number + self.fruit.x
+
+    def apply_inputs(self, player, inputs):
+        for seq, direction in inputs:
+            if seq <= self.input_seq[player]:
+                continue
+            self.input_seq[player] = seq
+            if self.alive[player] and direction < len(DIRECTIONS):
+                self.snakes[player].turn(DIRECTIONS[direction])
+
+    def step(self, now):
+        snakes, alive = self.snakes, self.alive
+        fruit_before = self.fruit_cell()
+        living = [i for i in range(self.players) if alive[i]]
+        for i in living:
+            snakes[i].move_snake()
+        # a cell one snake vacated may just have been entered by another
+        for i in living:
+            if snakes[i].head_cell >= 0:
+                self.free_cells.discard(snakes[i].head_cell)
+
+        died = []
+        for i in living:
+            head = snakes[i].head_cell
+            if (head < 0 or snakes[i].bitten or self.leaving[i]
+                    or any(j != i and snakes[j].occupied[head] for j in living)):
+                died.append(i)
+        for i in died:
+            self.kill(i)
+
+        fruit = self.fruit_cell()
+        for i in living:
+            if alive[i] and snakes[i].head_cell == fruit:
+                snakes[i].extend_snake()
+                self.fruit.change_fruit_loc()
+                break
+
+        self.tick += 1
+        fruit_after = self.fruit_cell()
+        parts = [FRUIT_ITEM.pack(fruit_after if fruit_after != fruit_before else NO_CELL)]
+        for i, snake in enumerate(snakes):
+            if i in died:
+                flags = DIED
+            elif alive[i]:
+                flags = ALIVE | (GREW if snake.vacated < 0 else 0)
+            else:
+                flags = 0
+            head = snake.head_cell if i in living and snake.head_cell >= 0 else NO_CELL
+            parts.append(SNAKE_ITEM.pack(flags, head))
+        self.history.append((self.tick, b"".join(parts)))
+
+        remaining = sum(alive)
+        if remaining == 0 or (self.players > 1 and remaining == 1):
+            self.ended = True
+            self.ended_at = now
+
+    def kill(self, i):
+        self.alive[i] = False
+        snake = self.snakes[i]
+        others = [s for j, s in enumerate(self.snakes) if j != i and self.alive[j]]
+        for cell in snake.iter_cells():
+            if cell < 0:
+                continue
+            snake.occupied[cell] = 0
+            if not any(other.occupied[cell] for other in others):
+                self.free_cells.add(cell)
+
+    def body_cells(self, i):
+        if not self.alive[i]:
+            return []
+        return list(self.snakes[i].iter_cells())
+
+    def state(self):
+        """
+        (tick, fruit cell, [(alive, cells head first)]) for comparisons.
+        """
+        return (self.tick, self.fruit_cell(),
+                [(self.alive[i], self.body_cells(i)) for i in range(self.players)])
+
+    def update_for(self, player, now):
+        """
+        The packet bringing player up to date: the changes since their last
+        confirmed tick, or a snapshot if they're too far behind.
+        """
+        held = min(65535, int((now - self.echo_at[player]) * 1000)) if self.echo[player] else 0
+        behind = self.tick - self.acked[player]
+        if self.acked[player] < 0 or behind > len(self.history):
+            return self.snapshot(player, held)
+        records = [record for _, record in list(self.history)[len(self.history) - behind:]]
+        return b"".join([HEADER.pack(DELTA, self.id, self.tick),
+                         DELTA_BODY.pack(self.input_seq[player], self.echo[player], held,
+                                         len(records), self.players, self.ended)] + records)
+
+    def snapshot(self, player, held):
+        parts = [HEADER.pack(SNAPSHOT, self.id, self.tick),
+                 SNAPSHOT_BODY.pack(self.input_seq[player], self.echo[player], held,
+                                    self.fruit_cell(), self.players, self.ended)]
+        for i, snake in enumerate(self.snakes):
+            cells = self.body_cells(i)
+            parts.append(SNAKE_HEADER.pack(ALIVE if self.alive[i] else 0,
+                                           direction_index(snake.direc), len(cells)))
+            parts.append(struct.pack(f"<{len(cells)}H", *cells))
+        return b"".join(parts)
+
+
+class GameServer(asyncio.DatagramProtocol):
+    """
+    Matchmaking and the tick loop for every match on one UDP port.
+
+    A JOIN puts the player in the first match waiting for the same number
+    of players; the match starts when it is full. run() steps all running
+    matches every TICK_MS on the monotonic clock and sends each player
+    their update.
+    """
+
+    def __init__(self, cell_number=CELL_NUMBER, latency=0.0, jitter=0.0, loss=0.0,
+                 linger=END_LINGER, seed=None):
+        self.cell_number = cell_number
+        self.link_options = (latency, jitter, loss)
+        self.linger = linger
+        self.rng = random.Random(seed)
+        self.matches = {}
+        self.waiting = {}
+        self.by_address = {}
+        self.next_id = 0
+        self.link = None
+        self.paused = False
+        self.ticks = 0
+        self.tick_time = 0.0
+        self.worst_tick = 0.0
+
+    def connection_made(self, transport):
+        latency, jitter, loss = self.link_options
+        self.link = Link(transport, latency, jitter, loss, random.Random(self.rng.random()))
+
+    def datagram_received(self, data, addr):
+        try:
+            kind, match_id, tick = HEADER.unpack_from(data)
+            if kind == JOIN:
+                self.join(addr, *JOIN_BODY.unpack_from(data, HEADER.size))
+            elif kind == INPUT:
+                self.input(addr, match_id, tick, data)
+            elif kind == LEAVE:
+                self.leave(addr, match_id)
+        except struct.error:
+            # not one of ours, or truncated
+            pass
+
+    def new_match(self, players):
+        while self.next_id in self.matches:
+            self.next_id = (self.next_id + 1) & 0xFFFF
+        match = Match(self.next_id, players, self.cell_number, self.rng.random())
+        self.matches[match.id] = match
+        self.next_id = (self.next_id + 1) & 0xFFFF
+        return match
+
+    def join(self, addr, players, nonce):
+        now = time.monotonic()
+        known = self.by_address.get(addr)
+        if known is not None:
+            match, player = known
+            if match.nonces[player] == nonce:
+                # our WELCOME was lost
+                self.welcome(match, player)
+                return
+            self.leave(addr, match.id)
+
+        players = max(1, min(MAX_PLAYERS, players))
+        match = self.waiting.get(players)
+        if match is None:
+            match = self.waiting[players] = self.new_match(players)
+        player = match.add_player(addr, nonce, now)
+        self.by_address[addr] = (match, player)
+        self.welcome(match, player)
+        if not match.seats_left():
+            del self.waiting[players]
+            match.start()
+
+    def welcome(self, match, player):
+        self.link.send(HEADER.pack(WELCOME, match.id, match.tick)
+                       + WELCOME_BODY.pack(player, match.players, match.cell_number, match.nonces[player]),
+                       match.addresses[player])
+
+    def input(self, addr, match_id, tick, data):
+        known = self.by_address.get(addr)
+        if known is None or known[0].id != match_id:
+            return
+        match, player = known
+        sender, echo, count = INPUT_BODY.unpack_from(data, HEADER.size)
+        if sender != player:
+            return
+        now = time.monotonic()
+        match.last_seen[player] = now
+        if tick != NO_TICK:
+            match.acked[player] = min(match.tick, max(match.acked[player], tick))
+        match.echo[player] = echo
+        match.echo_at[player] = now
+        offset = HEADER.size + INPUT_BODY.size
+        inputs = [INPUT_ITEM.unpack_from(data, offset + i * INPUT_ITEM.size) for i in range(count)]
+        if match.started and not match.ended:
+            match.apply_inputs(player, inputs)
+
+    def leave(self, addr, match_id):
+        known = self.by_address.pop(addr, None)
+        if known is None or known[0].id != match_id:
+            return
+        match, player = known
+        match.addresses[player] = None
+        if not match.started:
+            # free the seat for someone else
+            return
+        match.leaving[player] = True
+        if not any(match.addresses):
+            self.drop(match)
+
+    def drop(self, match):
+        self.matches.pop(match.id, None)
+        if self.waiting.get(match.players) is match:
+            del self.waiting[match.players]
+        for addr in match.addresses:
+            if addr is not None:
+                self.by_address.pop(addr, None)
+
+    def tick(self):
+        start = time.perf_counter()
+        now = time.monotonic()
+        for match in list(self.matches.values()):
+            for player, addr in enumerate(match.addresses):
+                if addr is not None and now - match.last_seen[player] > CLIENT_TIMEOUT:
+                    self.leave(addr, match.id)
+            if not match.started:
+                continue
+            if match.ended:
+                if now - match.ended_at > self.linger:
+                    self.drop(match)
+                    continue
+            elif not self.paused:
+                match.step(now)
+            for player, addr in enumerate(match.addresses):
+                if addr is not None:
+                    self.link.send(match.update_for(player, now), addr)
+        elapsed = time.perf_counter() - start
+        self.ticks += 1
+        self.tick_time += elapsed
+        self.worst_tick = max(self.worst_tick, elapsed)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            deadline += TICK_SECONDS
+            await asyncio.sleep(max(0.0, deadline - loop.time()))
+            self.tick()
+
+
+async def serve(host="0.0.0.0", port=NET_PORT, **options):
+    loop = asyncio.get_running_loop()
+    server = GameServer(**options)
+    transport, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=(host, port))
+    try:
+        await server.run()
+    finally:
+        transport.close()
+
+
+class ClientSession:
+    """
+    A player's view of one match, without any I/O.
+
+    `tick`, `snakes`, `fruit` are the last state confirmed by the server
+    (snakes as deques of cells, head first). press() records a turn as an
+    input that is resent until the server confirms it; predicted() replays
+    the unconfirmed inputs on top of the confirmed state to show our own
+    snake where it will be by the time the server hears about them.
+    """
+
+    def __init__(self, players=2, nonce=None):
+        self.players = players
+        self.nonce = nonce if nonce is not None else random.getrandbits(32)
+        self.player = None
+        self.match_id = 0
+        self.cell_number = CELL_NUMBER
+        self.tick = -1
+        self.snakes = []
+        self.alive = []
+        self.directions = []
+        self.fruit = NO_CELL
+        self.ended = False
+        # (seq, direction, tick it was meant for) not yet applied by the server
+        self.inputs = deque()
+        self.seq = 0
+        # smoothed round trip in seconds, from the echoed input timestamps
+        self.rtt = 0.0
+        self.rtt_samples = 0
+        # predicted own head by tick, to score predictions once confirmed
+        self.predictions = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def started(self):
+        return self.tick >= 0
+
+    def join_packet(self):
+        return HEADER.pack(JOIN, 0, 0) + JOIN_BODY.pack(self.players, self.nonce)
+
+    def leave_packet(self):
+        return HEADER.pack(LEAVE, self.match_id, 0) + LEAVE_BODY.pack(self.player or 0)
+
+    def input_packet(self):
+        inputs = list(self.inputs)[-MAX_INPUTS:]
+        return b"".join([HEADER.pack(INPUT, self.match_id, self.tick if self.tick >= 0 else NO_TICK),
+                         INPUT_BODY.pack(self.player, now_ms(), len(inputs))]
+                        + [INPUT_ITEM.pack(seq, direction) for seq, direction, _ in inputs])
+
+    def press(self, direction):
+        self.seq += 1
+        self.inputs.append((self.seq, direction, self.predicted_tick() + 1))
+
+    def lead(self):
+        """
+        Ticks our snake is shown ahead of the server: the whole ticks in a
+        round trip, which is roughly how far the server will be past our
+        confirmed tick when an input sent now reaches it.
+        """
+        return min(MAX_PREDICT, int(self.rtt / TICK_SECONDS))
+
+    def predicted_tick(self):
+        return self.tick + self.lead()
+
+    def handle(self, data):
+        """
+        Apply a server packet; returns True if the confirmed state changed.
+        """
+        try:
+            kind, match_id, tick = HEADER.unpack_from(data)
+            if kind == WELCOME:
+                player, players, cell_number, nonce = WELCOME_BODY.unpack_from(data, HEADER.size)
+                if nonce == self.nonce and self.player is None:
+                    self.player, self.players, self.cell_number = player, players, cell_number
+                    self.match_id = match_id
+                return False
+            if self.player is None or match_id != self.match_id:
+                return False
+            if kind == SNAPSHOT:
+                return self.apply_snapshot(tick, data)
+            if kind == DELTA:
+                return self.apply_delta(tick, data)
+        except struct.error:
+            pass
+        return False
+
+    def confirm(self, acked, echo, held):
+        while self.inputs and self.inputs[0][0] <= acked:
+            self.inputs.popleft()
+        if echo:
+            sample = ((now_ms() - echo) & 0xFFFFFFFF) - held
+            if 0 <= sample < 10000:
+                self.rtt_samples += 1
+                # the first sample stands alone, later ones are smoothed
+                self.rtt += (sample / 1000 - self.rtt) / min(8, self.rtt_samples)
+
+    def apply_snapshot(self, tick, data):
+        acked, echo, held, fruit, count, ended = SNAPSHOT_BODY.unpack_from(data, HEADER.size)
+        self.confirm(acked, echo, held)
+        if tick <= self.tick:
+            return False
+        offset = HEADER.size + SNAPSHOT_BODY.size
+        self.snakes, self.alive, self.directions = [], [], []
+        for _ in range(count):
+            flags, direction, length = SNAKE_HEADER.unpack_from(data, offset)
+            offset += SNAKE_HEADER.size
+            self.snakes.append(deque(struct.unpack_from(f"<{length}H", data, offset)))
+            offset += 2 * length
+            self.alive.append(bool(flags & ALIVE))
+            self.directions.append(direction)
+        self.fruit = fruit
+        self.ended = bool(ended)
+        self.tick = tick
+        self.score_predictions()
+        return True
+
+    def apply_delta(self, tick, data):
+        acked, echo, held, ticks, count, ended = DELTA_BODY.unpack_from(data, HEADER.size)
+        self.confirm(acked, echo, held)
+        first = tick - ticks + 1
+        if tick <= self.tick or first > self.tick + 1 or count != len(self.snakes):
+            # old news, or a gap only a snapshot can fill
+            return False
+        record_size = FRUIT_ITEM.size + count * SNAKE_ITEM.size
+        offset = HEADER.size + DELTA_BODY.size + (self.tick + 1 - first) * record_size
+        for _ in range(self.tick + 1, tick + 1):
+            (fruit,) = FRUIT_ITEM.unpack_from(data, offset)
+            offset += FRUIT_ITEM.size
+            if fruit != NO_CELL:
+                self.fruit = fruit
+            for i in range(count):
+                flags, head = SNAKE_ITEM.unpack_from(data, offset)
+                offset += SNAKE_ITEM.size
+                if flags & DIED:
+                    self.alive[i] = False
+                    self.snakes[i].clear()
+                elif flags & ALIVE:
+                    self.directions[i] = self.step_direction(self.snakes[i][0], head)
+                    self.snakes[i].appendleft(head)
+                    if not flags & GREW:
+                        self.snakes[i].pop()
+        self.ended = bool(ended)
+        self.tick = tick
+        self.score_predictions()
+        return True
+
+    def step_direction(self, old, new):
+        n = self.cell_number
+        dx, dy = new % n - old % n, new // n - old // n
+        for index, direc in enumerate(DIRECTIONS):
+            if (direc.x, direc.y) == (dx, dy):
+                return index
+        return 0
+
+    def score_predictions(self):
+        if self.player is None or not self.alive or not self.alive[self.player]:
+            self.predictions.clear()
+            return
+        head = self.snakes[self.player][0]
+        for tick in [t for t in self.predictions if t <= self.tick]:
+            predicted = self.predictions.pop(tick)
+            if tick == self.tick:
+                if predicted == head:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+
+    def predicted(self):
+        """
+        Our snake's cells (head first) at predicted_tick(): the confirmed
+        body moved on by the inputs the server hasn't confirmed yet. Other
+        snakes are shown as confirmed.
+        """
+        own = self.player
+        if own is None or not self.started or not self.alive[own]:
+            return []
+        n = self.cell_number
+        cells = deque(self.snakes[own])
+        direction = self.directions[own]
+        blocked = set()
+        for i, body in enumerate(self.snakes):
+            if i != own:
+                blocked.update(body)
+        pending = list(self.inputs)
+        target = self.predicted_tick()
+        for tick in range(self.tick + 1, target + 1):
+            while pending and pending[0][2] <= tick:
+                _, turn, _ = pending.pop(0)
+                # the same rule as Snake.turn: no reversing into the neck
+                if turn != (direction + 2) % 4:
+                    direction = turn
+            step = DIRECTIONS[direction]
+            x, y = cells[0] % n + int(step.x), cells[0] // n + int(step.y)
+            if not (0 <= x < n and 0 <= y < n) or y * n + x in blocked:
+                # the server will have the final word on crashes
+                break
+            head = y * n + x
+            cells.appendleft(head)
+            if head != self.fruit:
+                cells.pop()
+            self.predictions[tick] = head
+        return list(cells)
+
+
+class ClientProtocol(asyncio.DatagramProtocol):
+    """
+    Drives a ClientSession over a connected UDP socket: retries JOIN until
+    welcomed and sends the inputs (which double as acknowledgements) every
+    tick and straight after each key press.
+    """
+
+    def __init__(self, session, latency=0.0, jitter=0.0, loss=0.0, rng=None, lock=None):
+        self.session = session
+        self.link_options = (latency, jitter, loss, rng)
+        self.lock = lock if lock is not None else threading.Lock()
+        self.link = None
+        self.updated = asyncio.Event()
+
+    def connection_made(self, transport):
+        self.link = Link(transport, *self.link_options)
+
+    def datagram_received(self, data, addr):
+        with self.lock:
+            changed = self.session.handle(data)
+        if changed:
+            self.updated.set()
+
+    def send_join(self):
+        with self.lock:
+            packet = self.session.join_packet()
+        self.link.send(packet)
+
+    def send_input(self):
+        with self.lock:
+            if self.session.player is None:
+                return
+            packet = self.session.input_packet()
+        self.link.send(packet)
+
+    def send_leave(self):
+        with self.lock:
+            if self.session.player is None:
+                return
+            packet = self.session.leave_packet()
+        self.link.send(packet)
+
+    async def run(self):
+        """
+        Join, then keep the server posted every tick until cancelled.
+        """
+        while self.session.player is None:
+            self.send_join()
+            await asyncio.sleep(JOIN_RETRY)
+        while True:
+            self.send_input()
+            await asyncio.sleep(TICK_SECONDS)
+
+
+async def connect(address, session, **options):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: ClientProtocol(session, **options), remote_addr=address)
+    return transport, protocol
+
+
+def bot_direction(session):
+    """
+    Simple bot for the self-test: the safe move closest to the fruit.
+    """
+    cells = session.predicted()
+    if not cells:
+        return None
+    n = session.cell_number
+    blocked = set(cells)
+    for i, body in enumerate(session.snakes):
+        if i != session.player and body:
+            blocked.update(body)
+            # wherever the other head could go next
+            ox, oy = body[0] % n, body[0] // n
+            blocked.update((oy + int(s.y)) * n + ox + int(s.x) for s in DIRECTIONS)
+    head = cells[0]
+    direction = session.step_direction(cells[1], head)
+    if session.inputs and session.inputs[-1][2] > session.predicted_tick():
+        # already turning on the next move
+        direction = session.inputs[-1][1]
+    fx, fy = session.fruit % n, session.fruit // n
+    best = None
+    for index, step in enumerate(DIRECTIONS):
+        if index == (direction + 2) % 4:
+            continue
+        x, y = head % n + int(step.x), head // n + int(step.y)
+        if not (0 <= x < n and 0 <= y < n) or y * n + x in blocked:
+            continue
+        score = abs(x - fx) + abs(y - fy) + random.random()
+        if best is None or score < best[0]:
+            best = (score, index)
+    return None if best is None or best[1] == direction else best[1]
+
+
+async def selftest(matches=100, players=2, seconds=10.0, latency=0.0, jitter=0.0, loss=0.0, seed=0):
+    """
+    A server plus matches * players bot clients on loopback, all in this
+    process. After `seconds` the server stops stepping (but keeps sending)
+    and every client's confirmed state is compared with the server's.
+    """
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    server = GameServer(latency=latency, jitter=jitter, loss=loss, linger=float("inf"), seed=seed)
+    server_transport, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=("127.0.0.1", 0))
+    address = server_transport.get_extra_info("sockname")
+    ticker = asyncio.create_task(server.run())
+
+    clients = []
+    for _ in range(matches * players):
+        session = ClientSession(players, nonce=rng.getrandbits(32))
+        transport, protocol = await connect(address, session, latency=latency, jitter=jitter,
+                                            loss=loss, rng=random.Random(rng.random()))
+        clients.append((session, transport, protocol, asyncio.create_task(protocol.run())))
+
+    steering = True
+
+    async def steer(session, protocol):
+        while True:
+            await protocol.updated.wait()
+            protocol.updated.clear()
+            if steering and session.started and not session.ended:
+                direction = bot_direction(session)
+                if direction is not None:
+                    session.press(direction)
+                    protocol.send_input()
+
+    steerers = [asyncio.create_task(steer(session, protocol)) for session, _, protocol, _ in clients]
+    start = time.perf_counter()
+    await asyncio.sleep(seconds)
+    running = sum(1 for m in server.matches.values() if m.started and not m.ended)
+    stepped = server.ticks
+    steering = False
+    server.paused = True
+    # let every client catch up with the frozen state
+    deadline = time.monotonic() + 5 + 40 * (latency + jitter)
+    while time.monotonic() < deadline:
+        if all(s.tick == server.matches[s.match_id].tick for s, *_ in clients
+               if s.player is not None and s.match_id in server.matches):
+            break
+        await asyncio.sleep(TICK_SECONDS)
+    wall = time.perf_counter() - start
+
+    mismatches = 0
+    for session, *_ in clients:
+        match = server.matches.get(session.match_id)
+        if session.player is None or match is None:
+            mismatches += 1
+            continue
+        tick, fruit, snakes = match.state()
+        mine = (session.tick, session.fruit,
+                [(session.alive[i], list(session.snakes[i])) for i in range(len(session.snakes))])
+        if mine != (tick, fruit, snakes):
+            mismatches += 1
+
+    for task in steerers + [c[3] for c in clients] + [ticker]:
+        task.cancel()
+    for _, transport, _, _ in clients:
+        transport.close()
+    server_transport.close()
+
+    hits = sum(s.hits for s, *_ in clients)
+    misses = sum(s.misses for s, *_ in clients)
+    return {
+        "clients": len(clients),
+        "matches": len(server.matches),
+        "running_at_end": running,
+        "server_ticks": stepped,
+        "wall": wall,
+        "mean_tick_ms": server.tick_time / max(1, server.ticks) * 1000,
+        "worst_tick_ms": server.worst_tick * 1000,
+        "server_bytes_per_player_tick": server.link.bytes / max(1, stepped) / max(1, len(clients)),
+        "prediction_hit_rate": hits / (hits + misses) if hits + misses else 1.0,
+        "mismatches": mismatches,
+    }
+
+
+class NetClient:
+    """
+    ClientProtocol on an asyncio loop in a background thread, for the
+    pygame client. The session is shared under `lock`.
+    """
+
+    def __init__(self, address, players=2):
+        self.session = ClientSession(players)
+        self.lock = threading.Lock()
+        self.address = address
+        self.protocol = None
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self.main(),),
+                                       name="netplay", daemon=True)
+        self.thread.start()
+
+    async def main(self):
+        transport, self.protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+            lambda: ClientProtocol(self.session, lock=self.lock), remote_addr=self.address)
+        try:
+            await self.protocol.run()
+        except asyncio.CancelledError:
+            self.protocol.send_leave()
+        finally:
+            transport.close()
+
+    def press(self, direction):
+        with self.lock:
+            self.session.press(direction)
+        if self.protocol is not None:
+            self.loop.call_soon_threadsafe(self.protocol.send_input)
+
+    def close(self):
+        def cancel():
+            for task in asyncio.all_tasks(self.loop):
+                task.cancel()
+        self.loop.call_soon_threadsafe(cancel)
+        self.thread.join(timeout=1)
+
+
+def start_server_thread(host="0.0.0.0", port=NET_PORT):
+    """
+    Host a server from inside the game; returns its thread, or None if
+    the port is taken (most likely by a server that's already running).
+    """
+    loop = asyncio.new_event_loop()
+    server = GameServer()
+    try:
+        transport, _ = loop.run_until_complete(
+            loop.create_datagram_endpoint(lambda: server, local_addr=(host, port)))
+    except OSError:
+        loop.close()
+        return None
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.run(),),
+                              name="netplay-server", daemon=True)
+    thread.start()
+    return thread
+
+
+def parse_address(text):
+    host, _, port = text.rpartition(":") if ":" in text else (text, "", "")
+    return host, int(port) if port else NET_PORT
+
+
+class NetSnakeGame(GameScene):
+    """
+    Networked Strawberry Snake. Joins the server in GAME_SERVER
+    (host[:port]), or hosts one on NET_PORT for the LAN and joins that.
+    GAME_NET_PLAYERS sets the match size (default 2).
+    """
+
+    assets = ("images/strawberry4.png", "images/snake_body.png", "fonts/PressStart2P-Regular.ttf")
+
+    def __init__(self, address=None, players=None):
+        super().__init__()
+        self.address = address
+        self.players = players
+        # the server runs the game, so the loop only draws
+        self.loop = GameLoop(self.handle_events, self.draw)
+        self.client = None
+        self.server_thread = None
+        self.screen = None
+
+    def open_window(self):
+        side = CELL_NUMBER * CELL_SIZE
+        self.screen = pygame.display.set_mode((side, side))
+        pygame.display.set_caption("Strawberry Snake LAN")
+
+    def load(self):
+        atlas = get_atlas()
+        self.fruit_image = atlas.sprite("strawberry")
+        body = atlas.sprite("snake_body")
+        self.bodies = []
+        for color in PLAYER_COLORS:
+            tinted = body.copy()
+            tinted.fill(color, special_flags=pygame.BLEND_RGB_MULT)
+            self.bodies.append(tinted)
+        self.font = pygame.font.Font(str(self.resources["fonts/PressStart2P-Regular.ttf"]), 14)
+        super().load()
+
+    def enter(self):
+        super().enter()
+        address = self.address or os.environ.get("GAME_SERVER")
+        if address:
+            address = parse_address(address)
+        else:
+            if self.server_thread is None:
+                self.server_thread = start_server_thread()
+            address = ("127.0.0.1", NET_PORT)
+        players = self.players or int(os.environ.get("GAME_NET_PLAYERS", 2))
+        self.client = NetClient(address, players)
+        self.open_window()
+        self.loop.resume()
+
+    def suspend(self):
+        # a match can't be paused: leaving the screen leaves the match
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        self.active = False
+
+    def run(self):
+        self.result = None
+        self.loop.run()
+        return self.result
+
+    def handle_events(self, events):
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.result = QUIT_APP
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.result = BACK_TO_MENU
+                elif event.key in KEY_INDEX:
+                    self.client.press(KEY_INDEX[event.key])
+        if self.result is not None:
+            self.loop.stop()
+
+    def draw(self, alpha=0.0):
+        self.screen.fill(BACKGROUND_COLOR)
+        session = self.client.session
+        with self.client.lock:
+            n = session.cell_number
+            own = session.predicted()
+            snakes = [own if i == session.player else list(body)
+                      for i, body in enumerate(session.snakes)]
+            fruit = session.fruit
+            status = self.status(session)
+        for i, cells in enumerate(snakes):
+            image = self.bodies[i % len(self.bodies)]
+            self.screen.blits([(image, (cell % n * CELL_SIZE, cell // n * CELL_SIZE)) for cell in cells],
+                              doreturn=False)
+        if fruit != NO_CELL:
+            self.screen.blit(self.fruit_image, (fruit % n * CELL_SIZE, fruit // n * CELL_SIZE))
+        text = render_text(self.font, status, True, (255, 85, 163))
+        self.screen.blit(text, (10, 10))
+        return [self.screen.get_rect()]
+
+    @staticmethod
+    def status(session):
+        if session.player is None:
+            return "connecting..."
+        if not session.started:
+            return f"waiting for {session.players} players"
+        you = f"player {session.player + 1}"
+        if session.ended:
+            won = session.alive[session.player] and session.players > 1
+            return f"{you}: {'you win!' if won else 'game over'} (esc)"
+        if not session.alive[session.player]:
+            return f"{you}: out"
+        return f"{you}  ping {session.rtt * 1000:.0f} ms"
+
+
+KEY_INDEX = {pygame.K_UP: 0, pygame.K_RIGHT: 1, pygame.K_DOWN: 2, pygame.K_LEFT: 3}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="run a server")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=NET_PORT)
+    join_parser = commands.add_parser("join", help="play on a server")
+    join_parser.add_argument("address", help="host[:port]")
+    join_parser.add_argument("--players", type=int, default=2)
+    test_parser = commands.add_parser("selftest", help="server and bots on loopback")
+    test_parser.add_argument("--matches", type=int, default=100)
+    test_parser.add_argument("--players", type=int, default=2)
+    test_parser.add_argument("--seconds", type=float, default=10.0)
+    test_parser.add_argument("--seed", type=int, default=0)
+    for sub in (serve_parser, test_parser):
+        sub.add_argument("--latency", type=float, default=0.0, help="seconds added to each packet")
+        sub.add_argument("--jitter", type=float, default=0.0, help="extra random delay, seconds")
+        sub.add_argument("--loss", type=float, default=0.0, help="share of packets dropped")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        print(f"serving on {args.host}:{args.port}")
+        try:
+            asyncio.run(serve(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                              loss=args.loss))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if args.command == "join":
+        run_standalone(NetSnakeGame(args.address, args.players))
+        return 0
+
+    stats = asyncio.run(selftest(args.matches, args.players, args.seconds, args.latency,
+                                 args.jitter, args.loss, args.seed))
+    print(f"{stats['clients']} clients in {stats['matches']} matches "
+          f"({stats['running_at_end']} still running), {stats['server_ticks']} server ticks")
+    print(f"server tick {stats['mean_tick_ms']:.2f} ms mean, {stats['worst_tick_ms']:.2f} ms worst; "
+          f"{stats['server_bytes_per_player_tick']:.1f} bytes per player per tick")
+    print(f"prediction hit rate {stats['prediction_hit_rate']:.1%}, "
+          f"{stats['mismatches']} clients out of sync with the server")
+    return 1 if stats["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+import heapq
+from array import array
+
+from pygame.math import Vector2
+
+# unreachable; larger than any path on a board we'd ever play
+INF = 1 << 30
+# (dx, dy) in the order moves are tried
+STEPS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+# keep a tick in hand for every SPARE_EVERY segments of snake
+SPARE_EVERY = 6
+
+
+class DistanceField:
+    """
+    BFS distance from one target cell to every cell of an n x n board,
+    with the cells marked in `blocked` as walls.
+
+    `blocked` is shared with the owner (the snake's occupied bytearray), so
+    after a cell changes the owner calls block(cell) or unblock(cell) and
+    only the distances that depend on it are repaired.
+    """
+
+    def __init__(self, cell_number, blocked):
+        self.n = cell_number
+        self.blocked = blocked
+        self.dist = array("i", [INF]) * (cell_number * cell_number)
+        self.target = -1
+        # neighbour lists, built once
+        n = cell_number
+        self.neighbours = []
+        for cell in range(n * n):
+            x, y = cell % n, cell // n
+            self.neighbours.append(tuple(
+                (y + dy) * n + x + dx for dx, dy in STEPS if 0 <= x + dx < n and 0 <= y + dy < n))
+
+    def rebuild(self, target):
+        dist, blocked, neighbours = self.dist, self.blocked, self.neighbours
+        for i in range(len(dist)):
+            dist[i] = INF
+        self.target = target
+        if target < 0:
+            return
+        dist[target] = 0
+        frontier = [target]
+        d = 0
+        while frontier:
+            d += 1
+            next_frontier = []
+            for cell in frontier:
+                for nb in neighbours[cell]:
+                    if dist[nb] == INF and not blocked[nb]:
+                        dist[nb] = d
+                        next_frontier.append(nb)
+            frontier = next_frontier
+
+    def unblock(self, cell):
+        """
+        cell stopped being a wall: distances can only shrink, so spread the
+        improvement outwards from it.
+        """
+        dist, blocked, neighbours = self.dist, self.blocked, self.neighbours
+        if cell == self.target:
+            return
+        best = min((dist[nb] for nb in neighbours[cell] if not blocked[nb]), default=INF)
+        if best == INF or best + 1 >= dist[cell]:
+            return
+        dist[cell] = best + 1
+        queue = [cell]
+        for u in queue:
+            d = dist[u] + 1
+            for nb in neighbours[u]:
+                if d < dist[nb] and not blocked[nb]:
+                    dist[nb] = d
+                    queue.append(nb)
+
+    def block(self, cell):
+        """
+        cell became a wall: find the cells whose every shortest path ran
+        through it and recompute just those.
+        """
+        dist, blocked, neighbours = self.dist, self.blocked, self.neighbours
+        if dist[cell] == INF:
+            return
+        if cell == self.target:
+            self.rebuild(self.target)
+            return
+
+        # affected cells in order of their old distance (BFS layers)
+        affected = {cell}
+        order = [cell]
+        for u in order:
+            d = dist[u] + 1
+            for v in neighbours[u]:
+                if v in affected or blocked[v] or dist[v] != d:
+                    continue
+                # v keeps its distance if another neighbour still supports it
+                if not any(dist[w] == d - 1 and w not in affected and not blocked[w]
+                           for w in neighbours[v]):
+                    affected.add(v)
+                    order.append(v)
+
+        heap = []
+        for v in order:
+            dist[v] = INF
+        for v in order[1:]:
+            best = min((dist[w] for w in neighbours[v] if w not in affected and not blocked[w]),
+                       default=INF)
+            if best != INF:
+                dist[v] = best + 1
+                heap.append((best + 1, v))
+        heapq.heapify(heap)
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d != dist[u]:
+                continue
+            for v in neighbours[u]:
+                if v in affected and d + 1 < dist[v] and not blocked[v]:
+                    dist[v] = d + 1
+                    heapq.heappush(heap, (d + 1, v))
+
+
+class PathAssist:
+    """
+    Suggests the snake's next safe move towards the fruit.
+
+    Keeps a DistanceField from the fruit in step with the snake: each
+    tick only the new head (now a wall) and the freed tail cell are
+    repaired, and the whole field is rebuilt only when the fruit moves.
+    The fruit is only chased if, after following the path and eating,
+    the head can still get back onto its body by the time that part of
+    it has moved on (see escape()); otherwise the snake plays for time
+    along its body, so it won't box itself in.
+    """
+
+    def __init__(self, main):
+        self.main = main
+        self.snake = main.snake
+        self.n = main.cell_number
+        self.field = DistanceField(self.n, self.snake.occupied)
+        self.head = -1
+        self.fruit = -1
+
+    def fruit_cell(self):
+        fruit = self.main.fruit
+        return fruit.y * self.n + fruit.x if fruit.x >= 0 else -1
+
+    def sync(self):
+        """
+        Bring the field up to date with the snake after its last move.
+        """
+        snake = self.snake
+        head = snake.head_cell
+        fruit = self.fruit_cell()
+        if head == self.head and fruit == self.fruit:
+            return
+        # incremental repair only works if we saw the previous position
+        neck = snake.cells[(snake.head_index + 1) % snake.capacity]
+        if fruit != self.fruit or head < 0 or neck != self.head or len(snake) < 2:
+            self.field.rebuild(fruit)
+        elif snake.vacated != head:
+            if snake.vacated >= 0:
+                self.field.unblock(snake.vacated)
+            self.field.block(head)
+        self.head = head
+        self.fruit = fruit
+
+    def candidates(self):
+        """
+        (direction, cell) for each move that survives the next tick.
+        """
+        snake = self.snake
+        n = self.n
+        tail = -1 if snake.new_block else snake.tail_cell
+        moves = []
+        for dx, dy in STEPS:
+            if dx == -snake.direc.x and dy == -snake.direc.y:
+                continue
+            x, y = snake.head_x + dx, snake.head_y + dy
+            if not (0 <= x < n and 0 <= y < n):
+                continue
+            cell = y * n + x
+            if snake.occupied[cell] and cell != tail:
+                continue
+            moves.append((Vector2(dx, dy), cell))
+        return moves
+
+    def escape(self, start, body, grows, fruit=-1, enough=0):
+        """
+        Flood fill from start with the head just moved there and body (head
+        end first) behind it. Returns (free cells reached, whether the head
+        can get back onto its body); once it can, the fill stops after
+        enough cells.
+
+        A body cell is only any use to the head once it has been freed: the
+        last one on the next tick, one k segments ahead of it k ticks later,
+        plus grows ticks if the snake has just eaten, and one more if it
+        has to eat the fruit cell on the way. From there the head can
+        follow its own body round, so the snake can't box itself in.
+        """
+        neighbours = self.field.neighbours
+        # body cell -> ticks until it is free
+        free_at = {c: len(body) - i + grows for i, c in enumerate(body)}
+        # cells reached before and after eating the fruit
+        seen = ({start}, {start})
+        frontier = [(start, 0)]
+        ticks = 0
+        escapes = False
+        while frontier:
+            if escapes and len(seen[0]) + len(seen[1]) > enough:
+                break
+            ticks += 1
+            next_frontier = []
+            for u, ate in frontier:
+                for v in neighbours[u]:
+                    wait = free_at.get(v)
+                    if wait is not None:
+                        if ticks >= wait + ate:
+                            escapes = True
+                        continue
+                    layer = 1 if v == fruit else ate
+                    if v not in seen[layer]:
+                        seen[layer].add(v)
+                        next_frontier.append((v, layer))
+            frontier = next_frontier
+        return len(seen[0] | seen[1]), escapes
+
+    def spare(self):
+        """
+        Ticks to keep in hand for fruit respawning in the snake's way.
+        """
+        return len(self.snake) // SPARE_EVERY
+
+    def body_after(self):
+        """
+        The body behind the head once it moves, head end first.
+        """
+        body = list(self.snake.iter_cells())
+        if not self.snake.new_block:
+            # the tail moves off this tick
+            body.pop()
+        return body
+
+    def safe_to_eat(self, cell):
+        """
+        Whether the snake can still escape after following the shortest
+        path from cell to the fruit and eating it.
+        """
+        dist, neighbours = self.field.dist, self.field.neighbours
+        path = [cell]
+        while dist[path[-1]] > 0:
+            u = path[-1]
+            path.append(next(v for v in neighbours[u] if dist[v] == dist[u] - 1))
+        path.reverse()
+        body = path + self.body_after()
+        body = body[:len(body) - len(path) + 1]
+        return self.escape(body[0], body[1:], 1 + self.spare())[1]
+
+    def suggest(self):
+        """
+        Best direction this tick, or None if every move is fatal.
+
+        Heads for the fruit along the shortest path if the snake can still
+        escape once it has eaten. Otherwise it takes the move that escapes
+        with ticks to spare (then without), preferring one that doesn't
+        need to cross the fruit and then the most room.
+        """
+        self.sync()
+        moves = self.candidates()
+        if not moves:
+            return None
+        dist = self.field.dist
+        moves.sort(key=lambda move: dist[move[1]])
+        for direction, cell in moves:
+            if dist[cell] < INF and self.safe_to_eat(cell):
+                return direction
+        fruit = self.fruit_cell()
+        body = self.body_after()
+        best = None
+        for spare in (self.spare(), 0):
+            for direction, cell in reversed(moves):
+                if cell == fruit:
+                    room, escapes = self.escape(cell, body, 1 + spare, enough=len(body))
+                    past_fruit = escapes
+                else:
+                    room, escapes = self.escape(cell, body, spare, enough=len(body))
+                    past_fruit = escapes and self.escape(cell, body, spare, fruit)[1]
+                if best is None or (escapes, past_fruit, room) > best[0]:
+                    best = ((escapes, past_fruit, room), direction)
+            if best[0][0]:
+                break
+        return best[1]
+
+    def suggest_cell(self):
+        """
+        The cell the suggested move leads to, or -1.
+        """
+        direction = self.suggest()
+        if direction is None:
+            return -1
+        return (self.snake.head_y + int(direction.y)) * self.n + self.snake.head_x + int(direction.x)
@@ -0,0 +1,165 @@
+import csv
+import json
+import time
+from collections import deque
+from pathlib import Path
+
+import pygame
+
+PHASES = ("events", "update", "draw", "flip")
+TOGGLE_KEY = pygame.K_F3
+EXPORT_KEY = pygame.K_F4
+# a frame counts as dropped when it takes this many frame budgets or more
+DROP_FACTOR = 1.5
+OVERLAY_REFRESH = 0.5
+
+
+class FrameProfiler:
+    """
+    Records how long each phase of a game loop takes.
+
+    A loop calls begin_frame(), mark(phase) after each phase and end_frame()
+    after clock.tick(). The last `window` frames are kept for percentiles,
+    the dropped-frame count, the F3 overlay and F4 trace export.
+    """
+
+    def __init__(self, name, target_fps=60, window=600):
+        self.name = name
+        self.budget = 1.0 / target_fps
+        self.frames = deque(maxlen=window)
+        self.visible = False
+        self.overlay = None
+        self.overlay_time = 0.0
+        self.font = None
+        self.frame_start = None
+        self.last_mark = None
+        self.current = None
+
+    def begin_frame(self):
+        now = time.perf_counter()
+        self.frame_start = self.last_mark = now
+        self.current = dict.fromkeys(PHASES, 0.0)
+
+    def mark(self, phase):
+        """
+        Charge the time since the previous mark to phase (accumulating if a
+        phase is marked more than once in a frame).
+        """
+        now = time.perf_counter()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        now = time.perf_counter()
+        work = sum(self.current.values())
+        self.current["interval"] = now - self.frame_start
+        self.current["work"] = work
+        self.current["start"] = self.frame_start
+        self.frames.append(self.current)
+
+    def percentiles(self, key="interval"):
+        values = sorted(frame[key] for frame in self.frames)
+        if not values:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        last = len(values) - 1
+        return {
+            "p50": values[round(last * 0.50)],
+            "p95": values[round(last * 0.95)],
+            "p99": values[round(last * 0.99)],
+        }
+
+    def dropped_frames(self):
+        limit = self.budget * DROP_FACTOR
+        return sum(1 for frame in self.frames if frame["interval"] >= limit)
+
+    def summary(self):
+        phases = {}
+        count = len(self.frames) or 1
+        for phase in PHASES:
+            phases[phase] = sum(frame.get(phase, 0.0) for frame in self.frames) / count
+        return {
+            "name": self.name,
+            "frames": len(self.frames),
+            "interval": self.percentiles("interval"),
+            "work": self.percentiles("work"),
+            "dropped": self.dropped_frames(),
+            "mean_phase": phases,
+        }
+
+    def handle_event(self, event):
+        """
+        F3 toggles the overlay, F4 exports a trace. Returns True if the
+        overlay was toggled (so callers can repaint what it covered).
+        """
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == TOGGLE_KEY:
+            self.visible = not self.visible
+            self.overlay = None
+            return True
+        if event.key == EXPORT_KEY:
+            self.export(f"frametrace-{self.name}-{int(time.time())}.csv")
+        return False
+
+    def refresh_timeout(self):
+        """
+        How soon an idle loop must wake to keep the overlay current.
+        """
+        return OVERLAY_REFRESH if self.visible else None
+
+    def draw_overlay(self, surface, pos=(4, 4)):
+        """
+        Blit the overlay if it is visible; returns the rect drawn or None.
+        The overlay is opaque so it can be redrawn over itself every frame.
+        """
+        if not self.visible:
+            return None
+        now = time.perf_counter()
+        if self.overlay is None or now - self.overlay_time >= OVERLAY_REFRESH:
+            self.overlay = self.render_overlay()
+            self.overlay_time = now
+        return surface.blit(self.overlay, pos)
+
+    def render_overlay(self):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        stats = self.summary()
+
+        def ms(seconds):
+            return f"{seconds * 1000:5.1f}"
+
+        lines = [
+            f"{self.name}: {stats['frames']} frames, {stats['dropped']} dropped",
+            "frame p50/p95/p99 " + "/".join(ms(stats["interval"][p]) for p in ("p50", "p95", "p99")) + " ms",
+            "work  p50/p95/p99 " + "/".join(ms(stats["work"][p]) for p in ("p50", "p95", "p99")) + " ms",
+            "  ".join(f"{phase} {ms(stats['mean_phase'][phase])}" for phase in PHASES),
+        ]
+        # these strings change every refresh, so they bypass the text cache
+        surfaces = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        width = max(s.get_width() for s in surfaces) + 8
+        height = sum(s.get_height() for s in surfaces) + 8
+        overlay = pygame.Surface((width, height))
+        overlay.fill((20, 20, 20))
+        y = 4
+        for s in surfaces:
+            overlay.blit(s, (4, y))
+            y += s.get_height()
+        return overlay
+
+    def export(self, path):
+        """
+        Write the recorded frames to path as CSV or (for .json) a JSON trace.
+        """
+        path = Path(path)
+        columns = ("start", "interval", "work") + PHASES
+        if path.suffix == ".json":
+            with path.open("w", encoding="utf-8") as f:
+                json.dump({"summary": self.summary(),
+                           "frames": [{c: frame.get(c, 0.0) for c in columns} for frame in self.frames]}, f)
+        else:
+            with path.open("w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for frame in self.frames:
+                    writer.writerow([f"{frame.get(c, 0.0):.6f}" for c in columns])
+        return path
@@ -0,0 +1,227 @@
+"""
+Session recording and headless replay.
+
+Every round records its seed, config and timestamped inputs. With
+GAME_RECORD_DIR set, each round is saved there as a small binary log
+together with the game's final state, and can be re-run without a window:
+
+    python -m src.replay session.ggr [more.ggr ...]
+
+Replay exits non-zero if any session ends in a different state.
+"""
+import json
+import os
+import random
+import struct
+import sys
+import time
+from pathlib import Path
+
+import pygame
+
+RECORD_DIR = os.environ.get("GAME_RECORD_DIR")
+
+MAGIC = b"GGRC"
+VERSION = 1
+# magic, version, seed, length of the JSON metadata that follows
+HEADER = struct.Struct("<4sBQI")
+# milliseconds since the round started, kind, two arguments
+EVENT = struct.Struct("<IBii")
+COUNT = struct.Struct("<I")
+
+# event kinds
+TICK = 1
+KEY = 2
+CLICK = 3
+SUSPEND = 4
+RESUME = 5
+
+
+def new_seed():
+    return random.getrandbits(63)
+
+
+class FrameClock:
+    """
+    Whole milliseconds since the round started, moved on only by tick().
+
+    A game calls tick() once per frame, so everything in that frame sees
+    the same time. Replay can feed the same value back exactly.
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.ticks = 0
+
+    def tick(self):
+        self.ticks = int((time.monotonic() - self.start) * 1000)
+
+    def __call__(self):
+        return self.ticks / 1000
+
+
+class Recorder:
+    """
+    Inputs of one round, kept in memory and written out by save().
+    """
+
+    def __init__(self, game, seed, config=None, directory=RECORD_DIR):
+        self.game = game
+        self.seed = seed
+        self.config = config or {}
+        self.clock = FrameClock()
+        self.events = []
+        self.path = None
+        if directory:
+            self.path = Path(directory) / f"{game}-{int(time.time())}-{seed:016x}.ggr"
+
+    def record(self, kind, a=0, b=0):
+        self.events.append((self.clock.ticks, kind, a, b))
+
+    def save(self, state):
+        """
+        Write the log and the final state, if recording to disk is enabled.
+        Saving again later overwrites the file with the longer session.
+        """
+        if self.path is None:
+            return None
+        meta = json.dumps({"game": self.game, "config": self.config}).encode()
+        parts = [HEADER.pack(MAGIC, VERSION, self.seed, len(meta)), meta,
+                 COUNT.pack(len(self.events))]
+        parts.extend(EVENT.pack(*event) for event in self.events)
+        state = json.dumps(state).encode()
+        parts += [COUNT.pack(len(state)), state]
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_bytes(b"".join(parts))
+        os.replace(tmp, self.path)
+        return self.path
+
+
+class Session:
+    """
+    A recorded round read back from disk.
+    """
+
+    def __init__(self, game, seed, config, events, state):
+        self.game = game
+        self.seed = seed
+        self.config = config
+        self.events = events
+        self.state = state
+
+    @classmethod
+    def load(cls, path):
+        data = Path(path).read_bytes()
+        magic, version, seed, meta_len = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} session log")
+        offset = HEADER.size
+        meta = json.loads(data[offset:offset + meta_len])
+        offset += meta_len
+        count, = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        events = list(EVENT.iter_unpack(data[offset:offset + count * EVENT.size]))
+        offset += count * EVENT.size
+        state_len, = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        state = json.loads(data[offset:offset + state_len])
+        return cls(meta["game"], seed, meta["config"], events, state)
+
+
+def replay_snake(session):
+    from src.game1 import KEY_DIRECTIONS, Main
+
+    main = Main(rng=random.Random(session.seed), **session.config)
+    for _, kind, a, _ in session.events:
+        if kind == TICK:
+            main.update()
+        elif kind == KEY and a in KEY_DIRECTIONS:
+            main.snake.turn(KEY_DIRECTIONS[a])
+    return main.snapshot()
+
+
+def replay_doggo(session):
+    from src.game2 import BigMapModel, DoggoModel
+
+    if "world_size" in session.config:
+        model = BigMapModel(session.config["hidden_dogs"], session.config["world_size"])
+    else:
+        model = DoggoModel(session.config["crowd_size"], session.config["hidden_dogs"])
+    model.rng.seed(session.seed)
+    model.reset()
+    for _, kind, a, b in session.events:
+        if kind == CLICK:
+            model.check_click((a, b))
+    return model.snapshot()
+
+
+def replay_memory(session):
+    from src.game3 import AssetLoader, ManualClock, MemoryGameController, MemoryModel, MemoryView
+
+    clock = ManualClock()
+    scene = MemoryGameController(session.config["grid_size"])
+    scene.model = model = MemoryModel(session.config["grid_size"], images=session.config["images"],
+                                      loader=AssetLoader(offline=True), clock=clock)
+    scene.view = MemoryView(model)
+    model.rng.seed(session.seed)
+    model.reset()
+    for ticks, kind, a, b in session.events:
+        clock.now = ticks / 1000
+        if kind == CLICK:
+            scene.handle_click(a, b)
+        elif kind == TICK:
+            model.advance()
+        elif kind == SUSPEND:
+            scene.suspended_at = clock()
+        elif kind == RESUME:
+            model.shift_clock(clock() - scene.suspended_at)
+    return model.snapshot()
+
+
+REPLAYERS = {
+    "snake": replay_snake,
+    "doggo": replay_doggo,
+    "memory": replay_memory,
+}
+
+
+def replay(session):
+    """
+    Re-run a session; returns (matches, replayed final state).
+    """
+    state = REPLAYERS[session.game](session)
+    # compare in JSON form, as the recorded state was stored
+    state = json.loads(json.dumps(state))
+    return state == session.state, state
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    if not paths:
+        print(__doc__.strip())
+        return 2
+    # the games import this module too, so only replays go headless
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    pygame.init()
+    # sprites are converted to the display format, so a window must exist
+    pygame.display.set_mode((1, 1))
+    status = 0
+    for path in paths:
+        session = Session.load(path)
+        start = time.perf_counter()
+        matches, state = replay(session)
+        elapsed = time.perf_counter() - start
+        print(f"{path}: {session.game}, {len(session.events)} events in {elapsed * 1000:.1f} ms, "
+              + ("state matches" if matches else "STATE DIFFERS"))
+        if not matches:
+            print(f"  recorded: {session.state}\n  replayed: {state}", file=sys.stderr)
+            status = 1
+    pygame.quit()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import math
+import pygame
+
+# window-system events after which the window contents must be repainted
+REDRAW_EVENTS = {
+    pygame.VIDEOEXPOSE,
+    pygame.VIDEORESIZE,
+    pygame.WINDOWEXPOSED,
+    pygame.WINDOWSHOWN,
+    pygame.WINDOWRESTORED,
+}
+
+
+def earliest(*timeouts):
+    """
+    The smallest of the given timeouts, ignoring None (no deadline).
+    """
+    timeouts = [t for t in timeouts if t is not None]
+    return min(timeouts) if timeouts else None
+
+
+class IdleScheduler:
+    """
+    Lets a loop sleep in pygame.event.wait while nothing needs drawing.
+
+    Loops call invalidate() whenever their state changes and pass wait()
+    the time until their next deadline (a flip delay, the next timer
+    second); reaching the deadline invalidates too. should_draw() says
+    whether a redraw is due and clears the flag.
+    """
+
+    def __init__(self):
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def wait(self, timeout=None):
+        """
+        Pending events. Blocks first if no redraw is due, until an event
+        arrives or timeout seconds (None: forever) have passed.
+        """
+        if self.dirty:
+            events = pygame.event.get()
+        else:
+            if timeout is None:
+                event = pygame.event.wait()
+            else:
+                # 0 would mean "wait forever" to pygame
+                event = pygame.event.wait(max(1, math.ceil(timeout * 1000)))
+            if event.type == pygame.NOEVENT:
+                self.dirty = True
+                return []
+            events = [event] + pygame.event.get()
+
+        for event in events:
+            if event.type in REDRAW_EVENTS:
+                self.dirty = True
+        return events
+
+    def should_draw(self):
+        dirty = self.dirty
+        self.dirty = False
+        return dirty
@@ -0,0 +1,251 @@
+"""
+Results of every round, and the leaderboards built from them.
+
+Scores live in one SQLite database in WAL mode. record() only queues the
+row and updates the in-memory leaderboards; a writer thread commits the
+queue in batches, so a game's frame loop never waits on the disk. The
+leaderboards are read through an index that matches their sort order, so
+the top few rows come straight off the index however many sessions are
+stored.
+
+    python -m src.scores [--game snake] [--top 10]
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+DATA_DIR = Path(os.environ.get(
+    "GAME_DATA_DIR", Path.home() / ".local" / "share" / "game_of_games"))
+SCORES_PATH = Path(os.environ.get("GAME_SCORES_DB", DATA_DIR / "scores.sqlite3"))
+TOP_N = 5
+# most rows per transaction, and how long the writer gathers a batch
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5
+
+# leaderboard name -> whether a lower score ranks higher
+GAMES = {
+    "snake": False,
+    "doggo": False,
+    "doggo-crowd": False,
+    "doggo-bigmap": False,
+    "memory": True,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    game TEXT NOT NULL,
+    -- set when a session is recorded more than once, e.g. on every suspend
+    session TEXT,
+    score INTEGER NOT NULL,
+    -- score turned so that higher is better; NULL keeps it off the leaderboard
+    rank_key INTEGER,
+    ended REAL NOT NULL,
+    duration REAL,
+    details TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS sessions_by_key ON sessions (game, session);
+CREATE INDEX IF NOT EXISTS leaderboard ON sessions (game, rank_key DESC, id);
+"""
+
+UPSERT = """
+INSERT INTO sessions (game, session, score, rank_key, ended, duration, details)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (game, session) DO UPDATE SET
+    score = excluded.score, rank_key = excluded.rank_key, ended = excluded.ended,
+    duration = excluded.duration, details = excluded.details
+"""
+
+TOP_QUERY = """
+SELECT id, session, score, rank_key, ended FROM sessions
+WHERE game = ? AND rank_key IS NOT NULL
+ORDER BY rank_key DESC, id
+LIMIT ?
+"""
+
+STOP = object()
+# cached entries recorded this run sort after every stored row id
+NEW_ROWS = 2 ** 62
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL stays consistent without an fsync per commit
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class Entry:
+    """
+    One leaderboard row.
+    """
+
+    __slots__ = ("order", "session", "score", "rank_key", "ended")
+
+    def __init__(self, order, session, score, rank_key, ended):
+        self.order = order
+        self.session = session
+        self.score = score
+        self.rank_key = rank_key
+        self.ended = ended
+
+    def sort_key(self):
+        # best first; ties go to whoever got there first
+        return (-self.rank_key, self.order)
+
+
+class ScoreStore:
+    """
+    The score database plus cached top-N leaderboards.
+
+    Reads happen on the caller's thread (and only when a leaderboard isn't
+    cached yet); writes go through a queue to the writer thread, which
+    has its own connection.
+    """
+
+    def __init__(self, path=SCORES_PATH, top_n=TOP_N, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conn = connect(self.path)
+        self.conn.executescript(SCHEMA)
+        self.tops = {}
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.queue = queue.Queue()
+        self.closed = False
+        self.writer = threading.Thread(target=self.write, name="scores", daemon=True)
+        self.writer.start()
+
+    def record(self, game, score, ranked=True, session=None, duration=None, details=None):
+        """
+        Queue one result. `session` makes later records with the same value
+        replace this one, for rounds that are saved more than once.
+        """
+        if self.closed:
+            return
+        rank_key = None
+        if ranked:
+            rank_key = -score if GAMES.get(game, False) else score
+        ended = time.time()
+        self.queue.put((game, session, score, rank_key, ended, duration,
+                        json.dumps(details) if details is not None else None))
+
+        top = self.tops.get(game)
+        if top is None:
+            return
+        if session is not None:
+            top[:] = [entry for entry in top if entry.session != session]
+        if rank_key is not None:
+            self.recorded += 1
+            top.append(Entry(NEW_ROWS + self.recorded, session, score, rank_key, ended))
+            top.sort(key=Entry.sort_key)
+            del top[self.top_n:]
+
+    def top(self, game):
+        """
+        The game's best Entries, best first.
+        """
+        top = self.tops.get(game)
+        if top is None:
+            rows = self.conn.execute(TOP_QUERY, (game, self.top_n)).fetchall()
+            top = self.tops[game] = [Entry(*row) for row in rows]
+        return top
+
+    def top_scores(self, game):
+        return [entry.score for entry in self.top(game)]
+
+    def write(self):
+        conn = connect(self.path)
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # gather more rows for the same transaction, but never hold up a
+            # flush() or close()
+            while len(batch) < self.batch_size and isinstance(batch[-1], tuple):
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            rows = [item for item in batch if isinstance(item, tuple)]
+            if rows:
+                with conn:
+                    conn.executemany(UPSERT, rows)
+                self.written += len(rows)
+                self.batches += 1
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if STOP in batch:
+                conn.close()
+                return
+
+    def flush(self):
+        """
+        Wait until everything recorded so far is committed.
+        """
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(STOP)
+        self.writer.join()
+        self.conn.close()
+
+
+shared_scores = None
+
+
+def get_scores():
+    """
+    The shared ScoreStore, created on first use.
+    """
+    global shared_scores
+    if shared_scores is None:
+        shared_scores = ScoreStore()
+    return shared_scores
+
+
+def close_scores():
+    """
+    Commit whatever is still queued; called on the way out.
+    """
+    global shared_scores
+    if shared_scores is not None:
+        shared_scores.close()
+        shared_scores = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--game", choices=sorted(GAMES), help="one leaderboard (default: all)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    store = ScoreStore(top_n=args.top)
+    for game in [args.game] if args.game else GAMES:
+        print(game)
+        for place, entry in enumerate(store.top(game), 1):
+            ended = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.ended))
+            print(f"  {place:3d}. {entry.score:8d}  {ended}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Headless Strawberry Snake games for trying out policies.
+
+Games are stepped in lockstep without a display. --check fails the run if
+any snake crashed into a wall or itself while the board still had room
+for it (at least as many free cells as segments).
+
+    python -m src.snake_sim --policy assist --board 12 --games 100 --check
+"""
+import argparse
+import random
+import sys
+import time
+from pygame.math import Vector2
+from src.game1 import Main, CELL_NUMBER
+from src.pathfinding import PathAssist
+
+UP = Vector2(0,-1)
+DOWN = Vector2(0,1)
+LEFT = Vector2(-1,0)
+RIGHT = Vector2(1,0)
+DIRECTIONS = (UP, RIGHT, DOWN, LEFT)
+
+
+class SnakeGame(Main):
+    """
+    One Strawberry Snake game without a display.
+
+    The caller advances it one tick at a time instead of the game loop's
+    fixed timestep, and crashing ends the game rather than the process.
+    """
+
+    def __init__(self, seed=None, cell_number=CELL_NUMBER, spawn_region=None):
+        self.seed = seed
+        super().__init__(rng=random.Random(seed), cell_number=cell_number,
+                         spawn_region=spawn_region)
+        self.alive = True
+        self.cause = None
+        self.steps = 0
+
+    def game_over(self):
+        self.alive = False
+        self.cause = self.crash_cause()
+
+    def step(self, direction=None):
+        """
+        Turn (if a direction is given) and advance one tick.
+        Returns whether the snake is still alive.
+        """
+        if not self.alive:
+            return False
+        if direction is not None:
+            self.snake.turn(direction)
+        self.update()
+        self.steps += 1
+        return self.alive
+
+    @property
+    def score(self):
+        return len(self.snake) - 3
+
+    def result(self):
+        return {
+            "seed": self.seed,
+            "score": self.score,
+            "length": len(self.snake),
+            "steps": self.steps,
+            "cause": self.cause,
+            # free cells left on the board
+            "room": self.cell_number * self.cell_number - len(self.snake),
+        }
+
+
+class SnakeBatch:
+    """
+    N independent games stepped in lockstep.
+    """
+
+    def __init__(self, seeds, cell_number=CELL_NUMBER):
+        self.games = [SnakeGame(seed, cell_number) for seed in seeds]
+
+    def step(self, policy):
+        """
+        Advance every live game by one tick; returns how many were stepped.
+        """
+        stepped = 0
+        for game in self.games:
+            if game.alive:
+                game.step(policy(game))
+                stepped += 1
+        return stepped
+
+
+def run_batch(seeds, policy, max_steps=10000, cell_number=CELL_NUMBER):
+    """
+    Play one game per seed to the end (or max_steps ticks) with policy,
+    a callable taking a SnakeGame and returning a direction or None.
+    """
+    batch = SnakeBatch(seeds, cell_number)
+    steps = 0
+    start = time.perf_counter()
+    for _ in range(max_steps):
+        stepped = batch.step(policy)
+        if stepped == 0:
+            break
+        steps += stepped
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for game in batch.games:
+        result = game.result()
+        if game.alive:
+            result["cause"] = "timeout"
+        results.append(result)
+
+    return {
+        "results": results,
+        "steps": steps,
+        "elapsed": elapsed,
+        "steps_per_second": steps / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def chase_fruit(game):
+    """
+    Naive policy: head along whichever axis is further from the fruit.
+    """
+    dx = game.fruit.x - game.snake.head_x
+    dy = game.fruit.y - game.snake.head_y
+    if abs(dx) >= abs(dy) and dx != 0:
+        return RIGHT if dx > 0 else LEFT
+    if dy != 0:
+        return DOWN if dy > 0 else UP
+    return None
+
+
+def cycle_direction(x, y, n):
+    """
+    Next step along a Hamiltonian cycle of an n x n board (n even): rows
+    are swept in a serpentine over columns 1..n-1 and column 0 leads back
+    up, so a snake following it never collides.
+    """
+    if x == 0:
+        return RIGHT if y == 0 else UP
+    if y % 2 == 0:
+        return DOWN if x == n - 1 else RIGHT
+    if x == 1 and y != n - 1:
+        return DOWN
+    return LEFT
+
+
+def safe_moves(game):
+    """
+    (direction, cell) for every move that doesn't end the game next tick.
+    The tail cell counts as free unless the snake is about to grow.
+    """
+    snake = game.snake
+    n = game.cell_number
+    tail = -1 if snake.new_block else snake.tail_cell
+    moves = []
+    for direction in DIRECTIONS:
+        if direction == -snake.direc:
+            continue
+        x, y = snake.head_x + int(direction.x), snake.head_y + int(direction.y)
+        if not (0 <= x < n and 0 <= y < n):
+            continue
+        cell = y * n + x
+        if snake.occupied[cell] and cell != tail:
+            continue
+        moves.append((direction, cell))
+    return moves
+
+
+def greedy(game):
+    """
+    chase_fruit, but never steps into a wall or the body if it can help it.
+    """
+    moves = safe_moves(game)
+    if not moves:
+        return None
+    n = game.cell_number
+    fx, fy = game.fruit.x, game.fruit.y
+    return min(moves, key=lambda move: abs(move[1] % n - fx) + abs(move[1] // n - fy))[0]
+
+
+def bfs_to_fruit(game):
+    """
+    First step of a shortest path to the fruit around the body, or the
+    greedy move when the fruit can't be reached.
+    """
+    moves = safe_moves(game)
+    if game.fruit.x < 0 or not moves:
+        return greedy(game)
+    n = game.cell_number
+    target = game.fruit.y * n + game.fruit.x
+    occupied = game.snake.occupied
+    # cell -> first move of the path that reached it
+    first = {}
+    frontier = []
+    for direction, cell in moves:
+        if cell == target:
+            return direction
+        first[cell] = direction
+        frontier.append(cell)
+    while frontier:
+        next_frontier = []
+        for cell in frontier:
+            x, y = cell % n, cell // n
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if 0 <= nx < n and 0 <= ny < n:
+                    neighbour = ny * n + nx
+                    if neighbour in first or occupied[neighbour]:
+                        continue
+                    if neighbour == target:
+                        return first[cell]
+                    first[neighbour] = first[cell]
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+    return greedy(game)
+
+
+def hamiltonian(game):
+    """
+    Follow the board's Hamiltonian cycle: slow, but it never dies.
+    """
+    return cycle_direction(game.snake.head_x, game.snake.head_y, game.cell_number)
+
+
+def assisted(game):
+    """
+    The game1 hint engine's suggestion (incremental distance field plus a
+    check that the snake can still get back onto its body in time).
+    """
+    if getattr(game, "assist", None) is None:
+        game.assist = PathAssist(game)
+    return game.assist.suggest()
+
+
+POLICIES = {
+    "chase": chase_fruit,
+    "greedy": greedy,
+    "bfs": bfs_to_fruit,
+    "hamiltonian": hamiltonian,
+    "assist": assisted,
+}
+
+
+def boxed_in(results):
+    """
+    Games that crashed into a wall or the snake itself while there was
+    still room for it on the board.
+    """
+    return [r for r in results if r["cause"] in ("wall", "self") and r["room"] >= r["length"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="chase")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--board", type=int, default=CELL_NUMBER)
+    parser.add_argument("--max-steps", type=int, default=10000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true",
+                        help="fail if a snake crashed while it still had room")
+    args = parser.parse_args(argv)
+
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    stats = run_batch(seeds, POLICIES[args.policy], args.max_steps, args.board)
+    scores = [r["score"] for r in stats["results"]]
+    print(f"{len(scores)} games, {stats['steps']} steps in {stats['elapsed']:.2f}s "
+          f"({stats['steps_per_second']:.0f} steps/s), mean score {sum(scores) / len(scores):.2f}")
+
+    if args.check:
+        boxed = boxed_in(stats["results"])
+        for r in boxed:
+            print(f"seed {r['seed']}: hit {r['cause']} at length {r['length']} "
+                  f"with {r['room']} cells free")
+        if boxed:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
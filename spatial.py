@@ -0,0 +1,116 @@
+import math
+import random
+
+
+def poisson_disc(width, height, radius, rng=None, k=30, keep_out=(), limit=None):
+    """
+    Points at least `radius` apart filling a width x height field (Bridson's
+    algorithm). Candidates inside any keep_out rect are rejected. Stops
+    early once `limit` points have been placed.
+    """
+    rng = rng if rng is not None else random.Random()
+    cell = radius / math.sqrt(2)
+    cols = int(math.ceil(width / cell))
+    rows = int(math.ceil(height / cell))
+    # each background cell holds at most one point (index into points)
+    grid = [-1] * (cols * rows)
+    points = []
+    active = []
+
+    def allowed(x, y):
+        if not (0 <= x < width and 0 <= y < height):
+            return False
+        for rect in keep_out:
+            if rect.collidepoint(x, y):
+                return False
+        gx, gy = int(x / cell), int(y / cell)
+        for ny in range(max(0, gy - 2), min(rows, gy + 3)):
+            for nx in range(max(0, gx - 2), min(cols, gx + 3)):
+                i = grid[ny * cols + nx]
+                if i >= 0:
+                    px, py = points[i]
+                    if (px - x) ** 2 + (py - y) ** 2 < radius * radius:
+                        return False
+        return True
+
+    def add(x, y):
+        grid[int(y / cell) * cols + int(x / cell)] = len(points)
+        active.append(len(points))
+        points.append((x, y))
+
+    for _ in range(100):
+        x, y = rng.uniform(0, width), rng.uniform(0, height)
+        if allowed(x, y):
+            add(x, y)
+            break
+
+    while active and (limit is None or len(points) < limit):
+        slot = rng.randrange(len(active))
+        px, py = points[active[slot]]
+        for _ in range(k):
+            angle = rng.uniform(0, 2 * math.pi)
+            dist = rng.uniform(radius, 2 * radius)
+            x, y = px + dist * math.cos(angle), py + dist * math.sin(angle)
+            if allowed(x, y):
+                add(x, y)
+                break
+        else:
+            active[slot] = active[-1]
+            active.pop()
+    return points
+
+
+class SpatialHash:
+    """
+    Uniform grid of buckets for point queries against many rects.
+
+    Each rect is filed under every cell it overlaps, so a query only tests
+    the handful of rects in one bucket however many are inserted.
+    """
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.buckets = {}
+        self.rects = {}
+
+    def __len__(self):
+        return len(self.rects)
+
+    def cells(self, rect):
+        size = self.cell_size
+        for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+                yield cx, cy
+
+    def insert(self, item, rect):
+        self.rects[item] = rect
+        for key in self.cells(rect):
+            self.buckets.setdefault(key, []).append(item)
+
+    def remove(self, item):
+        rect = self.rects.pop(item)
+        for key in self.cells(rect):
+            bucket = self.buckets[key]
+            bucket.remove(item)
+            if not bucket:
+                del self.buckets[key]
+
+    def query_point(self, pos):
+        """
+        Items whose rect contains pos.
+        """
+        x, y = pos
+        bucket = self.buckets.get((int(x) // self.cell_size, int(y) // self.cell_size), ())
+        return [item for item in bucket if self.rects[item].collidepoint(pos)]
+
+    def query_rect(self, rect):
+        """
+        Items whose rect overlaps rect, each once.
+        """
+        size = self.cell_size
+        found = set()
+        for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+                found.update(self.buckets.get((cx, cy), ()))
+        rects = self.rects
+        return [item for item in found if rects[item].colliderect(rect)]
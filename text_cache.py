@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+# upper bound on the pixel memory held by the shared cache
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces keyed by (font, text, color, antialias).
+
+    Entries are evicted oldest-first once the pixel memory of the cached
+    surfaces goes over max_bytes. Callers must treat the returned surfaces
+    as read-only since they are shared.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, antialias, color):
+        """
+        Same arguments as font.render(); returns a cached surface when possible.
+        """
+        key = (font, text, tuple(color), antialias)
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        cost = surface.get_pitch() * surface.get_height()
+        if cost > self.max_bytes:
+            return surface
+
+        self.entries[key] = surface
+        self.size += cost
+        while self.size > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.size -= old.get_pitch() * old.get_height()
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+shared_cache = TextCache()
+
+
+def render_text(font, text, antialias, color):
+    """
+    Render text through the cache shared by the menu and every game.
+    """
+    return shared_cache.render(font, text, antialias, color)
@@ -0,0 +1,326 @@
+"""
+Streaming tiles for maps much larger than the window.
+
+The map is cut into TILE_SIZE squares at a few zoom levels. TileStore
+keeps their raw pixels in one memory-mapped cache file and fills tiles in
+on a worker thread the first time they are asked for. The file grows as
+tiles are added, so only the parts of the map that have been looked at
+ever take disk space.
+TileCache keeps an LRU of decoded, display-format tiles sized from the
+viewport, so memory stays bounded by the window and not by the map.
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict, deque
+from pathlib import Path
+
+import pygame
+
+from src.asset_cache import DEFAULT_CACHE_DIR
+
+TILE_CACHE_DIR = DEFAULT_CACHE_DIR / "tiles"
+TILE_SIZE = 256
+# level k shows the map at 1 / 2**k
+ZOOM_LEVELS = 3
+# tiles kept decoded beyond the visible ones, on every side
+PREFETCH_MARGIN = 1
+# decodes per pump(), so a big pan or a zoom never stalls one frame
+DECODE_BUDGET = 6
+# drawn where the map ends
+OUTSIDE_COLOR = (20, 20, 20)
+
+MAGIC = b"GGTL"
+VERSION = 2
+# magic, version, tile size, levels, map width, map height, source hash
+HEADER = struct.Struct("<4sBHBII16s")
+# one little-endian uint32 per tile in the slot index
+SLOT = struct.Struct("<I")
+PAGE = 4096
+# slots the cache file grows by at a time
+TILE_BATCH = 16
+
+
+def tile_range(rect):
+    """
+    (first column, first row, last column, last row) of the tiles under a
+    rect given in the pixels of one level.
+    """
+    return (rect.left // TILE_SIZE, rect.top // TILE_SIZE,
+            (rect.right - 1) // TILE_SIZE, (rect.bottom - 1) // TILE_SIZE)
+
+
+class TileStore:
+    """
+    Raw RGB tiles of a map that repeats `source` (mirrored, so the copies
+    join up without seams) across width x height pixels.
+
+    The cache file holds a header, a slot index with one entry per tile at
+    every level (0 for a tile not generated yet, else its slot number plus
+    one) and then, from a page boundary, the slots themselves in the order
+    the tiles were generated. The file is mapped whole and grown by
+    TILE_BATCH slots with mmap.resize() when the last slot is used, so its
+    size follows the tiles that have been viewed rather than the map.
+    request() queues tiles for the worker thread; read() hands back a
+    generated tile as an unconverted Surface.
+    """
+
+    def __init__(self, source, width, height, key, cache_dir=TILE_CACHE_DIR):
+        self.width = width
+        self.height = height
+        self.slot_size = TILE_SIZE * TILE_SIZE * 3
+        # first tile index of each level and its (columns, rows)
+        self.first = []
+        self.grid = []
+        count = 0
+        for level in range(ZOOM_LEVELS):
+            cols, rows = self.tiles_across(level)
+            self.first.append(count)
+            self.grid.append((cols, rows))
+            count += cols * rows
+        self.count = count
+        self.data_offset = -(-(HEADER.size + count * SLOT.size) // PAGE) * PAGE
+
+        self.path = Path(cache_dir) / f"map-{width}x{height}-{key[:16]}.tiles"
+        header = HEADER.pack(MAGIC, VERSION, TILE_SIZE, ZOOM_LEVELS, width, height,
+                             bytes.fromhex(key)[:16].ljust(16, b"\0"))
+        # slot number + 1 of each tile, 0 while it's missing
+        self.slots = array("I")
+        self.lock = threading.Lock()
+        self.open_file(header)
+
+        # mirrored copies of the source, one per level, only touched by the worker
+        w, h = source.get_size()
+        quad = pygame.Surface((2 * w, 2 * h), 0, 24)
+        quad.blit(source, (0, 0))
+        quad.blit(pygame.transform.flip(source, True, False), (w, 0))
+        quad.blit(pygame.transform.flip(source, False, True), (0, h))
+        quad.blit(pygame.transform.flip(source, True, True), (w, h))
+        self.quads = [quad] + [
+            pygame.transform.smoothscale(quad, (max(1, (2 * w) >> k), max(1, (2 * h) >> k)))
+            for k in range(1, ZOOM_LEVELS)]
+
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.worker = threading.Thread(target=self.work, name="tiles", daemon=True)
+        self.worker.start()
+
+    def open_file(self, header):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "r+b" if self.path.exists() else "w+b") as f:
+            size = os.fstat(f.fileno()).st_size
+            if f.read(HEADER.size) != header or size < self.data_offset:
+                # new or stale: start over with every tile missing
+                f.truncate(0)
+                f.write(header)
+                f.truncate(self.data_offset)
+                f.flush()
+                size = self.data_offset
+            self.mm = mmap.mmap(f.fileno(), size)
+        self.slots.frombytes(self.mm[HEADER.size:HEADER.size + self.count * SLOT.size])
+        if sys.byteorder == "big":
+            self.slots.byteswap()
+        self.capacity = (size - self.data_offset) // self.slot_size
+        for i, slot in enumerate(self.slots):
+            if slot > self.capacity:
+                # past the end of a file that was cut short
+                self.slots[i] = 0
+        # slots are handed out in order and a tile's index entry is written
+        # after its pixels, so a slot whose tile never got indexed is reused
+        self.next_slot = max(self.slots, default=0)
+
+    def grow(self):
+        """
+        Make room for TILE_BATCH more slots. Only the worker calls this;
+        read() takes the same lock, as resizing may move the mapping.
+        """
+        self.capacity += TILE_BATCH
+        size = self.data_offset + self.capacity * self.slot_size
+        with self.lock:
+            try:
+                self.mm.resize(size)
+            except SystemError:
+                # no mremap() here (macOS): map the grown file afresh
+                self.mm.close()
+                with open(self.path, "r+b") as f:
+                    f.truncate(size)
+                    self.mm = mmap.mmap(f.fileno(), size)
+
+    def tiles_across(self, level):
+        size = TILE_SIZE << level
+        return -(-self.width // size), -(-self.height // size)
+
+    def index(self, key):
+        level, tx, ty = key
+        cols, rows = self.grid[level]
+        if not (0 <= tx < cols and 0 <= ty < rows):
+            return -1
+        return self.first[level] + ty * cols + tx
+
+    def has(self, key):
+        i = self.index(key)
+        return i >= 0 and self.slots[i] != 0
+
+    def request(self, keys):
+        """
+        Generate these tiles next, in order, dropping any earlier requests
+        (they were for a view that has since moved on).
+        """
+        with self.condition:
+            self.queue = deque(key for key in keys if self.index(key) >= 0 and not self.has(key))
+            if self.queue:
+                self.condition.notify()
+
+    def pending(self):
+        with self.condition:
+            return len(self.queue)
+
+    def work(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                key = self.queue.popleft()
+            if not self.has(key):
+                self.generate(key)
+
+    def generate(self, key):
+        level, tx, ty = key
+        quad = self.quads[level]
+        pw, ph = quad.get_size()
+        x0, y0 = tx * TILE_SIZE, ty * TILE_SIZE
+        tile = pygame.Surface((TILE_SIZE, TILE_SIZE), 0, 24)
+        for oy in range(-(y0 % ph), TILE_SIZE, ph):
+            for ox in range(-(x0 % pw), TILE_SIZE, pw):
+                tile.blit(quad, (ox, oy))
+        # past the right or bottom edge of the map
+        right, bottom = self.width >> level, self.height >> level
+        if x0 + TILE_SIZE > right:
+            tile.fill(OUTSIDE_COLOR, (right - x0, 0, TILE_SIZE, TILE_SIZE))
+        if y0 + TILE_SIZE > bottom:
+            tile.fill(OUTSIDE_COLOR, (0, bottom - y0, TILE_SIZE, TILE_SIZE))
+
+        i = self.index(key)
+        slot = self.next_slot
+        self.next_slot += 1
+        if slot >= self.capacity:
+            self.grow()
+        offset = self.data_offset + slot * self.slot_size
+        self.mm[offset:offset + self.slot_size] = pygame.image.tobytes(tile, "RGB")
+        SLOT.pack_into(self.mm, HEADER.size + i * SLOT.size, slot + 1)
+        # pixels first, then the index, so readers never see half a tile
+        self.slots[i] = slot + 1
+
+    def read(self, key):
+        """
+        The generated tile as a new Surface, or None if it isn't there yet.
+        """
+        i = self.index(key)
+        if i < 0 or not self.slots[i]:
+            return None
+        offset = self.data_offset + (self.slots[i] - 1) * self.slot_size
+        with self.lock:
+            pixels = self.mm[offset:offset + self.slot_size]
+        return pygame.image.frombytes(pixels, (TILE_SIZE, TILE_SIZE), "RGB")
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.worker.join()
+        self.mm.flush()
+        self.mm.close()
+
+
+class TileCache:
+    """
+    Decoded tiles for one viewport: the visible ones plus PREFETCH_MARGIN
+    around them, least recently used evicted first.
+
+    Each frame the view calls want() with the visible tile range; tiles not
+    generated yet are requested from the store, and pump() decodes those
+    that are ready, visible ones first, DECODE_BUDGET at a time.
+    """
+
+    def __init__(self, store, viewport_size):
+        self.store = store
+        cols = -(-viewport_size[0] // TILE_SIZE) + 1 + 2 * PREFETCH_MARGIN
+        rows = -(-viewport_size[1] // TILE_SIZE) + 1 + 2 * PREFETCH_MARGIN
+        # room for the whole prefetch area at two levels, so zooming back
+        # and forth doesn't thrash
+        self.capacity = 2 * cols * rows
+        self.entries = OrderedDict()
+        self.wanted = []
+        self.visible = set()
+        self.decoded = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def byte_size(self):
+        return sum(s.get_pitch() * s.get_height() for s in self.entries.values())
+
+    def get(self, key):
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+        return surface
+
+    def want(self, level, tiles):
+        """
+        tiles is a tile_range() of the view at level. Visible tiles come
+        first, then the margin ring nearest the middle first.
+        """
+        x0, y0, x1, y1 = tiles
+        visible = [(level, tx, ty) for ty in range(y0, y1 + 1) for tx in range(x0, x1 + 1)]
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        ring = [(level, tx, ty)
+                for ty in range(y0 - PREFETCH_MARGIN, y1 + PREFETCH_MARGIN + 1)
+                for tx in range(x0 - PREFETCH_MARGIN, x1 + PREFETCH_MARGIN + 1)
+                if not (x0 <= tx <= x1 and y0 <= ty <= y1)]
+        ring.sort(key=lambda key: abs(key[1] - cx) + abs(key[2] - cy))
+        keys = [key for key in visible + ring if self.store.index(key) >= 0]
+        self.visible = set(visible)
+        self.wanted = [key for key in keys if key not in self.entries]
+        self.store.request(self.wanted)
+        for key in visible:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+
+    def pending(self):
+        """
+        Whether any wanted tile still has to be decoded.
+        """
+        return bool(self.wanted)
+
+    def pump(self, budget=DECODE_BUDGET):
+        """
+        Decode up to budget ready tiles; True if one of them is visible.
+        """
+        shown = False
+        remaining = []
+        for key in self.wanted:
+            if budget and key not in self.entries:
+                raw = self.store.read(key)
+                if raw is not None:
+                    self.put(key, raw.convert())
+                    budget -= 1
+                    shown = shown or key in self.visible
+                    continue
+            if key not in self.entries:
+                remaining.append(key)
+        self.wanted = remaining
+        return shown
+
+    def put(self, key, surface):
+        self.entries[key] = surface
+        self.entries.move_to_end(key)
+        self.decoded += 1
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
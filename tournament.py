@@ -0,0 +1,133 @@
+"""
+Strawberry Snake tournament between the policies in snake_sim.
+
+Episodes are split into chunks of seeds and played across a process pool.
+Each finished episode is appended to a JSONL file as soon as its chunk
+comes back, and a leaderboard is printed at the end.
+
+    python -m src.tournament --games 2000 --policies greedy bfs hamiltonian
+"""
+import os
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.game1 import CELL_NUMBER
+from src.snake_sim import POLICIES, run_batch
+
+DEFAULT_POLICIES = ("greedy", "bfs", "hamiltonian")
+
+
+def play_chunk(policy_name, seeds, max_steps, cell_number):
+    """
+    Worker entry point: one work unit of episodes for one policy.
+    """
+    stats = run_batch(seeds, POLICIES[policy_name], max_steps, cell_number)
+    for result in stats["results"]:
+        result["policy"] = policy_name
+    return stats["results"], stats["steps"], stats["elapsed"]
+
+
+def work_units(policies, games, chunk_size, first_seed=0):
+    """
+    (policy, seeds) pairs; every policy plays the same seeds.
+    """
+    for start in range(first_seed, first_seed + games, chunk_size):
+        seeds = list(range(start, min(start + chunk_size, first_seed + games)))
+        for policy in policies:
+            yield policy, seeds
+
+
+def run_tournament(policies, games, output, workers=None, chunk_size=50, max_steps=20000,
+                   cell_number=CELL_NUMBER, first_seed=0):
+    """
+    Play `games` seeded episodes per policy, streaming results to output.
+    Returns the aggregate statistics.
+    """
+    if "hamiltonian" in policies and cell_number % 2:
+        raise ValueError("the hamiltonian policy needs an even board size")
+
+    results = {policy: [] for policy in policies}
+    steps = 0
+    worker_time = 0.0
+    start = time.perf_counter()
+    with open(output, "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_chunk, policy, seeds, max_steps, cell_number)
+                   for policy, seeds in work_units(policies, games, chunk_size, first_seed)]
+        for future in as_completed(futures):
+            chunk, chunk_steps, elapsed = future.result()
+            for result in chunk:
+                out.write(json.dumps(result) + "\n")
+                results[result["policy"]].append(result)
+            out.flush()
+            steps += chunk_steps
+            worker_time += elapsed
+    wall = time.perf_counter() - start
+
+    return {
+        "episodes": sum(len(r) for r in results.values()),
+        "steps": steps,
+        "wall": wall,
+        "steps_per_second": steps / wall if wall > 0 else 0.0,
+        # how much of the pool's capacity went into playing
+        "parallelism": worker_time / wall if wall > 0 else 0.0,
+        "leaderboard": leaderboard(results),
+    }
+
+
+def leaderboard(results):
+    rows = []
+    for policy, episodes in results.items():
+        if not episodes:
+            continue
+        scores = [e["score"] for e in episodes]
+        causes = {}
+        for e in episodes:
+            causes[e["cause"]] = causes.get(e["cause"], 0) + 1
+        rows.append({
+            "policy": policy,
+            "episodes": len(episodes),
+            "mean_score": statistics.fmean(scores),
+            "median_score": statistics.median(scores),
+            "best_score": max(scores),
+            "mean_steps": statistics.fmean(e["steps"] for e in episodes),
+            "causes": causes,
+        })
+    rows.sort(key=lambda row: row["mean_score"], reverse=True)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=1000, help="episodes per policy")
+    parser.add_argument("--policies", nargs="+", choices=sorted(POLICIES), default=list(DEFAULT_POLICIES))
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+    parser.add_argument("--chunk", type=int, default=50, help="episodes per work unit")
+    parser.add_argument("--max-steps", type=int, default=20000)
+    parser.add_argument("--board", type=int, default=CELL_NUMBER)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--output", default="tournament.jsonl")
+    args = parser.parse_args(argv)
+
+    stats = run_tournament(args.policies, args.games, args.output, args.workers, args.chunk,
+                           args.max_steps, args.board, args.first_seed)
+
+    print(f"{stats['episodes']} episodes, {stats['steps']} steps in {stats['wall']:.2f}s "
+          f"({stats['steps_per_second']:.0f} steps/s, {stats['parallelism']:.1f} workers busy)")
+    print(f"{'policy':12s} {'mean':>8s} {'median':>8s} {'best':>6s} {'steps':>9s}  deaths")
+    for row in stats["leaderboard"]:
+        causes = ", ".join(f"{cause} {count}" for cause, count in sorted(row["causes"].items()))
+        print(f"{row['policy']:12s} {row['mean_score']:8.2f} {row['median_score']:8.1f} "
+              f"{row['best_score']:6d} {row['mean_steps']:9.0f}  {causes}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+The frame loop the games run on.
+"""
+import pygame
+
+from src.model import MAX_CATCH_UP, FixedTimestep
+from src.scheduler import earliest
+
+FPS = 60
+# frame caps while the window is in the background, and while it can't be
+# seen at all (nothing is drawn then)
+BACKGROUND_FPS = 20
+HIDDEN_FPS = 5
+
+FOCUS_EVENTS = {
+    pygame.WINDOWFOCUSLOST: False,
+    pygame.WINDOWFOCUSGAINED: True,
+}
+VISIBILITY_EVENTS = {
+    pygame.WINDOWHIDDEN: True,
+    pygame.WINDOWMINIMIZED: True,
+    pygame.WINDOWSHOWN: False,
+    pygame.WINDOWRESTORED: False,
+    pygame.WINDOWEXPOSED: False,
+}
+
+
+class GameLoop:
+    """
+    One scene's frames: events, logic, drawing.
+
+    Each frame the loop hands the pending events to handle_events(events),
+    runs step() as many times as a FixedTimestep of `step_seconds` says are
+    due, calls update() (per-frame work that isn't tied to the logic rate)
+    and then draw(alpha), which returns the rects to push to the display.
+    alpha is how far the frame is between the last step and the next (0
+    without a step), for games that interpolate. The loop marks the
+    profiler's phases and draws its overlay.
+
+    Given an IdleScheduler the loop sleeps between events instead, waking
+    for idle_timeout(), the next step while idle_timeout() is set, and the
+    overlay, and draws only after the scene invalidates it. Time asleep
+    with no idle_timeout() isn't owed as steps.
+
+    While the window is unfocused frames are capped at BACKGROUND_FPS, and
+    while it is hidden or minimised at HIDDEN_FPS without drawing; logic
+    keeps its rate either way.
+    """
+
+    def __init__(self, handle_events, draw, step=None, step_seconds=None, update=None,
+                 idle_timeout=None, scheduler=None, profiler=None, fps=FPS,
+                 max_steps=MAX_CATCH_UP):
+        self.handle_events = handle_events
+        self.draw = draw
+        self.step = step
+        self.timestep = FixedTimestep(step_seconds, max_steps) if step is not None else None
+        self.update = update
+        self.idle_timeout = idle_timeout
+        self.scheduler = scheduler
+        self.profiler = profiler
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.focused = True
+        self.hidden = False
+        self.running = False
+
+    def resume(self):
+        """
+        Call when the scene (re)opens its window: timing restarts and the
+        window counts as visible and focused again.
+        """
+        if self.timestep is not None:
+            self.timestep.reset()
+        if self.scheduler is not None:
+            self.scheduler.invalidate()
+        self.focused = True
+        self.hidden = False
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        self.running = True
+        while self.running:
+            self.frame()
+
+    def frame(self):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_frame()
+        events = self.poll()
+        for event in events:
+            if event.type in FOCUS_EVENTS:
+                self.focused = FOCUS_EVENTS[event.type]
+            elif event.type in VISIBILITY_EVENTS:
+                self.hidden = VISIBILITY_EVENTS[event.type]
+        self.handle_events(events)
+        self.mark("events")
+
+        if self.timestep is not None:
+            for _ in range(self.timestep.advance()):
+                if not self.running:
+                    break
+                self.step()
+        if self.update is not None:
+            self.update()
+        self.mark("update")
+
+        if self.running and not self.hidden and (self.scheduler is None or self.scheduler.should_draw()):
+            alpha = self.timestep.alpha() if self.timestep is not None else 0.0
+            rects = self.draw(alpha)
+            if profiler is not None:
+                overlay = profiler.draw_overlay(pygame.display.get_surface())
+                if overlay is not None:
+                    rects.append(overlay)
+            self.mark("draw")
+            if rects:
+                pygame.display.update(rects)
+            self.mark("flip")
+
+        self.clock.tick(self.frame_rate())
+        if profiler is not None:
+            profiler.end_frame()
+
+    def poll(self):
+        if self.scheduler is None:
+            return pygame.event.get()
+        timeout = self.idle_timeout() if self.idle_timeout is not None else None
+        if timeout is None and self.timestep is not None:
+            # nothing is moving: don't let the sleep turn into steps
+            events = self.scheduler.wait(self.profiler_timeout())
+            self.timestep.reset()
+            return events
+        if self.timestep is not None:
+            # something is moving: wake when its next step is due
+            timeout = earliest(timeout, self.timestep.timeout())
+        return self.scheduler.wait(earliest(timeout, self.profiler_timeout()))
+
+    def profiler_timeout(self):
+        return self.profiler.refresh_timeout() if self.profiler is not None else None
+
+    def frame_rate(self):
+        if self.hidden:
+            return HIDDEN_FPS
+        if not self.focused:
+            return min(self.fps, BACKGROUND_FPS)
+        return self.fps
+
+    def mark(self, phase):
+        if self.profiler is not None:
+            self.profiler.mark(phase)